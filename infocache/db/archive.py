@@ -0,0 +1,284 @@
+"""
+Archive of the jobs in a final state. Instead of deleting the records
+of old final jobs row by row from the 'job' table, they get moved
+into day partitions of an archive, keyed by the day they got archived
+on (i.e. about the day they got final). Retention is done by dropping
+whole partitions, so the 'job' table only holds the live jobs and the
+recently finished ones.
+
+Storage layouts:
+
+    MySQL      table 'job_archive' with native RANGE partitions
+               (one per day, named pYYYYMMDD)
+    others     one table per day, 'job_archive_YYYYMMDD'
+
+Jobs get moved in chunks of MOVE_CHUNK records with INSERT ... SELECT
+and DELETE, one short transaction per chunk, which keeps the locks on
+the 'job' table short. The partition of a day only gets created once
+there are jobs to move. Jobs the GRIS of their cluster still lists
+(see infocache.db.queries.listed_jobs) stay in the 'job' table, as
+the next query cycle would record them again.
+
+usage: python -m infocache.db.archive [--config_file FILE] [--days N]
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sys
+import re
+import logging
+from datetime import datetime, timedelta
+from optparse import OptionParser
+
+import sqlalchemy as sa
+from sqlalchemy.types import NullType
+from sqlalchemy.sql.expression import Executable, ClauseElement
+from sqlalchemy.ext.compiler import compiles
+
+from infocache.db import schema, queries
+
+ARCHIVE_TABLE = 'job_archive'
+# states of the job records that get archived (Cleanex used to delete them)
+ARCHIVED_STATES = ['FIN_FETCHED', 'FLD_FETCHED', 'KIL_FETCHED',
+                'FIN_DELETED', 'FLD_DELETED', 'KIL_DELETED',
+                'LOST', 'DELETED']
+ARCHIVE_DELAY = 2 * 3600    # final jobs stay that long in the 'job' table, as the
+                            # RRD final jobs plots count them with a delay of 1 hour [s]
+MOVE_CHUNK = 1000           # jobs moved per transaction
+
+
+class InsertFromSelect(Executable, ClauseElement):
+    """ INSERT INTO table (columns) SELECT ... """
+
+    def __init__(self, table, columns, select):
+        self.table = table
+        self.columns = columns
+        self.select = select
+
+
+@compiles(InsertFromSelect)
+def _compile_insert_from_select(insert, compiler, **kw):
+    quote = compiler.preparer.quote_identifier
+    return 'INSERT INTO %s (%s) %s' % (compiler.process(insert.table, asfrom=True),
+        ', '.join([quote(name) for name in insert.columns]), compiler.process(insert.select))
+
+
+def _archive_columns():
+    """ Returns columns of the 'job' table for an archive table. Archive
+        tables have no primary key and no foreign keys, a job that gets
+        archived twice (e.g. it reappeared on the cluster) is kept twice.
+    """
+    columns = list()
+    for col in schema.t_job.c:
+        _type = col.type
+        if isinstance(_type, NullType): # foreign key column
+            _type = list(col.foreign_keys)[0].column.type
+        columns.append(sa.Column(col.name, _type))
+    return columns
+
+
+def day_key(day):
+    return day.strftime('%Y%m%d')
+
+
+class JobArchive(object):
+    """ Base class of the storage layouts, see job_archive(). A layout
+        implements the methods:
+
+        partitions(session)     returns sorted list of the days (dates)
+                                with a partition
+        _prepare(session, day)  creates partition of day if needed, returns
+                                tuple (table, extra columns) to insert the
+                                archived jobs into
+        _drop(session, day)     drops partition of day
+    """
+
+    def __init__(self, retention_days):
+        """ retention_days -- number of days (including the current day)
+                              whose partitions are kept
+        """
+        self.log = logging.getLogger(__name__)
+        self.retention_days = retention_days
+
+    def archive(self, session, now=None):
+        """ Moves the job records in a final state, which got final (and
+            changed) at least ARCHIVE_DELAY ago and are not listed by their
+            GRIS anymore, to the partition of the current day.
+            returns number of moved jobs
+        """
+        if not now:
+            now = datetime.utcnow()
+        t_job = schema.t_job
+        before = now - timedelta(seconds=ARCHIVE_DELAY)
+        ready = sa.and_(t_job.c.status.in_(ARCHIVED_STATES),
+                    t_job.c.db_lastmodified <= before,
+                    sa.not_(queries.listed_jobs()),
+                    sa.or_(t_job.c.completion_time == None, t_job.c.completion_time <= before),
+                    sa.or_(t_job.c.status != 'FIN_DELETED',
+                        t_job.c.sessiondir_erase_time == None,
+                        t_job.c.sessiondir_erase_time <= before))
+
+        table = None
+        n = 0
+        last = None
+        while True:
+            where = ready
+            if last is not None:
+                where = sa.and_(ready, t_job.c.global_id > last)
+            query = sa.select([t_job.c.global_id], where).order_by(t_job.c.global_id).\
+                        limit(MOVE_CHUNK)
+            ids = [global_id for global_id, in session.execute(query).fetchall()]
+            if not ids:
+                break
+            if table is None:
+                table, extra = self._prepare(session, now.date())
+                names = [col.name for col in t_job.c] + [name for name, value in extra]
+                values = list(t_job.c) + [sa.literal(value) for name, value in extra]
+            chunk = sa.and_(t_job.c.global_id.in_(ids), ready) # unless changed meanwhile
+            session.execute(InsertFromSelect(table, names, sa.select(values, chunk)))
+            n += session.execute(t_job.delete(chunk)).rowcount
+            session.commit()
+            last = ids[-1]
+        if n:
+            self.log.info("Archived %d final jobs." % n)
+        return n
+
+    def expire(self, session, now=None):
+        """ Drops the partitions older than retention_days.
+            returns list of the days (dates) dropped
+        """
+        if not now:
+            now = datetime.utcnow()
+        oldest = now.date() - timedelta(days=self.retention_days - 1)
+        dropped = list()
+        for day in self.partitions(session):
+            if day >= oldest:
+                break
+            self._drop(session, day)
+            dropped.append(day)
+            self.log.info("Dropped job archive partition of %s" % day)
+        session.commit()
+        return dropped
+
+
+class DailyTableArchive(JobArchive):
+    """ A table per day, 'job_archive_YYYYMMDD' """
+
+    TABLE_NAME = re.compile(r'^%s_(\d{8})$' % ARCHIVE_TABLE)
+
+    def __init__(self, retention_days):
+        JobArchive.__init__(self, retention_days)
+        self.metadata = sa.MetaData()
+
+    def _table(self, day):
+        name = '%s_%s' % (ARCHIVE_TABLE, day_key(day))
+        if self.metadata.tables.has_key(name):
+            return self.metadata.tables[name]
+        table = sa.Table(name, self.metadata, *_archive_columns())
+        sa.Index('ix_%s_id' % name, table.c.global_id)
+        return table
+
+    def partitions(self, session):
+        days = list()
+        for name in session.bind.table_names(connection=session.connection()):
+            match = DailyTableArchive.TABLE_NAME.match(name)
+            if match:
+                days.append(datetime.strptime(match.group(1), '%Y%m%d').date())
+        days.sort()
+        return days
+
+    def _prepare(self, session, day):
+        table = self._table(day)
+        table.create(bind=session.connection(), checkfirst=True)
+        return table, []
+
+    def _drop(self, session, day):
+        table = self._table(day)
+        table.drop(bind=session.connection(), checkfirst=True)
+        self.metadata.remove(table)
+
+
+class PartitionedArchive(JobArchive):
+    """ MySQL table 'job_archive' with a RANGE partition per day on
+        the column 'archived'
+    """
+
+    def __init__(self, retention_days):
+        JobArchive.__init__(self, retention_days)
+        self.table = sa.Table(ARCHIVE_TABLE, sa.MetaData(),
+                    *(_archive_columns() + [sa.Column('archived', sa.types.Date, nullable=False)]))
+        sa.Index('ix_%s_id' % ARCHIVE_TABLE, self.table.c.global_id)
+
+    def _partition(self, day):
+        """ Returns partition definition of day """
+        return "PARTITION p%s VALUES LESS THAN (TO_DAYS('%s'))" % \
+            (day_key(day), day + timedelta(days=1))
+
+    def partitions(self, session):
+        query = sa.text("SELECT partition_name FROM information_schema.partitions " \
+                    "WHERE table_schema = DATABASE() AND table_name = :name " \
+                    "AND partition_name IS NOT NULL")
+        days = list()
+        for name, in session.execute(query, dict(name=ARCHIVE_TABLE)).fetchall():
+            days.append(datetime.strptime(name[1:], '%Y%m%d').date())
+        days.sort()
+        return days
+
+    def _prepare(self, session, day):
+        connection = session.connection()
+        if not self.table.exists(bind=connection):
+            self.table.create(bind=connection)
+            connection.execute("ALTER TABLE %s PARTITION BY RANGE (TO_DAYS(archived)) (%s)" % \
+                (ARCHIVE_TABLE, self._partition(day)))
+        else:
+            days = self.partitions(session)
+            if not days or days[-1] < day:
+                connection.execute("ALTER TABLE %s ADD PARTITION (%s)" % \
+                    (ARCHIVE_TABLE, self._partition(day)))
+        return self.table, [('archived', day)]
+
+    def _drop(self, session, day):
+        session.connection().execute("ALTER TABLE %s DROP PARTITION p%s" % \
+            (ARCHIVE_TABLE, day_key(day)))
+
+
+def job_archive(dialect, retention_days):
+    """ Returns JobArchive of the storage layout for the database dialect """
+    if dialect.name == 'mysql':
+        return PartitionedArchive(retention_days)
+    return DailyTableArchive(retention_days)
+
+
+def main():
+    from infocache.utils import init_config
+    import infocache.utils.config_parser as config_parser
+    from infocache.db import init_model, meta
+
+    parser = OptionParser(usage="usage: %prog [options]", version="%prog " + __version__)
+    parser.add_option("", "--config_file", action="store",
+        dest="config_file", type="string",
+        default="/opt/smscg/infocache/etc/config.ini",
+        help="File holding the smscg specific configuration for this site (default=%default)")
+    parser.add_option("", "--days", action="store",
+        dest="days", type="int", default=0,
+        help="Archive final jobs and keep the partitions of DAYS days (default: list partitions only)")
+    options, args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_config(options.config_file)
+    init_model(sa.engine_from_config(config_parser.config.get(), 'sqlalchemy_infocache.'))
+    session = meta.Session()
+    archive = job_archive(session.bind.dialect, options.days)
+    if options.days:
+        print "%d jobs archived" % archive.archive(session)
+        print "%d partitions dropped" % len(archive.expire(session))
+    for day in archive.partitions(session):
+        print day
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Declarative attribute tables of the ORM classes NGCluster, NGQueue
+and NGJob. An attribute table lists for every attribute where its
+value comes from (attribute of the arclib object or function of it),
+its max length and whether it is a list that gets stored encoded (see
+infocache.db.codec). The getter callables are compiled once per class
+(operator.attrgetter), so populating an object is a plain loop
+without exec/eval.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import operator
+
+from infocache.errors.db import Input_Error
+from infocache.db import codec
+
+
+class Attribute(object):
+    """ Declaration of an attribute of an ORM class """
+
+    def __init__(self, name, max_len=None, source=None, convert=None, encoded=False):
+        """ name -- attribute (column) name
+            max_len -- max length of a string value (None: unlimited)
+            source -- attribute name of the arclib object (default: name), or
+                      function returning the value of the arclib object
+            convert -- function applied to the value of source
+            encoded -- value is a list, which gets stored encoded
+        """
+        self.name = name
+        self.max_len = max_len
+        self.encoded = encoded
+        if callable(source):
+            fetch = source
+        else:
+            fetch = operator.attrgetter(source or name)
+        if convert:
+            self.fetch = lambda obj: convert(fetch(obj))
+        else:
+            self.fetch = fetch
+
+
+class AttributeTable(object):
+    """ Attributes of an ORM class, in the order they get populated """
+
+    def __init__(self, *attributes):
+        self.attributes = attributes
+        self.max_lens = dict([(a.name, a.max_len) for a in attributes])
+        self.encoded = frozenset([a.name for a in attributes if a.encoded])
+
+    def names(self):
+        return [a.name for a in self.attributes]
+
+    def populate(self, obj, source):
+        """ Sets the attributes of obj from source (arclib object). Empty
+            values are skipped, lists get encoded.
+
+            raises Input_Error -- if a (encoded) value exceeds its max length
+        """
+        for attr in self.attributes:
+            value = attr.fetch(source)
+            if not value:
+                continue
+            if attr.encoded:
+                value = codec.encode(value)
+            if attr.max_len and type(value) == str and len(value) > attr.max_len:
+                raise Input_Error("Input too big", \
+                    "(Encoded) value of '%s' exceeds len '%d'" % (attr.name, attr.max_len))
+            setattr(obj, attr.name, value)
+
+    def values(self, obj, name):
+        """ Returns list of values of attribute name of obj (can be empty).
+            We do not check whether name is a valid attribute name.
+        """
+        value = getattr(obj, name)
+        if not value:
+            return []
+        if name in self.encoded:
+            return codec.decode(value)
+        return [value]
+
+
+def software_list(items):
+    """ Returns list of 'name version' strings of arclib environments """
+    return ['%s %s' % (sw.Name(), sw.Version()) for sw in items]
+
+
+def plain_list(items):
+    return [item for item in items]
@@ -0,0 +1,125 @@
+"""
+Set-based write helpers for the infocache tables. The helpers
+work on the (sqlalchemy Core) tables of the schema and hand rows
+to the database driver with executemany(), i.e. they bypass the
+ORM unit of work (no SELECT before each INSERT/UPDATE).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sqlalchemy as sa
+
+BATCH_SIZE = 500    # max number of rows passed per executemany() call
+PK_PREFIX = '_pk_'  # prefix of bind parameters holding primary key values
+
+
+def set_batch_size(batch_size):
+    """ Sets default number of rows passed per executemany() call """
+    global BATCH_SIZE
+    BATCH_SIZE = max(batch_size, 1)
+
+
+def orm2row(obj, table):
+    """ Returns dict {column_name: value} with the columns of 'table'
+        that got assigned on the (mapped) object 'obj'. Columns that
+        never got assigned are left out, which is what session.merge()
+        does as well.
+    """
+    state = obj.__dict__
+    row = dict()
+    for col in table.c:
+        if state.has_key(col.name):
+            row[col.name] = state[col.name]
+    return row
+
+
+def group_by_keys(rows):
+    """ executemany() compiles a statement for the keys of the
+        first row only. Returns list of row lists, each list holding
+        rows with identical set of keys. Row records (see rows.Row)
+        get turned into dicts, which the driver handles faster.
+    """
+    groups = dict()
+    for row in rows:
+        if not isinstance(row, dict):
+            row = dict(row.items())
+        key = tuple(sorted(row.keys()))
+        groups.setdefault(key, []).append(row)
+    return groups.values()
+
+
+def batches(rows, batch_size=None):
+    """ Splits list of rows in chunks of at most batch_size 
+        (default BATCH_SIZE) rows 
+    """
+    if not batch_size:
+        batch_size = BATCH_SIZE
+    for i in xrange(0, len(rows), batch_size):
+        yield rows[i:i + batch_size]
+
+
+def bulk_insert(session, table, rows, batch_size=None):
+    """ Inserts rows (list of dicts) into table. Column defaults
+        apply for columns missing in a row.
+
+        returns number of inserted rows
+    """
+    n = 0
+    for group in group_by_keys(rows):
+        for batch in batches(group, batch_size):
+            session.execute(table.insert(), batch)
+            n += len(batch)
+    return n
+
+
+def bulk_update(session, table, rows, batch_size=None):
+    """ Updates rows (list of dicts) of table. Each row must contain
+        the primary key values of the record to update, all other
+        keys of the row are the columns that get SET.
+
+        returns number of rows passed to the database
+    """
+    pk_names = [col.name for col in table.primary_key]
+    where = sa.and_(*[col == sa.bindparam(PK_PREFIX + col.name)
+                    for col in table.primary_key])
+    stmt = table.update().where(where)
+
+    params = list()
+    for row in rows:
+        param = dict()
+        for key, value in row.iteritems():
+            if key in pk_names:
+                param[PK_PREFIX + key] = value
+            else:
+                param[key] = value
+        if len(param) > len(pk_names): # nothing to SET otherwise
+            params.append(param)
+
+    n = 0
+    for group in group_by_keys(params):
+        for batch in batches(group, batch_size):
+            session.execute(stmt, batch)
+            n += len(batch)
+    return n
+
+
+def save_row(session, table, row):
+    """ Updates the record with the primary key values of row (dict)
+        or inserts row if there is no such record yet.
+    """
+    pk_names = [col.name for col in table.primary_key]
+    where = sa.and_(*[col == row[col.name] for col in table.primary_key])
+    values = dict()
+    for key, value in row.iteritems():
+        if key not in pk_names:
+            values[key] = value
+
+    if values:
+        if session.execute(table.update(where), values).rowcount > 0:
+            return
+    elif session.execute(sa.select(list(table.primary_key), where)).fetchone():
+        return
+    session.execute(table.insert(), row)
@@ -1,9 +1,26 @@
 """ ORM object for cluster table """
-import cPickle
 from datetime import datetime
 
 from gridmonitor.model.api.cluster_api import ClusterApi
 from infocache.errors.db import Input_Error
+from infocache.db.attributes import Attribute, AttributeTable, software_list, plain_list
+
+
+def _issuer_ca(ci):
+    return '%s (hash: %s)' % (ci.issuer_ca, ci.issuer_ca_hash)
+
+def _expiration_time(cred_expire_time):
+    if cred_expire_time:
+        return "%s" % datetime.utcfromtimestamp(cred_expire_time.GetTime())
+    return None
+
+def _session_dir(ci):
+    return "free: %s (total: %s) -- lifetime: %s " % \
+            (ci.session_dir_free, ci.session_dir_total, ci.session_dir_lifetime)
+
+def _cache(ci):
+    return "free: %s (total: %s)" % (ci.cache_free, ci.cache_total)
+
 
 
 class ClusterMeta(object):
@@ -93,129 +110,46 @@ class NGCluster(ClusterApi, ClusterMeta):
         ARC information system. 
     """
     
+    TABLE = AttributeTable(
+        Attribute('hostname', 255),
+        Attribute('alias', 255),
+        Attribute('comment', 511),
+        Attribute('owners', 511, convert=plain_list, encoded=True),
+        Attribute('support', 511, convert=plain_list, encoded=True),
+        Attribute('contact', 511),
+        Attribute('location', 255),
+        Attribute('issuer_ca', 255, source=_issuer_ca),
+        Attribute('cert_expiration', 63, source='cred_expire_time', convert=_expiration_time),
+        Attribute('architecture', 255),
+        Attribute('homogeneity'),
+        Attribute('node_cpu', 255),
+        Attribute('node_memory'),
+        Attribute('middlewares', 511, convert=software_list, encoded=True),
+        Attribute('operating_systems', 255, convert=software_list, encoded=True),
+        Attribute('lrms_config', 255),
+        Attribute('lrms_type', 255),
+        Attribute('lrms_version', 255),
+        Attribute('prelrms_queued'),
+        Attribute('queued_jobs'),
+        Attribute('total_jobs'),
+        Attribute('used_cpus'),
+        Attribute('total_cpus'),
+        Attribute('session_dir', 255, source=_session_dir),
+        Attribute('cache', 255, source=_cache),
+        Attribute('benchmarks', 255, convert=plain_list, encoded=True),
+        Attribute('runtime_environments', 262141, convert=software_list, encoded=True))
+
     # dict of valid attributes each listed as tupple (<name>, <max_len>)
-    ATTRIBUTES = dict(hostname= 255, 
-        alias = 255,
-        comment =  511,
-        owners =  511,
-        support =  511,
-        contact =  511,
-        location =  255,
-        issuer_ca =  255,
-        cert_expiration =  63,
-        architecture =  255,
-        homogeneity =  None,
-        node_cpu =  255,
-        node_memory =  None, 
-        middlewares =  511, 
-        operating_systems =  255, 
-        lrms_config =  255, 
-        lrms_type =  255, 
-        lrms_version =  255, 
-        prelrms_queued = None, 
-        queued_jobs = None, 
-        total_jobs = None,
-        used_cpus = None, 
-        total_cpus = None,
-        session_dir =  255, 
-        cache = 255, 
-        benchmarks = 255,
-        runtime_environments = 262141)
+    ATTRIBUTES = TABLE.max_lens
     
-    # list of attributes which are stored pickled
-    PICKLED = ['support', 'owners', 'middlewares', 
-            'benchmarks', 'runtime_environments', 'operating_systems'] 
-
-    def __add_attribute(self, name, value):
-        """ Adds a new attribute with 'name' to the class and 
-            assigns the 'value' to it. If the value 
-            is a list -> pickle it. Will be unpickled when 
-            called by get_attribute_values. 
-
-            raises Input_Error-- if (pickled) value exeeds max size value
-        """
-        if not value or not NGCluster.ATTRIBUTES.has_key(name):
-            return
-
-        if name in NGCluster.PICKLED:        
-            val = cPickle.dumps(value)
-        else:
-            val = value
-
-        if type(val) == str:
-            max_len = NGCluster.ATTRIBUTES[name]
-            if len(val) > max_len:
-                raise Input_Error("Input too big", \
-                    "(Pickled) value of '%s' exceeds len '%d'" % (name, max_len))
-
-        assignment = 'self.%s=val' % name # sqlalchemy shall deal will sql injection
-        exec(assignment)
-
+    # list of attributes which are stored as encoded lists (formerly pickled)
+    PICKLED = list(TABLE.encoded)
 
     def __init__(self, arclib_cluster):
         """ arclib_cluster -- cluster object as provided by the arclib"""
 
         ClusterMeta.__init__(self)
-
-        ci = arclib_cluster
-        
-        ca = '%s (hash: %s)' % (ci.issuer_ca, ci.issuer_ca_hash)
-        session_dir = "free: %s (total: %s) -- lifetime: %s " % \
-            (ci.session_dir_free, ci.session_dir_total, ci.session_dir_lifetime)
-        cache = "free: %s (total: %s)" % (ci.cache_free, ci.cache_total)
-        support = []
-        owners = []
-        middlewares = [] 
-        benchmarks = []
-        operating_systems = []
-        rtes = []
-        
-        for s in ci.support:
-            support.append(s)
-        for o in ci.owners:
-            owners.append(o)
-        for m in ci.middlewares:
-            middlewares.append('%s %s' % (m.Name(), m.Version()))
-        for b in ci.benchmarks:
-            benchmarks.append(b) 
-        for os in ci.operating_systems:
-            operating_systems.append('%s %s' % (os.Name(), os.Version()))
-        for rte in ci.runtime_environments:
-            rtes.append('%s %s' % (rte.Name(), rte.Version()))
-        
-        self.__add_attribute('hostname', ci.hostname)
-        self.__add_attribute('alias', ci.alias)
-        self.__add_attribute('comment', ci.comment)
-        self.__add_attribute('owners', owners)
-        self.__add_attribute('support', support)
-        self.__add_attribute('contact', ci.contact)            
-        self.__add_attribute('location', ci.location)
-        self.__add_attribute('issuer_ca', ca)
-        if ci.cred_expire_time:
-            utctime = "%s" % datetime.utcfromtimestamp(ci.cred_expire_time.GetTime())
-            self.__add_attribute('cert_expiration', utctime) 
-        
-        self.__add_attribute('architecture', ci.architecture)
-        self.__add_attribute('homogeneity', ci.homogeneity)
-        self.__add_attribute('node_cpu', ci.node_cpu)
-        self.__add_attribute('node_memory', ci.node_memory)
-        self.__add_attribute('middlewares', middlewares)
-        self.__add_attribute('operating_systems', operating_systems)
-        self.__add_attribute('lrms_config', ci.lrms_config)
-        self.__add_attribute('lrms_type', ci.lrms_type)
-        self.__add_attribute('lrms_version', ci.lrms_version)
-
-        self.__add_attribute('prelrms_queued', ci.prelrms_queued)
-        self.__add_attribute('queued_jobs', ci.queued_jobs)
-        self.__add_attribute('total_jobs', ci.total_jobs)
-        self.__add_attribute('used_cpus', ci.used_cpus)
-        self.__add_attribute('total_cpus', ci.total_cpus)
-
-        self.__add_attribute('session_dir', session_dir)
-        self.__add_attribute('cache', cache)
-
-        self.__add_attribute('benchmarks', benchmarks)
-        self.__add_attribute('runtime_environments', rtes)
+        NGCluster.TABLE.populate(self, arclib_cluster)
 
 
     def get_name(self):
@@ -235,13 +169,7 @@ class NGCluster(ClusterApi, ClusterMeta):
         """ returns a list (can be empty. We do not 
             check whether name is a valid attribute name.
         """
-        attr = eval("self."+ name)
-        if not attr:
-            return []
-
-        if name in NGCluster.PICKLED:
-            return cPickle.loads(attr)
-        return [attr]
+        return NGCluster.TABLE.values(self, name)
 
 
     def set_metadata(self, metadata):
@@ -0,0 +1,163 @@
+"""
+Encoding of list-valued columns (e.g. the runtime environments of a
+cluster). A list gets stored as its UTF-8 items joined by the ASCII
+unit separator, prefixed with a version marker:
+
+    ~1:<item>\\x1f<item>...     plain
+    ~1z:<base64>               zlib compressed (large values only)
+
+Values without marker are protocol 0 pickles, written by earlier
+versions or for the few lists the encoding can't represent (items
+holding the separator, a single empty item). Run the module to
+rewrite the pickled values of an existing database:
+
+usage: python -m infocache.db.codec [--config_file FILE]
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sys
+import zlib
+import base64
+import cPickle
+import logging
+from optparse import OptionParser
+
+VERSION = 1
+MARKER = '~%d:' % VERSION               # plain encoding
+ZMARKER = '~%dz:' % VERSION             # compressed encoding
+SEPARATOR = '\x1f'                      # ASCII unit separator
+COMPRESS_MIN = 512                      # values shorter than that don't get compressed [bytes]
+CONVERT_CHUNK = 1000                    # rows rewritten per transaction by convert_table()
+
+
+def _utf8(item):
+    if isinstance(item, unicode):
+        item = item.encode('utf-8')
+    else:
+        item = str(item)
+    return item
+
+
+def encode(values):
+    """ Returns list of values encoded as (byte) string """
+    items = [_utf8(item) for item in values]
+    if items == [''] or [item for item in items if SEPARATOR in item]:
+        return cPickle.dumps(items, 0) # ambiguous when joined
+    val = MARKER + SEPARATOR.join(items)
+    if len(val) < COMPRESS_MIN:
+        return val
+    packed = ZMARKER + base64.b64encode(zlib.compress(val[len(MARKER):]))
+    if len(packed) < len(val):
+        return packed
+    return val
+
+
+def decode(value):
+    """ Returns list of the values encoded by encode() or pickled
+        by earlier versions. Items are unicode if value is unicode,
+        (UTF-8) strings otherwise.
+    """
+    if not value:
+        return []
+    is_unicode = isinstance(value, unicode)
+    if value.startswith(MARKER):
+        body = value[len(MARKER):]
+        if not body:
+            return []
+        return body.split(SEPARATOR)
+    if value.startswith(ZMARKER):
+        body = zlib.decompress(base64.b64decode(str(value[len(ZMARKER):])))
+        if not body:
+            return []
+        if is_unicode:
+            body = body.decode('utf-8')
+        return body.split(SEPARATOR)
+    if is_unicode: # legacy pickles are ASCII
+        value = value.encode('utf-8')
+    return cPickle.loads(value)
+
+
+def is_encoded(value):
+    """ Returns True if value got encoded by encode() of this version """
+    return not value or value.startswith(MARKER) or value.startswith(ZMARKER)
+
+
+def convert_table(session, table, columns):
+    """ Rewrites pickled values of columns of table (with a single column
+        primary key) with encode(). Commits every CONVERT_CHUNK rows.
+        Returns number of rewritten rows.
+    """
+    import sqlalchemy as sa
+    from infocache.db import bulk
+
+    log = logging.getLogger(__name__)
+    pk = list(table.primary_key)[0]
+    cols = [table.c[name] for name in columns]
+    pickled = sa.or_(*[sa.and_(col != None, col != '', ~col.startswith('~%d' % VERSION))
+                    for col in cols])
+
+    n = 0
+    last = None
+    while True:
+        where = pickled
+        if last is not None: # skips rows that could not be converted
+            where = sa.and_(pickled, pk > last)
+        query = sa.select([pk] + cols, where).order_by(pk).limit(CONVERT_CHUNK)
+        records = session.execute(query).fetchall()
+        if not records:
+            break
+        rows = list()
+        for record in records:
+            row = dict()
+            row[pk.name] = record[pk.name]
+            for name in columns:
+                if is_encoded(record[name]):
+                    continue
+                try:
+                    value = encode(decode(record[name]))
+                except Exception, e:
+                    log.warn("%s %s: could not convert %s, got %r" % \
+                        (table.name, record[pk.name], name, e))
+                    continue
+                if value != record[name]: # else pickled by encode() as well
+                    row[name] = value
+            if len(row) > 1:
+                rows.append(row)
+        bulk.bulk_update(session, table, rows)
+        session.commit()
+        n += len(rows)
+        last = records[-1][pk.name]
+        log.info("%s: %d rows rewritten" % (table.name, n))
+    return n
+
+
+def main():
+    import sqlalchemy as sa
+    from infocache.utils import init_config
+    import infocache.utils.config_parser as config_parser
+    from infocache.db import init_model, meta, schema
+
+    parser = OptionParser(usage="usage: %prog [options]", version="%prog " + __version__)
+    parser.add_option("", "--config_file", action="store",
+        dest="config_file", type="string",
+        default="/opt/smscg/infocache/etc/config.ini",
+        help="File holding the smscg specific configuration for this site (default=%default)")
+    options, args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_config(options.config_file)
+    init_model(sa.engine_from_config(config_parser.config.get(), 'sqlalchemy_infocache.'))
+    session = meta.Session()
+    for table, columns in [(schema.t_cluster, schema.NGCluster.PICKLED),
+                        (schema.t_job, schema.NGJob.PICKLED)]:
+        n = convert_table(session, table, columns)
+        print "%s: %d rows converted" % (table.name, n)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
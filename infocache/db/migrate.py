@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Migration tool for existing infocache databases (MySQL, SQLite).
+create_all() only creates the indexes of tables that don't exist
+yet, this tool adds the indexes declared in the schema to the
+existing tables. Indexes that are already there (by name or by
+columns) are left alone, hence the tool can be run any number of
+times. Staging tables, whose content the next query cycle rebuilds,
+get recreated if their columns differ from the schema.
+
+Before and after the migration the query plans (EXPLAIN) of the hot
+queries are reported. A dry run neither creates indexes nor (re)creates tables.
+
+usage: python -m infocache.db.migrate [--config_file FILE] [--dry_run]
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sys
+import time
+import logging
+from datetime import datetime
+from optparse import OptionParser
+
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+from infocache.db import meta, schema, stream, queries
+
+FETCHED_STATES = ['FIN_FETCHED', 'FLD_FETCHED', 'KIL_FETCHED']
+FAILED_STATES = ['FAILED', 'FLD_DELETED', 'FLD_FETCHED']
+STAGING_TABLES = [schema.t_job_seen]
+
+
+def hot_queries():
+    """ Returns list of (name, select) of the queries the indexes are
+        meant for. UPDATEs and DELETEs are explained by their equivalent
+        SELECT, since older MySQL versions can't EXPLAIN them.
+    """
+    t_job = schema.t_job
+    now = datetime.utcnow()
+    day_ago = datetime.utcfromtimestamp(time.time() - 86400)
+    hostname = 'cluster.example.org'
+    prefetch = queries.prefetch_query(hostname)
+    return [
+        # keyset batches on MySQL, the query as is on other databases (see stream)
+        ('reconcile prefetch of cluster, first batch',
+            stream.keyset_batch(prefetch, t_job.c.global_id, stream.STREAM_BATCH)),
+        ('reconcile prefetch of cluster, next batch',
+            stream.keyset_batch(prefetch, t_job.c.global_id, stream.STREAM_BATCH,
+                'gsiftp://%s:2811/jobs/1' % hostname)),
+        ('reconcile lookup of new jobs',
+            queries.lookup_query(['gsiftp://%s:2811/jobs/%d' % (hostname, i)
+                for i in xrange(3)])),
+        # UPDATE job SET status = CASE ... of the jobs the cluster stopped advertising
+        ('reconcile sweep of cluster (UPDATE)',
+            sa.select([t_job.c.global_id, t_job.c.status], queries.gone_jobs(hostname))),
+        ('reconcile staged ids of cluster (DELETE)',
+            sa.select([schema.t_job_seen.c.global_id],
+                sa.and_(schema.t_job_seen.c.cluster_name == hostname,
+                    schema.t_job_seen.c.listed == False))),
+        ('rrd final_jobs (completion_time)',
+            sa.select([t_job.c.global_id, t_job.c.used_wall_time],
+                sa.and_(t_job.c.completion_time > day_ago,
+                    t_job.c.completion_time <= now,
+                    t_job.c.status.in_(FAILED_STATES)))),
+        ('rrd final_jobs (sessiondir_erase_time)',
+            sa.select([t_job.c.global_id, t_job.c.used_wall_time],
+                sa.and_(t_job.c.sessiondir_erase_time > day_ago,
+                    t_job.c.sessiondir_erase_time <= now,
+                    t_job.c.status == 'FIN_DELETED'))),
+        ('Cleanex check_jobs',
+            sa.select([t_job.c.global_id],
+                sa.and_(t_job.c.db_lastmodified <= day_ago,
+                    t_job.c.status.in_(FETCHED_STATES)))),
+        ('active clusters',
+            sa.select([schema.t_cluster.c.hostname],
+                schema.t_cluster.c.status == 'active')),
+        ('queues of cluster',
+            sa.select([schema.t_queue.c.name],
+                schema.t_queue.c.hostname == 'cluster.example.org')),
+        ('expired user access entries',
+            sa.select([schema.t_user_access.c.user],
+                schema.t_user_access.c.db_lastmodified <= day_ago)),
+    ]
+
+
+def explain(engine, query):
+    """ Returns (column names, rows) of the query plan of query """
+    compiled = query.compile(bind=engine)
+    if engine.dialect.positional:
+        params = tuple([compiled.params[name] for name in compiled.positiontup])
+    else:
+        params = compiled.params
+    if engine.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    result = engine.execute(prefix + unicode(compiled), params)
+    return result.keys(), result.fetchall()
+
+
+def report(engine, title):
+    """ Prints query plans of the hot queries """
+    print "=== Query plans %s ===" % title
+    for name, query in hot_queries():
+        print "--- %s" % name
+        try:
+            keys, rows = explain(engine, query)
+        except Exception, e:
+            print "    EXPLAIN failed: %r" % e
+            continue
+        print "    " + " | ".join(keys)
+        for row in rows:
+            print "    " + " | ".join([str(v) for v in row])
+    print
+
+
+def missing_indexes(engine):
+    """ Returns list of the indexes declared in the schema that the
+        database lacks. An index counts as present if the table has an
+        index with the same name or on the same columns.
+    """
+    inspector = Inspector.from_engine(engine)
+    tables = inspector.get_table_names()
+    missing = list()
+    for table in meta.metadata.sorted_tables:
+        if table.name not in tables: # gets created with its indexes by create_all()
+            continue
+        existing = inspector.get_indexes(table.name)
+        names = set([ix['name'] for ix in existing])
+        columns = set([tuple(ix['column_names']) for ix in existing])
+        for index in table.indexes:
+            if index.name in names or tuple([c.name for c in index.columns]) in columns:
+                continue
+            missing.append(index)
+    return missing
+
+
+def stale_tables(engine):
+    """ Returns list of the staging tables whose columns differ from the schema """
+    inspector = Inspector.from_engine(engine)
+    tables = inspector.get_table_names()
+    stale = list()
+    for table in STAGING_TABLES:
+        if table.name not in tables:
+            continue
+        columns = set([col['name'] for col in inspector.get_columns(table.name)])
+        if columns != set(table.c.keys()):
+            stale.append(table)
+    return stale
+
+
+def migrate(engine, dry_run=False):
+    """ Creates the missing indexes. Returns list of their names. """
+    log = logging.getLogger(__name__)
+    created = list()
+    for index in missing_indexes(engine):
+        columns = ', '.join([c.name for c in index.columns])
+        if dry_run:
+            log.info("Would create index %s on %s(%s)" % (index.name, index.table.name, columns))
+            continue
+        log.info("Creating index %s on %s(%s)" % (index.name, index.table.name, columns))
+        timestamp = time.time()
+        index.create(bind=engine)
+        log.info("Index %s created in %0.1f seconds" % (index.name, time.time() - timestamp))
+        created.append(index.name)
+    return created
+
+
+def upgrade(engine, dry_run=False):
+    """ Creates the missing tables and indexes, reporting the query plans
+        before and after. Returns list of the names of the created indexes.
+    """
+    log = logging.getLogger(__name__)
+    meta.metadata.bind = engine
+    if dry_run:
+        for table in stale_tables(engine):
+            log.info("Would recreate table %s" % table.name)
+        tables = engine.table_names()
+        for table in meta.metadata.sorted_tables:
+            if table.name not in tables:
+                log.info("Would create table %s" % table.name)
+    else:
+        for table in stale_tables(engine):
+            log.info("Recreating table %s" % table.name)
+            table.drop(bind=engine)
+        meta.metadata.create_all(checkfirst=True)
+
+    report(engine, 'before migration')
+    created = migrate(engine, dry_run)
+    if not created:
+        print "No indexes created."
+        return created
+    report(engine, 'after migration')
+    return created
+
+
+def main():
+    from infocache.utils import init_config
+    import infocache.utils.config_parser as config_parser
+
+    parser = OptionParser(usage="usage: %prog [options]", version="%prog " + __version__)
+    parser.add_option("", "--config_file", action="store",
+        dest="config_file", type="string",
+        default="/opt/smscg/infocache/etc/config.ini",
+        help="File holding the smscg specific configuration for this site (default=%default)")
+    parser.add_option("", "--dry_run", action="store_true",
+        dest="dry_run", default=False,
+        help="Only report query plans and missing indexes")
+    options, args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_config(options.config_file)
+    engine = sa.engine_from_config(config_parser.config.get(), 'sqlalchemy_infocache.')
+    upgrade(engine, options.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
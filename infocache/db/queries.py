@@ -0,0 +1,64 @@
+"""
+Queries of the job records done by the reconciliation of the
+advertised jobs (see infocache.gris.reconcile). They are defined
+here, so the migration tool can explain them without depending on
+the GRIS layer, and the job archive can skip the listed jobs.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sqlalchemy as sa
+
+from infocache.db import schema
+
+
+JOB_FIN_STATES = ['LOST',
+            'FIN_DELETED',
+            'FLD_DELETED',
+            'KIL_DELETED',
+            'FIN_FETCHED',
+            'KIL_FETCHED',
+            'FLD_FETCHED']  # Job states in DB considered final
+
+# DB states of jobs that are not swept once they disappear from the GRIS
+UNSWEPT_STATES = JOB_FIN_STATES + ['DELETED']
+
+
+def prefetch_query(hostname):
+    """ Returns select of the state of the job records of cluster hostname """
+    t_job = schema.t_job
+    return sa.select([t_job.c.global_id, t_job.c.status, t_job.c.sessiondir_erase_time],
+                t_job.c.cluster_name == hostname)
+
+
+def lookup_query(global_ids):
+    """ Returns select of the state of the job records of global_ids """
+    t_job = schema.t_job
+    return sa.select([t_job.c.global_id, t_job.c.status, t_job.c.sessiondir_erase_time],
+                t_job.c.global_id.in_(global_ids))
+
+
+def gone_jobs(hostname):
+    """ Returns where clause of the job records of cluster hostname that get
+        swept, i.e. that are neither staged as seen (in the current cycle)
+        nor final
+    """
+    t_job = schema.t_job
+    t_seen = schema.t_job_seen
+    return sa.and_(t_job.c.cluster_name == hostname,
+                ~t_job.c.status.in_(UNSWEPT_STATES),
+                ~t_job.c.global_id.in_(sa.select([t_seen.c.global_id],
+                    sa.and_(t_seen.c.cluster_name == hostname, t_seen.c.listed == False))))
+
+
+def listed_jobs():
+    """ Returns where clause of the job records the GRIS of their cluster
+        still lists, i.e. whose ids the last complete cycle kept in 'job_seen'
+    """
+    t_job = schema.t_job
+    t_seen = schema.t_job_seen
+    return sa.exists([t_seen.c.global_id], sa.and_(t_seen.c.cluster_name == t_job.c.cluster_name,
+                t_seen.c.global_id == t_job.c.global_id, t_seen.c.listed == True))
@@ -0,0 +1,261 @@
+"""
+Read-only views of the cluster, queue and job records for the
+Gridmonitor. The views implement the ClusterApi, QueueApi and JobApi
+interfaces like NGCluster, NGQueue and NGJob, but are backed by a
+plain result tuple instead of a mapped ORM object:
+
+- only the requested columns get loaded,
+- encoded (list) columns get decoded on first access only,
+- no identity map, no change tracking.
+
+Columns can also be read as attributes (e.g. job.status), which
+returns the raw column value like the ORM objects do. The queues of
+a cluster view are loaded along with it (one query for all clusters),
+unless not needed.
+The query helpers below return the views in bulk, e.g.
+
+    jobs = readers.cluster_jobs(session, 'ce.example.org',
+                columns=['global_id', 'status', 'used_wall_time'])
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sqlalchemy as sa
+
+from gridmonitor.model.api.cluster_api import ClusterApi
+from gridmonitor.model.api.queue_api import QueueApi
+from gridmonitor.model.api.job_api import JobApi
+
+from infocache.db import schema, codec
+from infocache.db.cluster import ClusterMeta
+from infocache.utils import utils
+
+
+class RowView(object):
+    """ Read-only object backed by a result tuple """
+    __slots__ = ('_values', '_index', '_decoded')
+
+    ORM_CLASS = None    # ORM class (attribute table, attribute names)
+
+    def __init__(self, values, index):
+        """ values -- tuple of column values
+            index -- dict column name -> position in values (shared by
+                     all views of a query)
+        """
+        self._values = values
+        self._index = index
+        self._decoded = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError("Column '%s' was not loaded" % name)
+
+    def get_attribute_names(self):
+        return self.ORM_CLASS.ATTRIBUTES.keys()
+
+    def get_attribute_values(self, name):
+        """ returns a list (can be empty). Raises AttributeError if
+            the column of name was not loaded.
+        """
+        value = getattr(self, name)
+        if not value:
+            return []
+        if name not in self.ORM_CLASS.TABLE.encoded:
+            return [value]
+        if self._decoded is None:
+            self._decoded = dict()
+        if not self._decoded.has_key(name):
+            self._decoded[name] = codec.decode(value)
+        return self._decoded[name]
+
+
+class ClusterView(RowView, ClusterApi):
+    """ Read-only NGCluster """
+    __slots__ = ('_queues',)
+    ORM_CLASS = schema.NGCluster
+
+    def __init__(self, values, index):
+        RowView.__init__(self, values, index)
+        self._queues = None
+
+    def _get_queues(self):
+        if self._queues is None:
+            raise AttributeError("Queues were not loaded")
+        return self._queues
+
+    # QueueViews of the cluster, like NGCluster.queues
+    queues = property(_get_queues)
+
+    def get_name(self):
+        return self.get_attribute_values('hostname')[0]
+
+    def get_alias(self):
+        aliases = self.get_attribute_values('alias')
+        if aliases:
+            return aliases[0]
+        return self.get_attribute_values('hostname')[0]
+
+    def is_blacklisted(self):
+        return self.blacklisted
+
+    def get_status(self):
+        return self.status
+
+    def get_db_lastmodified(self):
+        return self.db_lastmodified
+
+    def get_response_time(self):
+        return self.response_time
+
+    def get_processing_time(self):
+        return self.processing_time
+
+    def get_metadata(self):
+        """ Returns ClusterMeta object for this record """
+        metadata = ClusterMeta(self.status)
+        metadata.set_db_lastmodified(self.db_lastmodified)
+        metadata.set_response_time(self.response_time)
+        metadata.set_processing_time(self.processing_time)
+        if self.blacklisted:
+            metadata.blacklisting()
+        else:
+            metadata.whitelisting()
+        return metadata
+
+
+class QueueView(RowView, QueueApi):
+    """ Read-only NGQueue """
+    __slots__ = ()
+    ORM_CLASS = schema.NGQueue
+
+    def get_name(self):
+        return self.get_attribute_values('name')[0]
+
+    def get_cname(self):
+        """ returns a 'cannonical' representation of the
+            name of the queue (can be used unchanged within a URL).
+        """
+        return utils.str_cannonize(self.get_name())
+
+
+class JobView(RowView, JobApi):
+    """ Read-only NGJob """
+    __slots__ = ()
+    ORM_CLASS = schema.NGJob
+
+    def get_globalid(self):
+        return self.get_attribute_values('global_id')[0]
+
+    def get_globalowner(self):
+        return self.get_attribute_values('global_owner')[0]
+
+    def get_status(self):
+        return self.get_attribute_values('status')[0]
+
+    def get_jobname(self):
+        return self.get_attribute_values('job_name')[0]
+
+    def get_exitcode(self):
+        code = self.get_attribute_values('exit_code')
+        if code:
+            return code[0]
+        return None
+
+    def get_cluster_name(self):
+        return self.get_attribute_values('cluster_name')[0]
+
+    def get_queue_name(self):
+        return self.get_attribute_values('queue_name')[0]
+
+    def get_usedwalltime(self):
+        return self.get_attribute_values('used_wall_time')[0]
+
+
+def load(session, view_class, table, where=None, columns=None, order_by=None, limit=None):
+    """ Returns list of view_class objects of the records of table.
+
+        where -- sqlalchemy clause (None: all records)
+        columns -- names of the columns to load (None: all). The primary
+                   key columns are always loaded.
+        order_by -- column(s) to order by
+        limit -- max number of records
+    """
+    if columns:
+        names = [col.name for col in table.primary_key]
+        names += [name for name in columns if name not in names]
+        cols = [table.c[name] for name in names]
+    else:
+        cols = list(table.c)
+    query = sa.select(cols, where)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    if limit:
+        query = query.limit(limit)
+
+    index = dict([(col.name, i) for i, col in enumerate(cols)])
+    return [view_class(tuple(row), index) for row in session.execute(query)]
+
+
+def clusters(session, where=None, columns=None, order_by=None, queue_columns=None,
+        load_queues=True):
+    """ Returns ClusterViews (see load()), with their queues unless
+        load_queues is False.
+
+        queue_columns -- names of the queue columns to load (None: all)
+    """
+    views = load(session, ClusterView, schema.t_cluster, where, columns, order_by)
+    if not views or not load_queues:
+        return views
+    t_queue = schema.t_queue
+    if where is None:
+        queue_where = None
+    else:
+        queue_where = t_queue.c.hostname.in_([view.hostname for view in views])
+    cluster_queues = dict([(view.hostname, list()) for view in views])
+    for queue in load(session, QueueView, t_queue, queue_where, queue_columns, t_queue.c.name):
+        if cluster_queues.has_key(queue.hostname):
+            cluster_queues[queue.hostname].append(queue)
+    for view in views:
+        view._queues = cluster_queues[view.hostname]
+    return views
+
+
+def active_clusters(session, columns=None, queue_columns=None):
+    """ Returns ClusterViews of the active clusters, ordered by hostname """
+    t_cluster = schema.t_cluster
+    return clusters(session, t_cluster.c.status == 'active', columns, t_cluster.c.hostname,
+                queue_columns)
+
+
+def queues(session, hostname=None, columns=None):
+    """ Returns QueueViews of all queues or of the queues of cluster hostname """
+    t_queue = schema.t_queue
+    where = None
+    if hostname:
+        where = t_queue.c.hostname == hostname
+    return load(session, QueueView, t_queue, where, columns, t_queue.c.name)
+
+
+def jobs(session, where=None, columns=None, order_by=None, limit=None):
+    """ Returns JobViews (see load()) """
+    return load(session, JobView, schema.t_job, where, columns, order_by, limit)
+
+
+def cluster_jobs(session, hostname, status=None, columns=None, limit=None):
+    """ Returns JobViews of the jobs of cluster hostname, optionally
+        only those in status (a status or list of states).
+    """
+    t_job = schema.t_job
+    where = t_job.c.cluster_name == hostname
+    if isinstance(status, basestring):
+        where = sa.and_(where, t_job.c.status == status)
+    elif status:
+        where = sa.and_(where, t_job.c.status.in_(status))
+    return jobs(session, where, columns, limit=limit)
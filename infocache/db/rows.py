@@ -0,0 +1,126 @@
+"""
+Lightweight row records for the write path. The GRIS information
+gets converted straight from the arclib objects into __slots__
+records of the job, queue and cluster tables, i.e. without creating
+(instrumented) ORM objects, which are only needed by the readers.
+
+A record behaves like a dict of the columns that got assigned (the
+same keys bulk.orm2row() returns for an ORM object), so it can be
+handed to the Core statements of infocache.db.bulk and
+infocache.db.upsert as is. It takes a fraction of the memory of a
+dict, which matters for the job rows waiting to be written.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+from infocache.db import schema
+from infocache.db.cluster import ClusterMeta
+
+
+_UNSET = object()  # marks unassigned slots
+
+
+class Row(object):
+    """ Base class of the row records. Unassigned columns are
+        missing (and not None).
+    """
+    __slots__ = ()
+    COLUMNS = ()    # column names in table order
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return hasattr(self, name)
+
+    has_key = __contains__
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def keys(self):
+        return [name for name, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        items = list()
+        for name in self.COLUMNS:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                items.append((name, value))
+        return items
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def values(self):
+        return [value for name, value in self.items()]
+
+    def as_tuple(self):
+        """ Returns column values in table order (None if unassigned) """
+        return tuple([getattr(self, name, None) for name in self.COLUMNS])
+
+    def __getstate__(self):
+        return self.items()
+
+    def __setstate__(self, items):
+        for name, value in items:
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.items()))
+
+
+def row_class(name, table):
+    """ Returns record class with a slot per column of table """
+    columns = tuple([col.name for col in table.c])
+    return type(name, (Row,), dict(__slots__=columns, COLUMNS=columns, __module__=__name__))
+
+
+ClusterRow = row_class('ClusterRow', schema.t_cluster)
+QueueRow = row_class('QueueRow', schema.t_queue)
+JobRow = row_class('JobRow', schema.t_job)
+
+# columns ClusterMeta initialises (status, response_time etc.)
+CLUSTER_META = ClusterMeta().__dict__.items()
+
+
+def cluster_row(arc_cluster):
+    """ Returns ClusterRow of arclib cluster (like NGCluster(arc_cluster))
+
+        raises Input_Error if a value does not fit in DB schema
+    """
+    row = ClusterRow()
+    for name, value in CLUSTER_META:
+        setattr(row, name, value)
+    schema.NGCluster.TABLE.populate(row, arc_cluster)
+    return row
+
+
+def queue_row(arc_queue, hostname):
+    """ Returns QueueRow of arclib queue (like NGQueue(arc_queue, hostname)) """
+    row = QueueRow()
+    row.hostname = hostname
+    schema.NGQueue.TABLE.populate(row, arc_queue)
+    return row
+
+
+def job_row(arc_job):
+    """ Returns JobRow of arclib job (like NGJob(arc_job)) """
+    row = JobRow()
+    schema.NGJob.TABLE.populate(row, arc_job)
+    return row
@@ -11,7 +11,7 @@ __date__="4.04.2011"
 __version__="1.2.0"
 
 import sqlalchemy as sa
-from sqlalchemy.orm import mapper, relationship
+from sqlalchemy.orm import mapper, relationship, defer
 from datetime import datetime
 
 
@@ -123,6 +123,19 @@ t_job = sa.Table("job",meta.metadata,
         sa.Column("db_lastmodified", sa.types.DateTime, default=datetime.utcnow)
 )
 
+"""
+job_seen: staging table, which holds the ids of the jobs a GRIS advertised
+during the current query cycle (listed False). It allows to detect the jobs
+that disappeared from the GRIS on the database side (see 
+infocache.gris.reconcile). Once the cycle completed, its ids are kept as the
+jobs the GRIS lists (listed True), which don't get archived.
+"""
+t_job_seen = sa.Table("job_seen", meta.metadata,
+        sa.Column("cluster_name", sa.types.VARCHAR(255), primary_key=True),
+        sa.Column("global_id", sa.types.VARCHAR(255), primary_key=True),
+        sa.Column("listed", sa.types.Boolean, primary_key=True, default=False)
+)
+
 t_giis = sa.Table('giis', meta.metadata,
         sa.Column('hostname', sa.types.VARCHAR(255), primary_key=True),
         sa.Column('port', sa.types.SMALLINT),
@@ -155,6 +168,20 @@ t_user_access = sa.Table("user_access",meta.metadata,
         sa.Column("db_lastmodified",sa.types.DateTime, default=datetime.utcnow)
 )
 
+"""
+Indexes for the queries that run every polling cycle. Queries filter
+on status with '=' or IN, hence status leads the composite indexes
+that are scanned by a time range. Existing databases get the indexes
+with infocache.db.migrate.
+"""
+sa.Index('ix_job_cluster_status', t_job.c.cluster_name, t_job.c.status)       # reconcile
+sa.Index('ix_job_cluster_id', t_job.c.cluster_name, t_job.c.global_id)      # reconcile prefetch (keyset)
+sa.Index('ix_job_status_completion', t_job.c.status, t_job.c.completion_time) # rrd final_jobs
+sa.Index('ix_job_status_erase', t_job.c.status, t_job.c.sessiondir_erase_time)
+sa.Index('ix_job_status_lastmod', t_job.c.status, t_job.c.db_lastmodified)    # Cleanex
+sa.Index('ix_cluster_status', t_cluster.c.status)
+sa.Index('ix_queue_hostname', t_queue.c.hostname)
+sa.Index('ix_user_access_lastmod', t_user_access.c.db_lastmodified)
 
 
 class UserAccess(object):
@@ -172,6 +199,22 @@ class GridStats(object):
             self.gridname = gridname
 
 
+"""
+Large columns of clusters and jobs. The mappers load them with the rest 
+of the record, as the Gridmonitor lists display them. ORM queries that
+don't need them skip them with query.options(*defer_large(cls)); the
+periodic readers select the columns they need instead (see readers).
+"""
+CLUSTER_LARGE = ['owners', 'support', 'middlewares', 'runtime_environments']
+JOB_LARGE = ['errors', 'execution_nodes', 'runtime_environments']
+
+def defer_large(cls):
+    """ Returns query options deferring the large columns of NGCluster or NGJob """
+    if cls is NGCluster:
+        return [defer(name) for name in CLUSTER_LARGE]
+    return [defer(name) for name in JOB_LARGE]
+
+
 mapper(GridStats, t_gridstats)
 mapper(GiisMeta, t_giis)
 # mapper(NGJob, t_job)
@@ -0,0 +1,83 @@
+"""
+Streaming of large result sets in bounded batches, so scans over the
+job table don't hold the complete result in memory:
+
+    for global_id, status in stream.stream(session, query, key=t_job.c.global_id):
+        ...
+
+How the rows get fetched depends on the database driver:
+
+- psycopg2: server-side cursor (stream_results), fetched batch by batch
+- MySQLdb buffers every result on the client side, hence the query is
+  split into batches of LIMIT rows, ordered by the unique column key
+  (keyset pagination). Without a key the result gets buffered. An
+  index must serve the filter of the query followed by key, otherwise
+  every batch sorts all matching rows again.
+- SQLite: the cursor fetches rows lazily anyway.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+STREAM_BATCH = 1000     # default number of rows fetched per batch
+BUFFERING_DIALECTS = ['mysql']  # drivers that buffer complete results client side
+
+
+def server_side_cursors(dialect):
+    """ Returns True if dialect streams results with server-side cursors """
+    return dialect.name == 'postgresql' and dialect.driver == 'psycopg2'
+
+
+def stream(session, query, key=None, batch_size=None):
+    """ Generator of the result rows of query (sqlalchemy select), which
+        fetches at most batch_size rows at a time.
+
+        key -- unique column selected by query. Required for bounded
+               batches on databases that buffer results (MySQL), in which
+               case query must not be ordered or limited already and an
+               index must cover (filter columns, key). Rows then get
+               returned in the order of key.
+    """
+    if not batch_size:
+        batch_size = STREAM_BATCH
+    dialect = session.bind.dialect
+    if key is not None and dialect.name in BUFFERING_DIALECTS \
+            and not server_side_cursors(dialect):
+        for row in _stream_keyset(session, query, key, batch_size):
+            yield row
+        return
+
+    result = session.execute(query.execution_options(stream_results=True))
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        result.close()
+
+
+def keyset_batch(query, key, batch_size, last=None):
+    """ Returns select of the batch of query following key value last
+        (None: first batch), as run on databases that buffer results
+    """
+    batch = query.order_by(key).limit(batch_size)
+    if last is not None:
+        batch = batch.where(key > last)
+    return batch
+
+
+def _stream_keyset(session, query, key, batch_size):
+    """ Runs query once per batch, starting after the last key seen """
+    last = None
+    while True:
+        rows = session.execute(keyset_batch(query, key, batch_size, last)).fetchall()
+        for row in rows:
+            yield row
+        if len(rows) < batch_size:
+            break
+        last = rows[-1][key]
@@ -0,0 +1,96 @@
+"""
+Dialect-aware bulk upsert for the infocache tables. Rows get written
+with a single INSERT that updates the existing record on a primary
+key conflict:
+
+    MySQL              INSERT ... ON DUPLICATE KEY UPDATE
+    SQLite (>=3.24),
+    PostgreSQL (>=9.5) INSERT ... ON CONFLICT (pk) DO UPDATE
+
+The rows are handed to the driver with executemany() in batches of
+bulk.BATCH_SIZE rows. Other databases fall back to bulk.save_row(),
+i.e. an UPDATE and, if nothing matched, an INSERT per row.
+
+Compared to session.merge() this saves the SELECT per row and the
+ORM unit of work.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sqlalchemy as sa
+from sqlalchemy.sql.expression import Insert
+from sqlalchemy.ext.compiler import compiles
+
+from infocache.db import bulk
+
+
+class Upsert(Insert):
+    """ INSERT, which updates update_columns of the existing record
+        on a primary key conflict (does nothing if update_columns is empty).
+    """
+
+    def __init__(self, table, update_columns):
+        Insert.__init__(self, table)
+        self.update_columns = update_columns
+
+
+@compiles(Upsert, 'mysql')
+def _compile_mysql(upsert, compiler, **kw):
+    columns = upsert.update_columns
+    if not columns: # no-op update, makes the duplicate key a non-error
+        columns = [list(upsert.table.primary_key)[0].name]
+    quote = compiler.preparer.quote_identifier
+    assignments = ['%s = VALUES(%s)' % (quote(name), quote(name)) for name in columns]
+    return compiler.visit_insert(upsert) + ' ON DUPLICATE KEY UPDATE ' + ', '.join(assignments)
+
+
+@compiles(Upsert, 'sqlite')
+@compiles(Upsert, 'postgresql')
+def _compile_on_conflict(upsert, compiler, **kw):
+    quote = compiler.preparer.quote_identifier
+    pk = ', '.join([quote(col.name) for col in upsert.table.primary_key])
+    if not upsert.update_columns:
+        return compiler.visit_insert(upsert) + ' ON CONFLICT (%s) DO NOTHING' % pk
+    assignments = ['%s = excluded.%s' % (quote(name), quote(name))
+                    for name in upsert.update_columns]
+    return compiler.visit_insert(upsert) + ' ON CONFLICT (%s) DO UPDATE SET %s' % \
+        (pk, ', '.join(assignments))
+
+
+def supports_upsert(dialect):
+    """ Returns True if database supports one of the upsert statements """
+    if dialect.name == 'mysql':
+        return True
+    if dialect.name == 'sqlite':
+        return dialect.dbapi.sqlite_version_info >= (3, 24, 0)
+    if dialect.name == 'postgresql':
+        return (dialect.server_version_info or (0,)) >= (9, 5)
+    return False
+
+
+def upsert(session, table, rows, batch_size=None):
+    """ Inserts rows (list of dicts) into table or, if a record with the
+        primary key of a row exists already, updates the record with the
+        other values of the row. Column defaults only apply to inserted rows.
+
+        returns number of rows passed to the database
+    """
+    if not rows:
+        return 0
+    if not supports_upsert(session.bind.dialect):
+        for row in rows:
+            bulk.save_row(session, table, row)
+        return len(rows)
+
+    pk_names = [col.name for col in table.primary_key]
+    n = 0
+    for group in bulk.group_by_keys(rows):
+        update_columns = [name for name in sorted(group[0].keys()) if name not in pk_names]
+        stmt = Upsert(table, update_columns)
+        for batch in bulk.batches(group, batch_size):
+            session.execute(stmt, batch)
+            n += len(batch)
+    return n
@@ -6,6 +6,8 @@ class DbError(Exception):
         message -- explanation of error 
     """
     def __init__(self, expression, message):
+        # args let the exception be pickled
+        Exception.__init__(self, expression, message)
         self.expression = expression
         self.message = message
 
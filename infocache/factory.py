@@ -90,6 +90,27 @@ class DaemonFactory(object):
             kwargs['mds_vo_name'] = mds_vo_name
             kwargs['top_giis_list'] = top_giis_list
             kwargs['periodicity'] = periodicity
+            kwargs['fingerprint_file'] = config_parser.config.get('fingerprint_file')
+
+            engine = config_parser.config.get('gris_engine')
+            if engine:
+                from gris.gris2db import Gris2db
+                if engine not in Gris2db.ENGINES:
+                    self.log.error("'%s' is not a supported 'gris_engine' option. Aborting!" % (engine))
+                    sys.exit(-1)
+                kwargs['gris_engine'] = engine
+
+            for option in ['poll_interval_min', 'poll_interval_max', 'writer_threads',
+                    'job_chunk_size', 'giis_refresh_period', 'db_batch_size']:
+                _interval = config_parser.config.get(option)
+                if not _interval:
+                    continue
+                try:
+                    kwargs[option] = int(_interval)
+                except Exception:
+                    self.log.error("Could not set %s to '%s'. Please check option in %s. Aborting!"
+                        % (option, _interval, config_file))
+                    sys.exit(-1)
         
         if 'housekeeper' in d_types:
             from housekeeper import Housekeeper
@@ -106,6 +127,15 @@ class DaemonFactory(object):
             kwargs['rrd_dir'] = rrd_dir
             kwargs['plot_dir'] = plot_dir
 
+            _days = config_parser.config.get('job_archive_days')
+            if _days:
+                try:
+                    kwargs['job_archive_days'] = int(_days)
+                except Exception:
+                    self.log.error("Could not set job_archive_days to '%s'. Please check option in %s. Aborting!"
+                        % (_days, config_file))
+                    sys.exit(-1)
+
         """        
         # initialize db session before instantiating daemons
         try:
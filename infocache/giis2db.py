@@ -15,14 +15,18 @@ import arclib
 
 import time
 import logging
+import Queue
+from threading import Thread, Lock, Event
 from datetime import datetime
 
 from daemon import Daemon
 from gris.giis import NGGiis
 from gris.gris2db import Gris2db
+from gris.registry import RegistrationCache
 from errors.giis import GIISError
+from utils.breaker import CircuitBreaker
 
-from db import meta, schema
+from db import meta, schema, bulk, upsert
 
 
 class Giis2db(Daemon):
@@ -34,8 +38,10 @@ class Giis2db(Daemon):
     """
 
     DEFAULT_GIIS_PORT = 2135
-    GIIS_REFRESH_PERIOD = 5     # every x cycles GIIS list gets repopulated
-    BLACK_LIST_COUNTER = 10     # cycles a black-listed GRIS/GIIS is not checked.
+    GIIS_REFRESH_PERIOD = 5     # default: every x cycles GIIS list gets repopulated
+    PARALLEL_QUERIES = 8        # max number of GIISes queried in parallel
+    DISCOVERY_DEADLINE = 60     # max time [seconds] the GIIS discovery may take
+    GRIS_LIST_TIMEOUT = 60      # max time [seconds] a GIIS may take to list its GRIS'es
                                 
 
     def __init__(self, pidfile="/var/run/giis2db.pid", **kwargs):
@@ -45,12 +51,26 @@ class Giis2db(Daemon):
         self.top_giis_list = kwargs['top_giis_list']
         self.mds_vo_name = kwargs['mds_vo_name']
         
-        self.giis_list = list()
-        self.giis_response = dict()         # giis response times
-        self.giis_blacklisted = dict()     # blacklisted giis (servers)
+        if kwargs.get('db_batch_size'):
+            bulk.set_batch_size(kwargs['db_batch_size'])
+        self.giis_refresh_period = kwargs.get('giis_refresh_period') or \
+                    self.periodicity * Giis2db.GIIS_REFRESH_PERIOD # [seconds]
+        self.giis_list = tuple()            # snapshot of GIIS list (replaced as a whole)
+        self.giis_blacklisted = CircuitBreaker('GIIS', 
+                    base_backoff=self.giis_refresh_period)
+                                            # blacklisted giis (servers)
         self.gris_list = list()
+        self.registrations = RegistrationCache() # child GIISes per GIIS
+        self.gris_registrations = RegistrationCache() # GRIS'es per GIIS (arclib discovery)
+        self.stopped = Event()              # stops GIIS topology refresh thread
         
-        self.gris2db = Gris2db()        
+        self.gris2db = Gris2db(self.periodicity, 
+                    min_interval=kwargs.get('poll_interval_min'),
+                    max_interval=kwargs.get('poll_interval_max'),
+                    fingerprint_file=kwargs.get('fingerprint_file'),
+                    engine=kwargs.get('gris_engine', 'threaded'),
+                    writer_threads=kwargs.get('writer_threads', 1),
+                    job_chunk_size=kwargs.get('job_chunk_size', 0))
         self.log.debug("Initialization finished")
 
 
@@ -61,61 +81,193 @@ class Giis2db(Daemon):
             self.start()
         elif state == 'stop':
             self.log.info("stopping daemon...")
+            self.stopped.set()
             self.gris2db.stop()
             self.stop()
             self.log.info("stopped")
         elif state == 'restart':
             self.log.info("restarting daemon...")
+            self.stopped.set()
             self.gris2db.stop()
             self.restart()
 
+    def _parallel_worker(self, func, work, results, on_result, deadline, lock, cancelled):
+        """ Worker thread of _run_parallel(). Stops once cancelled (or at 
+            deadline), i.e. takes no more work and drops late results.
+        """
+        while not cancelled.isSet() and time.time() < deadline:
+            try:
+                key, args = work.get_nowait()
+            except Queue.Empty:
+                return
+            timestamp = time.time()
+            result, error = None, None
+            try:
+                result = func(*args)
+            except Exception, e:
+                error = e
+            lock.acquire()
+            late = cancelled.isSet() or time.time() >= deadline
+            if not late:
+                results[key] = (result, time.time() - timestamp, error)
+            lock.release()
+            if late:
+                self.log.debug("Result of %s arrived after deadline, dropped" % key)
+                return
+            if on_result and not error:
+                try:
+                    on_result(key, result)
+                except Exception, e:
+                    self.log.error("Processing result of %s failed, got %r" % (key, e))
+
+    def _run_parallel(self, func, calls, deadline, on_result=None):
+        """ Calls func(*args) for each (key, args) of calls in parallel (at most 
+            PARALLEL_QUERIES at once). Returns dict key -> (result, time it took,
+            exception) of the calls that completed before deadline (epoch).
+            Calls not started by the deadline are skipped.
+
+            on_result -- function (key, result), called by the worker thread
+                         as soon as a call succeeded before deadline (optional)
+        """
+        work = Queue.Queue()
+        for call in calls:
+            work.put(call)
+        results = dict()
+        lock = Lock()
+        cancelled = Event()
+        threads = list()
+        for n in xrange(min(Giis2db.PARALLEL_QUERIES, len(calls))):
+            tr = Thread(target=self._parallel_worker, 
+                    args=(func, work, results, on_result, deadline, lock, cancelled))
+            tr.setDaemon(True) # don't wait for hanging servers on exit
+            tr.start()
+            threads.append(tr)
+        for tr in threads:
+            tr.join(max(deadline - time.time(), 0))
+        lock.acquire()
+        cancelled.set() # late answers are ignored
+        results = dict(results)
+        lock.release()
+        return results
+
+    def _query_giis(self, host, port, mds_vo_name):
+        """ Returns tuple (Registration (child GIISes) of GIIS, cached). 
+            The GIIS gets only queried if its cached registrations (almost)
+            expired, cached is True if it was not queried.
+        """
+        reg = self.registrations.fresh(host)
+        if reg:
+            return reg, True
+        self.log.debug("Populating giis list... (%s) " % host )
+        timestamp = time.time()
+        ng = NGGiis(host, port, mds_vo_name = mds_vo_name)
+        try:
+            return self.registrations.update(host, ng.get_giis_list(), [],
+                    ng.get_valid_to(), time.time() - timestamp), False
+        finally:
+            ng.close()
+
+    def _stale_registration(self, host, registrations):
+        """ Returns last Registration of GIIS that could not be queried 
+            (or None) from registrations cache, so its GIISes respectively 
+            GRIS'es don't get lost.
+        """
+        reg = registrations.last(host)
+        if reg:
+            self.log.info("Serving registrations of GIIS %s fetched %d seconds ago" % \
+                (host, time.time() - reg.fetched))
+        return reg
+
     def _populate_giis_list(self, giislist):
         """
-        Populates/completes recursively list of GIISes, starting from given 
+        Populates/completes list of GIISes, starting from given 
         giislist of type [(host,port,mds_vo_name), ...], which should
-        contain higher order GIISes.
+        contain higher order GIISes. The GIIS hierarchy is traversed 
+        breadth-first, the GIISes of a level are queried in parallel.
+        Each GIIS is queried once, even if registered at several GIISes.
+
+        Returns tuple (list of GIISes, dict of GIIS response times)
         """
-        for host, port, mds_vo_name in giislist:
-            if self.giis_blacklisted.has_key(host): 
-                self.giis_blacklisted[host] -= 1
-                if self.giis_blacklisted[host] <= 1:
-                    self.giis_blacklisted.pop(host)
-                continue
-            try:
-                timestamp = time.time()
-		self.log.debug("Populating giis list... (%s) " % host )
-                ng = NGGiis(host, mds_vo_name = mds_vo_name)
-                self.giis_response[host] = time.time() - timestamp 
-                self.giis_list.append((host, port, mds_vo_name))
-                self._populate_giis_list(ng.get_giis_list())
-		self.log.debug("Populating giis of list done.")
-            except GIISError:
-                self.log.warn("GIIS %s %s (mds_vo_name=%s) not accessible" % (host, port, mds_vo_name))
-                self.giis_blacklisted[host] = Giis2db.BLACK_LIST_COUNTER / Giis2db.GIIS_REFRESH_PERIOD
-            except Exception, e:
-                self.log.info("Got exception %r", e)
-                self.giis_blacklisted[host] = Giis2db.BLACK_LIST_COUNTER / Giis2db.GIIS_REFRESH_PERIOD
-            finally:
-                if ng:
-                    ng.close()
+        giis_list = list()
+        giis_response = dict()
+        timestamp = time.time()
+        deadline = timestamp + Giis2db.DISCOVERY_DEADLINE
+        visited = set()
+        level = giislist
+        depth = 0
+        while level:
+            if time.time() >= deadline:
+                self.log.warn("GIIS discovery deadline (%d secs) exceeded, %d GIISes not queried" % \
+                    (Giis2db.DISCOVERY_DEADLINE, len(level)))
+                break
+            todo = list()
+            stale = list()
+            for host, port, mds_vo_name in level:
+                if host in visited:
+                    continue
+                visited.add(host)
+                if not self.giis_blacklisted.allow(host, (host, int(port))): 
+                    stale.append((host, port, mds_vo_name))
+                else:
+                    todo.append((host, port, mds_vo_name))
+
+            results = self._run_parallel(self._query_giis, 
+                [(giis[0], giis) for giis in todo], deadline)
+            level = list()
+            for host, port, mds_vo_name in todo:
+                if not results.has_key(host):
+                    self.log.warn("GIIS %s %s (mds_vo_name=%s) did not answer before deadline" % \
+                        (host, port, mds_vo_name))
+                    self.giis_blacklisted.failure(host)
+                    stale.append((host, port, mds_vo_name))
+                    continue
+                result, response_time, error = results[host]
+                self.log.debug("Query of GIIS %s took %s seconds" % (host, response_time))
+                if isinstance(error, GIISError):
+                    self.log.warn("GIIS %s %s (mds_vo_name=%s) not accessible" % (host, port, mds_vo_name))
+                    self.giis_blacklisted.failure(host)
+                    stale.append((host, port, mds_vo_name))
+                elif error:
+                    self.log.info("Got exception %r", error)
+                    self.giis_blacklisted.failure(host)
+                    stale.append((host, port, mds_vo_name))
+                else:
+                    reg, cached = result
+                    giis_response[host] = reg.response_time
+                    self.giis_blacklisted.success(host)
+                    giis_list.append((host, port, mds_vo_name))
+                    level.extend(reg.giis_list)
+
+            for host, port, mds_vo_name in stale:
+                reg = self._stale_registration(host, self.registrations)
+                if reg:
+                    giis_response[host] = reg.response_time
+                    giis_list.append((host, port, mds_vo_name))
+                    level.extend(reg.giis_list)
+            depth += 1
+        self.log.info("Discovered %d GIISes (%d levels) in %s seconds" % \
+            (len(giis_list), depth, time.time() - timestamp))
+        return giis_list, giis_response
             
     def _refresh_giis_list(self):
-        """ refreshes GIIS servers list"""
-        del(self.giis_list)
-        self.giis_list = list()
-        self.giis_response = dict()
-        self._populate_giis_list(self.top_giis_list)
-
+        """ refreshes GIIS servers list. The new list gets published 
+            as a whole (tuple), i.e. readers of self.giis_list always 
+            see a complete snapshot.
+        """
         timestamp = datetime.utcnow()
+        giis_list, giis_response = self._populate_giis_list(self.top_giis_list)
+        self.giis_list = tuple(giis_list)
+
         session = meta.Session()
-        for g_host, g_port, g_mds_vo_name in self.giis_list:
+        rows = list()
+        for g_host, g_port, g_mds_vo_name in giis_list:
             self.log.debug(" %s %s %s" % (g_host, g_port, g_mds_vo_name))
             giis = schema.GiisMeta(g_host, g_port, g_mds_vo_name)
-            giis.set_response_time(self.giis_response[g_host])
-            session.merge(giis)
+            giis.set_response_time(giis_response[g_host])
+            rows.append(bulk.orm2row(giis, schema.t_giis))
+        upsert.upsert(session, schema.t_giis, rows)
       
-        _tmpl = list() 
-        for g_host in self.giis_blacklisted.keys():
+        for g_host in self.giis_blacklisted.open_hosts():
             self.log.debug("Blacklisted: %s" % g_host)
             giis = session.query(schema.GiisMeta).filter_by(hostname = g_host).first()
             if giis:
@@ -123,13 +275,9 @@ class Giis2db(Daemon):
                 giis.blacklisting()
                 giis.set_db_lastmodified()
                 session.add(giis)
-            else:
-                _tmpl.append(g_host) # clean up later
+            else: # keep its breaker state (backoff), there is just nothing to update
                 self.log.debug("Did not exist in DB.... skipping")
 
-        for g_host in _tmpl:
-            self.giis_blacklisted.pop(g_host)
-
 
         for giis in session.query(schema.GiisMeta).filter(schema.GiisMeta.db_lastmodified <  timestamp):
             giis.set_status('inactive')
@@ -138,45 +286,114 @@ class Giis2db(Daemon):
 
         session.commit()
 
+    def _refresh_giis_topology(self):
+        """ Refreshes GIIS servers list every giis_refresh_period 
+            seconds (background thread) until stopped.
+        """
+        while not self.stopped.isSet():
+            self.stopped.wait(self.giis_refresh_period)
+            if self.stopped.isSet():
+                break
+            try:
+                self._refresh_giis_list()
+            except Exception, e:
+                self.log.error("GIIS refresh: Got exception %r, keeping previous GIIS list", e)
+                meta.Session().rollback()
+
+    def _get_cluster_resources(self, g_host, g_port, g_mds_vo_name):
+        """ Returns list of GRIS URLs (arclib.URL) arclib discovers at GIIS """
+        giis_url = arclib.URL(('ldap://%s:%s/o=grid/mds-vo-name=%s') % \
+            (g_host, g_port, g_mds_vo_name))
+        return [url for url in arclib.GetClusterResources(giis_url)]
+
+    def _query_gris_urls(self, g_host, g_port, g_mds_vo_name):
+        """ Returns tuple (list of GRIS URLs (arclib.URL) advertised by GIIS, 
+            cached). The GRIS list is cached as long as the registrations of
+            the GIIS are, cached is True if the GIIS was not queried.
+        """
+        reg = self.gris_registrations.fresh(g_host)
+        if reg:
+            return reg.gris_list, True
+        self.log.debug("Updating GRIS'es announced by '%s'" % g_host) 
+        timestamp = time.time()
+        urls = self._get_cluster_resources(g_host, g_port, g_mds_vo_name)
+        giis_reg = self.registrations.fresh(g_host)
+        reg = self.gris_registrations.update(g_host, [], urls, 
+                giis_reg and giis_reg.expires, time.time() - timestamp)
+        return reg.gris_list, False
+
+    def _gris_urls_arrived(self, g_host, result):
+        """ Hands GRIS'es over to gris2db as soon as a GIIS listed them """
+        urls, cached = result
+        self.gris2db.add_urls(urls)
+
     def _refresh_gris_list(self):
-        """ Repopulates list of GRIS'es """
+        """ Repopulates list of GRIS'es. All GIISes get queried in parallel
+            and the GRIS'es of a GIIS get scheduled for polling as soon as 
+            it answered. GIISes whose registrations have been cached and are
+            still valid are not queried at all. For a GIIS that fails (or 
+            times out) the GRIS'es it advertised last time are taken.
+        """
 
-        if not self.giis_list:
+        giis_list = self.giis_list # snapshot, might get replaced meanwhile
+        if not giis_list:
             self.log.warn("No GIISes around, falling back to 'old' GRIS'es list") 
-        else:
-            self.gris_list = list()
-            
-            session = meta.Session()
-            for g_host, g_port, g_mds_vo_name  in self.giis_list:
-                db_giis = session.query(schema.GiisMeta).filter_by(hostname = g_host).first()
-                self.log.debug("Updating GRIS'es announced by '%s'" % db_giis.hostname) 
-                timestamp = time.time()
-                giis_url = arclib.URL(('ldap://%s:%s/o=grid/mds-vo-name=%s') % \
-                    (g_host, g_port, g_mds_vo_name))
-                
-                gris_urls = arclib.GetClusterResources(giis_url)
-                proc_time = time.time() - timestamp
-                self.log.debug("Query of GIIS for GRIS URLs took %s seconds" % proc_time)
-                db_giis.set_processing_time(proc_time)
-                db_giis.set_db_lastmodified()
-                session.add(db_giis)
-                for gris_url in  gris_urls:
-                    if gris_url not in self.gris_list:
-                        self.gris_list.append(gris_url)
-            session.commit()
+            return
+
+        deadline = time.time() + Giis2db.GRIS_LIST_TIMEOUT
+        results = self._run_parallel(self._query_gris_urls, 
+                [(giis[0], giis) for giis in giis_list 
+                    if not self.giis_blacklisted.is_open(giis[0])], 
+                deadline, self._gris_urls_arrived)
+
+        gris_urls = dict()  # (host, port) -> arclib.URL
+        rows = list()       
+        now = datetime.utcnow()
+        for g_host, g_port, g_mds_vo_name in giis_list:
+            urls = None
+            if not results.has_key(g_host):
+                if not self.giis_blacklisted.is_open(g_host):
+                    self.log.warn("GIIS %s did not list its GRIS'es within %d seconds" % \
+                        (g_host, Giis2db.GRIS_LIST_TIMEOUT))
+            else:
+                result, proc_time, error = results[g_host]
+                if error:
+                    self.log.warn("Could not get GRIS'es of GIIS %s, got %r" % (g_host, error))
+                else:
+                    urls, cached = result
+                    if not cached: # answers of the cache would spoil the RRD of the GIIS
+                        self.log.debug("Query of GIIS for GRIS URLs took %s seconds" % proc_time)
+                        rows.append(dict(hostname=g_host, processing_time=proc_time, 
+                                db_lastmodified=now))
+            if urls is None:
+                reg = self._stale_registration(g_host, self.gris_registrations)
+                urls = reg and reg.gris_list or []
+            for gris_url in urls:
+                gris_urls[(gris_url.Host(), gris_url.Port())] = gris_url
+        self.gris_list = gris_urls.values()
+
+        session = meta.Session()
+        bulk.bulk_update(session, schema.t_giis, rows)
+        session.commit()
 
     def run(self):
+        self.stopped.clear()
         self.gris2db.start() 
-        cycle = 1
+        try:
+            self._refresh_giis_list()
+        except Exception, e:
+            self.log.error("GIIS refresh: Got exception %r", e)
+            meta.Session().rollback()
+        tr = Thread(target=self._refresh_giis_topology)
+        tr.setDaemon(True)
+        tr.start()
+
         while True:
             try:
                 self.log.info("New 'caching' cycle run.")
-                cycle -= 1
                 timestamp = time.time()
-                if not self.giis_list or cycle <= 1: 
-                    cycle = Giis2db.GIIS_REFRESH_PERIOD
-                    self._refresh_giis_list() 
-                self._refresh_gris_list()            
+                self._refresh_gris_list() # GRIS'es get scheduled as GIISes answer
+                # all GIISes answered -> unschedule/deactivate clusters not advertised anymore
                 self.gris2db.add_urls2queue(self.gris_list)
                 self.log.debug("Refreshed GRISes list")
                 proctime = time.time() - timestamp
@@ -9,7 +9,7 @@ import logging
 from infocache.utils.common import LDAPCommon
 from infocache.errors.gris import *
 
-from infocache.db import meta, schema
+from infocache.db import meta, schema, bulk, upsert
 
 class ClusterAccess(object, LDAPCommon):
     """ Class to query users which are
@@ -119,7 +119,9 @@ class ClusterAccess(object, LDAPCommon):
 
             if allowed_users:
                 session = meta.Session()
+                rows = list()
                 for dn in allowed_users:
                     ua = schema.UserAccess(dn, self.hostname, queuename)
-                    ua = session.merge(ua)
+                    rows.append(bulk.orm2row(ua, schema.t_user_access))
+                upsert.upsert(session, schema.t_user_access, rows)
             session.commit()
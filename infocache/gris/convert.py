@@ -0,0 +1,83 @@
+"""
+Conversion of the cluster, queue and job information of a GRIS into
+DB rows (see infocache.db.rows), which are ready for bulk insert.
+
+The conversion runs in the calling thread. Shipping the information
+to worker processes instead costs the polling process more CPU time
+(copying the unpicklable arclib objects, pickling them, unpickling the
+rows) than converting it in place, see 'python -m tests.bench convert'.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+from itertools import islice
+
+from infocache.db import rows
+
+
+def convert_records(arc_cluster, arc_jobs):
+    """ Converts cluster and job objects (arclib or alike) into DB rows.
+        Returns tuple (cluster_row, queue_rows, job_rows, rejected_job_ids).
+        job_rows is None if arc_jobs is None.
+
+        raises Input_Error if cluster/queue information does not fit in DB schema
+    """
+    cluster_row = rows.cluster_row(arc_cluster)
+
+    queue_rows = list()
+    for q in arc_cluster.queues:
+        queue_rows.append(rows.queue_row(q, arc_cluster.hostname))
+
+    if arc_jobs is None:
+        return cluster_row, queue_rows, None, []
+
+    job_rows, rejected = convert_jobs(arc_jobs)
+    return cluster_row, queue_rows, job_rows, rejected
+
+
+def convert_jobs(arc_jobs):
+    """ Converts job objects (arclib or alike) into DB rows.
+        Returns tuple (job_rows, rejected_job_ids).
+    """
+    job_rows = list()
+    rejected = list()
+    for job in arc_jobs:
+        try:
+            job_rows.append(rows.job_row(job))
+        except: # no handling
+            rejected.append(job.id)
+    return job_rows, rejected
+
+
+class JobStream(object):
+    """ Jobs of a cluster that get converted chunk by chunk while
+        being written, so the rows of all jobs are never held in
+        memory at once.
+    """
+
+    def __init__(self, arc_jobs, chunk_size):
+        """ arc_jobs -- sequence of jobs (arclib or alike), which are
+                        not copied but read chunk by chunk
+        """
+        self.jobs = arc_jobs
+        self.chunk_size = chunk_size
+        self.n_jobs = len(arc_jobs)
+
+    def __len__(self):
+        return self.n_jobs
+
+    def chunks(self):
+        """ Yields tuples (job_rows, rejected_job_ids) of at most chunk_size
+            jobs, converted once the previous chunk got written. Can only
+            be iterated once.
+        """
+        jobs = iter(self.jobs or [])
+        self.jobs = None
+        while True:
+            chunk = list(islice(jobs, self.chunk_size))
+            if not chunk:
+                break
+            yield convert_jobs(chunk)
@@ -0,0 +1,206 @@
+"""
+Event driven GRIS polling engine. An alternative to the thread pool
+of Gris2db, which blocks one thread per GRIS in synchronous arclib
+calls.
+
+A single loop thread sends the GRIS ldap searches with the
+non-blocking (asynchronous) python-ldap API and polls for their
+results, hence hundreds of GRIS queries can be in flight at once.
+Completed query results are converted into cluster/queue/job records
+(see ldapgris) by a few store threads, which hand them over to the
+database writer of Gris2db.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import logging
+import Queue
+from threading import Thread
+
+import ldap
+
+from infocache.gris.ldapgris import GRIS_BASE, GRIS_FILTER, parse_gris
+
+
+NETWORK_TIMEOUT = 10    # ldap connect timeout [seconds]
+
+
+def connect_async():
+    """ Returns True if python-ldap (libldap) connects without blocking """
+    return hasattr(ldap, 'OPT_CONNECT_ASYNC')
+
+
+def ldap_connect(gris_url):
+    """ Returns (not yet connected) ldap object for GRIS. Without 
+        connect_async() the TCP connect happens in the first search and
+        blocks the polling loop for up to NETWORK_TIMEOUT seconds.
+    """
+    conn = ldap.initialize('ldap://%s:%s' % (gris_url.Host(), gris_url.Port()))
+    conn.set_option(ldap.OPT_NETWORK_TIMEOUT, NETWORK_TIMEOUT)
+    if connect_async(): # connect won't block the loop
+        conn.set_option(ldap.OPT_CONNECT_ASYNC, ldap.OPT_ON)
+    return conn
+
+
+class GrisQuery(object):
+    """ Asynchronous ldap search of a GRIS """
+
+    def __init__(self, gris_url, conn, due_time):
+        self.gris_url = gris_url
+        self.hostname = gris_url.Host()
+        self.conn = conn
+        self.due_time = due_time
+        self.started = time.time()
+        self.first_result = None    # arrival time of first result
+        self.finished = None        # arrival time of last result
+        self.entries = list()
+        self.msgid = conn.search_ext(GRIS_BASE, ldap.SCOPE_SUBTREE, GRIS_FILTER)
+
+    def poll(self):
+        """ Collects results that arrived so far (without blocking).
+            Returns True if results arrived.
+        """
+        progressed = False
+        while not self.finished:
+            rtype, rdata = self.conn.result(self.msgid, 0, 0)
+            if rtype is None:
+                break
+            progressed = True
+            now = time.time()
+            if self.first_result is None:
+                self.first_result = now
+            if rtype == ldap.RES_SEARCH_RESULT:
+                self.finished = now
+            elif rtype == ldap.RES_SEARCH_ENTRY:
+                self.entries.extend(rdata)
+        return progressed
+
+    def close(self):
+        try:
+            self.conn.unbind()
+        except Exception:
+            pass
+
+
+class AsyncGrisPoller(object):
+    """ Polls the GRIS'es handed out by the scheduler of gris2db with
+        non-blocking ldap searches. Queue time, response time and
+        blacklisting behave like for the threaded engine of Gris2db.
+    """
+
+    MAX_IN_FLIGHT = 200     # max number of concurrent GRIS queries
+    QUERY_TIMEOUT = 300     # max time [seconds] a GRIS query may take
+    IDLE_SLEEP = 0.05       # sleep time [seconds] of loop if nothing happened
+    STORE_THREADS = 4       # number of threads converting query results
+    STORE_QUEUE_SIZE = 50   # max number of query results waiting to be stored
+
+    def __init__(self, gris2db, connect=ldap_connect):
+        """ gris2db -- Gris2db instance (scheduler, blacklist and DB writes)
+            connect -- factory of ldap objects
+        """
+        self.log = logging.getLogger(__name__)
+        self.gris2db = gris2db
+        self.connect = connect
+        self.in_flight = dict()     # hostname -> GrisQuery
+        self.store_q = Queue.Queue(AsyncGrisPoller.STORE_QUEUE_SIZE)
+        self.stop_threads = False
+
+    def start(self):
+        if self.connect is ldap_connect and not connect_async():
+            self.log.warn("python-ldap lacks OPT_CONNECT_ASYNC, every connect to a GRIS " \
+                "blocks the polling loop (up to %d seconds for unreachable ones)" % NETWORK_TIMEOUT)
+        self.stop_threads = False
+        Thread(target=self._loop).start()
+        for n in xrange(AsyncGrisPoller.STORE_THREADS):
+            Thread(target=self._store).start()
+
+    def stop(self):
+        self.stop_threads = True
+
+    def _failed(self, hostname, error):
+        self.log.error("Could not query cluster %s, got %r" % (hostname, error))
+        self.gris2db._add_cluster2blacklist(hostname)
+        self.gris2db.scheduler.done(hostname, None)
+
+    def _issue(self):
+        """ Sends searches to the GRIS'es that are due. """
+        scheduler = self.gris2db.scheduler
+        while len(self.in_flight) < AsyncGrisPoller.MAX_IN_FLIGHT:
+            due = scheduler.get(0)
+            if not due:
+                return
+            gris_url, due_time = due
+            hostname = gris_url.Host()
+            self.log.debug("Current queueing time: %s seconds" % (time.time() - due_time))
+            if self.gris2db._is_cluster_blacklisted(hostname):
+                scheduler.done(hostname, None)
+                continue
+            try:
+                self.in_flight[hostname] = GrisQuery(gris_url, self.connect(gris_url), due_time)
+            except Exception, e:
+                self._failed(hostname, e)
+
+    def _collect(self):
+        """ Collects results of in-flight searches. Completed searches
+            are handed to the store threads.
+            Returns True if anything happened.
+        """
+        progressed = False
+        now = time.time()
+        for hostname, query in self.in_flight.items():
+            try:
+                if query.poll():
+                    progressed = True
+            except Exception, e:
+                self.in_flight.pop(hostname)
+                query.close()
+                self._failed(hostname, e)
+                continue
+
+            if query.finished:
+                self.in_flight.pop(hostname)
+                query.close()
+                self.store_q.put(query) # blocks if store threads lag behind
+            elif now - query.started > AsyncGrisPoller.QUERY_TIMEOUT:
+                self.in_flight.pop(hostname)
+                query.close()
+                self._failed(hostname, "query timeout (%d secs)" % AsyncGrisPoller.QUERY_TIMEOUT)
+        return progressed
+
+    def _loop(self):
+        while not self.stop_threads:
+            try:
+                self._issue()
+                if not self._collect():
+                    time.sleep(AsyncGrisPoller.IDLE_SLEEP)
+            except Exception, e:
+                self.log.error("Polling loop: Got exception %r", e)
+                time.sleep(AsyncGrisPoller.IDLE_SLEEP)
+        for hostname, query in self.in_flight.items():
+            query.close()
+
+    def _store(self):
+        """ Converts and stores results of completed GRIS queries """
+        while not self.stop_threads:
+            try:
+                query = self.store_q.get(True, 30)
+            except Queue.Empty:
+                continue
+            hostname = query.hostname
+            try:
+                arc_cluster, arc_jobs = parse_gris(query.entries)
+            except Exception, e:
+                self._failed(hostname, e)
+                continue
+            del query.entries
+            response_time = query.first_result - query.started
+            fetch_time = query.finished - query.first_result
+            if not self.gris2db._store_cluster_info(hostname, arc_cluster, arc_jobs,
+                        response_time, fetch_time):
+                self.gris2db.scheduler.done(hostname, None)
+            # else rescheduled by writer once written
+
@@ -0,0 +1,168 @@
+"""
+Content fingerprints of the job, queue and cluster rows written
+to the database. A row whose fingerprint did not change since the
+previous query of the cluster needs not to be written again.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import os
+import logging
+import cPickle
+import hashlib
+from threading import Lock
+
+
+def fingerprint(row):
+    """ Returns compact (8 bytes) fingerprint of a row.
+        row -- dict of column values
+    """
+    items = row.items()
+    items.sort()
+    return hashlib.md5(repr(items)).digest()[:8]
+
+
+class FingerprintBatch(object):
+    """ Fingerprints of the rows of one kind ('job', 'cluster', ...)
+        of a cluster, collected while a cluster gets cached. The
+        batch is committed to the FingerprintCache only after the
+        rows got committed to the database.
+    """
+
+    def __init__(self, previous, generation=0):
+        self.previous = previous    # fingerprints of last committed cycle
+        self.current = dict()       # fingerprints of this cycle
+        self.generation = generation # invalidations of the cluster at begin
+        self.written = 0
+        self.skipped = 0
+
+    def record(self, key, row):
+        """ Records fingerprint of row, which gets written. """
+        self.current[key] = fingerprint(row)
+        self.written += 1
+
+    def unchanged(self, key, row):
+        """ Records fingerprint of row. Returns True if row did not
+            change since the last cycle (i.e. the write can be skipped).
+        """
+        digest = fingerprint(row)
+        self.current[key] = digest
+        if self.previous.get(key) == digest:
+            self.skipped += 1
+            return True
+        self.written += 1
+        return False
+
+    def rewrite(self, key):
+        """ The row 'key', which has been found unchanged, must be written
+            nevertheless (e.g. because its DB record vanished). All rows
+            checked from now on are considered changed as well.
+        """
+        if self.previous.get(key) == self.current.get(key):
+            self.skipped -= 1
+            self.written += 1
+        self.previous = dict()
+
+
+class FingerprintCache(object):
+    """ Keeps per cluster an in-memory map {row key: fingerprint}
+        of the rows in the database. The map can optionally be
+        persisted to a file to survive a restart of the daemon.
+    """
+
+    def __init__(self, persist_file=None):
+        self.log = logging.getLogger(__name__)
+        self.persist_file = persist_file
+        self.maps = dict()      # (hostname, kind) -> {key: fingerprint}
+        self.generations = dict() # hostname -> number of invalidations
+        self.counters = dict()  # kind -> [#written, #skipped]
+        self.lock = Lock()
+        if persist_file:
+            self.load()
+
+    def begin(self, hostname, kind):
+        """ Returns new FingerprintBatch for the rows of 'kind' of cluster """
+        self.lock.acquire()
+        batch = FingerprintBatch(self.maps.get((hostname, kind), {}),
+                    self.generations.get(hostname, 0))
+        self.lock.release()
+        return batch
+
+    def commit(self, hostname, kind, batch):
+        """ Replaces fingerprints of cluster by the ones of the (written) batch.
+            Fingerprints of rows not seen in this cycle are dropped. A batch
+            begun before the cluster got invalidated is not kept, as the
+            records it skipped might have been modified meanwhile.
+        """
+        self.lock.acquire()
+        if batch.generation == self.generations.get(hostname, 0):
+            self.maps[(hostname, kind)] = batch.current
+        else:
+            self.log.debug("Dropped %s fingerprints of %s, invalidated meanwhile" % \
+                (kind, hostname))
+        counter = self.counters.setdefault(kind, [0, 0])
+        counter[0] += batch.written
+        counter[1] += batch.skipped
+        self.lock.release()
+        self.log.debug("%s rows of %s: %d written, %d skipped (unchanged)" % \
+            (kind, hostname, batch.written, batch.skipped))
+
+    def invalidate(self, hostname):
+        """ Drops all fingerprints of a cluster, e.g. if its DB
+            records got modified by someone else.
+        """
+        self.lock.acquire()
+        for key in self.maps.keys():
+            if key[0] == hostname:
+                self.maps.pop(key)
+        self.generations[hostname] = self.generations.get(hostname, 0) + 1
+        self.lock.release()
+
+    def get_counters(self):
+        """ Returns dict kind -> (#written, #skipped) since start """
+        self.lock.acquire()
+        counters = dict()
+        for kind, (written, skipped) in self.counters.items():
+            counters[kind] = (written, skipped)
+        self.lock.release()
+        return counters
+
+    def load(self):
+        """ Loads persisted fingerprints (if any). """
+        if not os.path.isfile(self.persist_file):
+            return
+        try:
+            f = open(self.persist_file, 'rb')
+            try:
+                self.maps = cPickle.load(f)
+            finally:
+                f.close()
+            self.log.info("Loaded fingerprints of %d row sets from '%s'" % \
+                (len(self.maps), self.persist_file))
+        except Exception, e:
+            self.log.warn("Could not load fingerprints from '%s', got %r" % \
+                (self.persist_file, e))
+            self.maps = dict()
+
+    def save(self):
+        """ Persists fingerprints (if a persist_file has been set). """
+        if not self.persist_file:
+            return
+        self.lock.acquire()
+        try:
+            tmp_file = self.persist_file + '.tmp'
+            try:
+                f = open(tmp_file, 'wb')
+                try:
+                    cPickle.dump(self.maps, f, cPickle.HIGHEST_PROTOCOL)
+                finally:
+                    f.close()
+                os.rename(tmp_file, self.persist_file)
+            except Exception, e:
+                self.log.warn("Could not save fingerprints to '%s', got %r" % \
+                    (self.persist_file, e))
+        finally:
+            self.lock.release()
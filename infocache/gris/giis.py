@@ -1,14 +1,15 @@
 """
 Class for querying the Nordugrid Information system (GIIS).
 Purpose is to recursively get all (secondary) GIIS addresses.
+Expired registrations are ignored.
 """
-# Todo Check validity of ldap records (expiration time etc.)
 
 __author__ = "Placi Flury grid@switch.ch"
 __copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
 __date__ = "10.04.2011"
 __version__ = "0.2.1"
 
+import time
 import ldap
 from infocache.utils.common import LDAPCommon
 from infocache.errors.giis import GIISError, GIISConError
@@ -50,6 +51,7 @@ class NGGiis(LDAPCommon):
         self.mds_vo_name = mds_vo_name
         self.giis_server = host
         self.giis_list = []
+        self.valid_to = None    # earliest expiration of the registrations (epoch)
 
         try:
             self.ldap = ldap.initialize(host)
@@ -98,8 +100,15 @@ class NGGiis(LDAPCommon):
         if self.giis_list:
             del self.giis_list
             self.giis_list = []
+        self.valid_to = None
 
+        now = time.time()
         for rec in records:
+            if not self.is_record_valid(rec, now):
+                continue
+            valid_to = self.get_validity(rec)[1]
+            if valid_to and (not self.valid_to or valid_to < self.valid_to):
+                self.valid_to = valid_to
             name =  rec.get_attr_values("Mds-Service-hn")[0]
             port  =  rec.get_attr_values("Mds-Service-port")[0]
             suffix = rec.get_attr_values("Mds-Service-Ldap-suffix")[0]
@@ -127,6 +136,11 @@ class NGGiis(LDAPCommon):
         """ Returns list of (gris_hostname, port, base_name) pairs."""
         return self.giis_list
 
+    def get_valid_to(self):
+        """ Returns time (epoch) the first of the registrations expires 
+            or None if registrations have no expiration time. """
+        return self.valid_to
+
 
 if __name__ == "__main__":
 
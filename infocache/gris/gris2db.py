@@ -13,203 +13,377 @@ __version__ = "0.3.0"
 import logging
 import time
 import cPickle 
-import Queue
 from  threading import Lock, Thread
 from datetime import datetime
-from sqlalchemy import and_ as AND
+import sqlalchemy as sa
 
 from arclib import GetClusterInfo
 from arclib import GetClusterJobs
 
 
-from infocache.db import meta, schema
+from infocache.db import meta, schema, bulk, upsert, readers
 from infocache.db.cluster import ClusterMeta
 from infocache.errors.db import Input_Error
 from infocache.gris.statistics import NGStats
 from infocache.gris.access import ClusterAccess
+from infocache.gris.reconcile import JobReconciler, JOB_FIN_STATES
+from infocache.gris.fingerprint import FingerprintCache
+from infocache.gris.scheduler import PollScheduler
+from infocache.gris.evloop import AsyncGrisPoller
+from infocache.gris.convert import convert_records, JobStream
+from infocache.gris.writer import BatchWriter, ClusterUpdate
+from infocache.utils.breaker import CircuitBreaker, CLOSED
+from infocache.utils.tasks import TaskRunner
+from infocache.utils.utils import rss
 
 class Gris2db(object):
     
     THREAD_LIMIT = 18       # number of GRIS'es that will be queried in parallel
-    BLACK_COUNTER = 5      # number of query cylces a cluster is blacklisted
+    ENGINES = ['threaded', 'async'] # GRIS polling engines
     USER_UPDATE_PERIOD = 7200 # periodicity for updating user access lists in DB in seconds
-
-    JOB_FIN_STATES = ['LOST',
-                'FIN_DELETED',
-                'FLD_DELETED',
-                'KIL_DELETED',
-                'FIN_FETCHED',
-                'KIL_FETCHED',
-                'FLD_FETCHED']  # Job states in DB considered final
-
-    def __init__(self):
+    FINGERPRINT_SAVE_PERIOD = 600 # periodicity for persisting row fingerprints in seconds
+    QUERY_DEADLINE = 600    # time [seconds] after which a GRIS query is considered stuck
+    WATCHDOG_PERIOD = 30    # periodicity of checking for stuck GRIS queries in seconds
+
+    # cluster columns that change with every query of the GRIS
+    CLUSTER_META_COLUMNS = ['status', 'response_time', 'processing_time', 
+                'blacklisted', 'db_lastmodified']
+
+    JOB_FIN_STATES = JOB_FIN_STATES  # Job states in DB considered final
+
+    def __init__(self, periodicity=120, min_interval=None, max_interval=None,
+            fingerprint_file=None, engine='threaded', writer_threads=1,
+            job_chunk_size=0):
+        """ periodicity -- initial polling interval of a GRIS [seconds]
+            min_interval, max_interval -- bounds of adaptive polling interval [seconds]
+            fingerprint_file -- file to persist row fingerprints to (optional)
+            engine -- GRIS polling engine, either 'threaded' (THREAD_LIMIT threads
+                      doing blocking arclib queries) or 'async' (event driven
+                      engine doing non-blocking ldap queries)
+            writer_threads -- number of threads writing to the DB
+            job_chunk_size -- jobs of clusters advertising more jobs get written
+                      in chunks of job_chunk_size jobs, one transaction per 
+                      chunk (0: all jobs in one transaction)
+        """
         self.log = logging.getLogger(__name__)
-        self.processing_q = Queue.Queue(0)  # no limit to queue, the queue holds the GRISes
-                                            # that will be queried + their insertion_time
-        self.qlock = Lock()                 # processing queue lock
-        self.proc_hosts = []                # keeps track of host(names) in processing_q
-        self.blacklist = {}                 # cluster blacklist
-        self.block = Lock()                 # blacklist lock
+        self.engine = engine
+        self.poller = None                  # AsyncGrisPoller of 'async' engine
+        self.writer = BatchWriter(self, writer_threads)
+        self.job_chunk_size = job_chunk_size
+        self.scheduler = PollScheduler(periodicity, min_interval, max_interval)
+                                            # holds the GRISes that will be queried
+        self.breakers = CircuitBreaker('GRIS') # cluster blacklist
+        self.in_flight = dict()             # hostname -> start time of GRIS query
+        self.stuck = set()                  # hostnames of stuck GRIS queries
+        self.n_workers = 0                  # number of query threads
+        self.flock = Lock()                 # in-flight lock
         self.last_cycle_meta = []           # metatdata about last/previous run, used to see
                                             # whether new clusters/queues got added/removed
         self.last_users_update = time.time() - Gris2db.USER_UPDATE_PERIOD
+        self.fingerprints = FingerprintCache(fingerprint_file) # of rows written to db
+        self.active_clusters = None         # hostnames of last complete GRIS list
+        self.periodicity = periodicity
+        self.tasks = TaskRunner()           # housekeeping, statistics etc.
+        self._add_tasks()
         self.stop_threads = False
         self.log.debug("Initialization finished")
 
 
-    def _is_cluster_blacklisted(self, hostname):
-        """ check whether cluster is blacklisted. If
-            so blacklist-counter will be decreased
+    def _is_cluster_blacklisted(self, hostname, address=None):
+        """ check whether cluster is blacklisted (i.e. its circuit 
+            breaker is open). Once the backoff of a blacklisted cluster
+            expired, its GRIS gets probed at address (host, port), if given.
 
             returns True - if blacklisted.
                     False - else
         """
-        blacklisted = False
-
-        self.block.acquire()
-        if self.blacklist.has_key(hostname):
-            if self.blacklist[hostname] == 0:
-                self.blacklist.pop(hostname) 
-            else:
-                self.blacklist[hostname] -= 1
-                blacklisted = True
-        self.block.release()
-        return blacklisted 
+        return not self.breakers.allow(hostname, address)
 
 
     def _add_cluster2blacklist(self, hostname):
-        """ black-lists a cluster. A cluster is
+        """ black-lists a cluster (opens its circuit breaker). A cluster is
             only blacklisted on unexpected behavior (that's 
             different from setting the status to 'inactive'.
          """
-        self.block.acquire()
-        if not self.blacklist.has_key(hostname):
-            self.blacklist[hostname] = Gris2db.BLACK_COUNTER
-        self.block.release()
-        self.log.warn('Cluster %s has been blacklisted' % hostname)
+        self.breakers.failure(hostname)
         
            
-    def _cache_jobs(self, gris_url):
-        """ caches jobs of specified cluster. Returns
-            time it took.
+    def _write_jobs(self, session, hostname, job_rows):
+        """ writes jobs of specified cluster. Unless job_rows is a JobStream
+            nothing gets committed.
+            Returns tuple (FingerprintBatch, #jobs written, #jobs advertised).
+
+            job_rows -- job rows of the jobs advertised by the cluster or
+                        JobStream, which gets written (and committed) chunk by chunk
         """
-        session = meta.Session()
+        rss_before = rss()
+        fp_batch = self.fingerprints.begin(hostname, 'job')
+        streaming = isinstance(job_rows, JobStream)
+        reconciler = JobReconciler(session, hostname, fp_batch, streaming)
+        reconciler.begin()
+        if not streaming:
+            for row in job_rows:
+                reconciler.add(row)
+            reconciler.apply()
+            n_transactions = 1
+            max_rows = len(job_rows)
+        else:
+            n_transactions = max_rows = 0
+            for rows, rejected in job_rows.chunks():
+                for job_id in rejected:
+                    self.log.error("Job %s will be ingored as it will not fit in db schema." % job_id)
+                for row in rows:
+                    reconciler.add(row)
+                max_rows = max(max_rows, len(rows))
+                del rows
+                reconciler.apply()
+                session.commit()
+                n_transactions += 1
+        
+        # finalise db jobs that are not anymore advertized by the Grid infosys
+        reconciler.sweep()
+        rss_after = rss()
+        if rss_before is None or rss_after is None:
+            rss_delta = 'n/a'
+        else: # of the whole process, i.e. includes concurrent writers
+            rss_delta = '%+d kB' % (rss_after - rss_before)
+        self.log.info("Jobs of %s: %d advertised, %d written in %d transaction(s) " \
+            "of at most %d jobs, process RSS change during write %s" % (hostname, 
+            len(reconciler.seen), reconciler.n_inserted + reconciler.n_updated, 
+            n_transactions, max_rows, rss_delta))
+        return fp_batch, reconciler.n_inserted + reconciler.n_updated, len(reconciler.seen)
+
+    def _merge_cluster(self, session, cluster_row, fp_batch):
+        """ Writes cluster record. If only the metadata (response time etc.) 
+            changed since the last query, only the metadata columns get updated.
+        """
+        hostname = cluster_row['hostname']
+        row = dict(cluster_row)
+        meta_row = dict()
+        for name in Gris2db.CLUSTER_META_COLUMNS:
+            meta_row[name] = row.pop(name, None)
+
+        if fp_batch.unchanged(('cluster', hostname), row):
+            t_cluster = schema.t_cluster
+            res = session.execute(t_cluster.update(t_cluster.c.hostname == hostname), meta_row)
+            if res.rowcount > 0:
+                return
+            self.log.debug("Record of cluster %s vanished, rewriting it" % hostname)
+            fp_batch.rewrite(('cluster', hostname))
+        upsert.upsert(session, schema.t_cluster, [cluster_row])
+
+    def _fetch_cluster_info(self, gris_url):
+        """ Queries GRIS for cluster, queue and job information. 
+            Returns tuple (arc_cluster, arc_jobs, response time, job query time),
+            where arc_jobs is None if the jobs could not be queried.
+        """
+        timestamp = time.time()
+        arc_cluster = GetClusterInfo(gris_url)
+        response_time = time.time() - timestamp
+
         timestamp = time.time()
         try:
             arc_jobs = GetClusterJobs(gris_url)
-            arc_job_ids = list()            
+        except Exception, e:
+            self.log.error("Could not query jobs of cluster %s, got %r" % (gris_url.Host(), e))
+            arc_jobs = None
+        return arc_cluster, arc_jobs, response_time, time.time() - timestamp
 
-            for job in arc_jobs:
-                try:
-                    _new_db_job = schema.NGJob(job) # easiest way to update all job entries in db 
-                except: # no handling
-                    self.log.error("Job %s will be ingored as it will not fit in db schema." % job.id)
-                    continue
-
-                arc_job_ids.append(job.id)
-                
-                db_job = session.query(schema.NGJob).filter_by(global_id=job.id).first()
-
-                if not db_job: # case: new job
-                    session.add(_new_db_job)
-                elif db_job.status in Gris2db.JOB_FIN_STATES: # case: final db state -> don't touch
-                    continue
-                elif job.status == 'DELETED': 
-                    if db_job.status in ['FINISHED', 'KILLED', 'FAILED']:
-                        if (db_job.sessiondir_erase_time >= datetime.utcfromtimestamp(0)) and \
-                            (db_job.sessiondir_erase_time <= datetime.utcnow()): # not feched
-                            suffix = '_DELETED'
-                        else:
-                            suffix = '_FETCHED'
-                        if db_job.status == 'FINISHED':
-                            _new_db_job.status = 'FIN_' + suffix
-                        elif db_job.status == 'FAILLED':
-                            _new_db_job.status = 'FLD_' + suffix
-                        elif db_job.status == 'KILLED':
-                            _new_db_job.status = 'KIL_' + suffix
-                    else: # not in any final state
-                        _new_db_job.status = 'LOST'
-                    session.merge(_new_db_job)
-                else: # case db_job non-final, arc_job not DELETED -> upate to new state
-                    session.merge(_new_db_job)
+    def _cache_cluster_info(self, gris_url):
+        """ 'thread-save' 
+            Queries GRIS and hands its information over to the writer.
+            Returns True if information has been handed over (the writer
+            reschedules the cluster), None if the query got stuck (the
+            watchdog rescheduled the cluster) and False otherwise.
+        """
+        hostname = gris_url.Host()
+        if self._is_cluster_blacklisted(hostname, (hostname, gris_url.Port())):
+            return False
+
+        self.flock.acquire()
+        if hostname in self.stuck: # one query per cluster at a time
+            self.flock.release()
+            self.log.debug("Previous query of cluster %s is still stuck" % hostname)
+            return False
+        self.in_flight[hostname] = time.time()
+        self.flock.release()
+        try:
+            fetched = self._fetch_cluster_info(gris_url)
+        except Exception, e:
+            if self._fetch_done(hostname):
+                return None
+            self.log.error("Could not query cluster %s, got %r" % (hostname, e))
+            self._add_cluster2blacklist(hostname)
+            return False
+        if self._fetch_done(hostname): # outdated
+            return None
+        return self._store_cluster_info(hostname, *fetched)
+
+    def _fetch_done(self, hostname):
+        """ Removes in-flight record of GRIS query. Returns True if
+            the query had been stuck.
+        """
+        self.flock.acquire()
+        started = self.in_flight.pop(hostname, None)
+        was_stuck = hostname in self.stuck
+        self.stuck.discard(hostname)
+        self.flock.release()
+        if was_stuck:
+            self.log.info("Stuck query of cluster %s returned after %d seconds, " \
+                "dropping its result" % (hostname, time.time() - started))
+        return was_stuck
+
+    def _start_worker(self):
+        self.flock.acquire()
+        self.n_workers += 1
+        self.flock.release()
+        Thread(target=self._query_grises).start()
+
+    def _surplus_worker(self):
+        """ Returns True if calling worker thread is not needed anymore
+            (i.e. it got replaced while its query was stuck). 
+        """
+        self.flock.acquire()
+        try:
+            if self.n_workers > Gris2db.THREAD_LIMIT + len(self.stuck):
+                self.n_workers -= 1
+                return True
+            return False
+        finally:
+            self.flock.release()
+
+    def _watchdog(self):
+        """ Checks for stuck GRIS queries every WATCHDOG_PERIOD seconds. """
+        while not self.stop_threads:
+            time.sleep(Gris2db.WATCHDOG_PERIOD)
+            self._check_stuck()
+
+    def _check_stuck(self):
+        """ Detects GRIS queries that are stuck (e.g. hanging in arclib).
+            The cluster gets blacklisted and rescheduled, and the worker
+            thread replaced, so the number of GRIS'es queried in parallel
+            does not shrink. The result of the stuck query gets dropped
+            should it ever return.
+        """
+        now = time.time()
+        stuck = list()
+        self.flock.acquire()
+        for hostname, started in self.in_flight.items():
+            if now - started > Gris2db.QUERY_DEADLINE and hostname not in self.stuck:
+                stuck.append(hostname)
+                self.stuck.add(hostname)
+        self.flock.release()
+
+        for hostname in stuck:
+            self.log.warn("Query of cluster %s is stuck for more than %d seconds, " \
+                "replacing its worker thread" % (hostname, Gris2db.QUERY_DEADLINE))
+            self._add_cluster2blacklist(hostname)
+            self.scheduler.done(hostname, None)
+            self._start_worker()
+
+    def get_in_flight(self):
+        """ Returns dict with number of GRIS queries in flight, number of
+            stuck queries and number of query threads.
+        """
+        if self.poller:
+            return dict(in_flight=len(self.poller.in_flight), stuck=0, workers=0)
+        self.flock.acquire()
+        counts = dict(in_flight=len(self.in_flight), stuck=len(self.stuck),
+                    workers=self.n_workers)
+        self.flock.release()
+        return counts
+
+    def _store_cluster_info(self, hostname, arc_cluster, arc_jobs, response_time, fetch_time):
+        """ Converts cluster, queue and job information of a cluster
+            into DB rows and hands them over to the writer (blocks if 
+            the writer falls behind). Returns True if information has 
+            been handed over.
             
-            # update db jobs that are not anymore advertized by the Grid infosys
-            for db_job in session.query(schema.NGJob).filter(
-                AND(schema.NGJob.cluster_name == gris_url.Host(),
-                    schema.NGJob.status != 'DELETED',
-                    schema.NGJob.status != 'LOST',
-                    schema.NGJob.status != 'FIN_FETCHED',
-                    schema.NGJob.status != 'FIN_DELETED',
-                    schema.NGJob.status != 'KIL_FETCHED',
-                    schema.NGJob.status != 'KIL_DELETED',
-                    schema.NGJob.status != 'FLD_FETCHED',
-                    schema.NGJob.status != 'FLD_DELETED')).all():
-                if db_job.global_id not in arc_job_ids: # job got fetched
-                    if db_job.status == 'FINISHED':
-                        db_job.status = 'FIN_FETCHED'
-                    elif db_job.status == 'FAILLED':
-                        db_job.status = 'FLD_FETCHED'
-                    elif db_job.status == 'KILLED':
-                        db_job.status = 'KIL_FETCHED'
-                    else:
-                        db_job.status = 'LOST'
-                    #db_job.db_lastmodified = datetime.utcnow()
-                    session.add(db_job)
-                
-            session.commit()
+            fetch_time -- time it took to query the jobs
+        """
+        try:
+            timestamp = time.time()
+            if self.job_chunk_size and arc_jobs is not None and \
+                    len(arc_jobs) > self.job_chunk_size: # converted while written
+                cluster_row, queue_rows, job_rows, rejected = \
+                    convert_records(arc_cluster, None)
+                job_rows = JobStream(arc_jobs, self.job_chunk_size)
+            else:
+                cluster_row, queue_rows, job_rows, rejected = \
+                    convert_records(arc_cluster, arc_jobs)
+            fetch_time += time.time() - timestamp
         except Input_Error, er:
-            self.log.error("Could not insert jobs for cluster %s into db, got %s. Rolling back" % \
-                    (gris_url, er.message))
-            session.rollback() 
+            self.log.error("Could not convert cluster %s, got %s." % (hostname, er.message))
+            self._add_cluster2blacklist(hostname)
+            return False
         except Exception, er2:
-            self.log.error("Could not insert jobs cluster %s into db, got %r. Rolling back" % \
-                    (gris_url.Host(), er2))
-            session.rollback() 
-        finally:
-            return time.time() - timestamp
+            self.log.error("Could not convert cluster %s, got %r." % (hostname, er2))
+            self._add_cluster2blacklist(hostname)
+            return False
+
+        for job_id in rejected:
+            self.log.error("Job %s will be ingored as it will not fit in db schema." % job_id)
+        self.writer.put(ClusterUpdate(hostname, cluster_row, queue_rows, job_rows,
+                response_time, fetch_time))
+        return True
+
+    def _write_cluster_info(self, session, update):
+        """ Writes cluster, queue and job rows of a ClusterUpdate (called by
+            writer, which commits). Returns tuple (job fingerprints, cluster 
+            fingerprints, (response time, processing time, change rate)).
+        """
+        hostname = update.hostname
+        timestamp = time.time()
+        job_batch = None
+        jobs_written = jobs_advertised = 0
+        if update.job_rows is not None:
+            job_batch, jobs_written, jobs_advertised = \
+                self._write_jobs(session, hostname, update.job_rows)
+        processing_time = time.time() - timestamp + update.fetch_time
+
+        cl_meta = ClusterMeta()
+        cl_meta.set_response_time(update.response_time)
+        cl_meta.set_processing_time(processing_time)
+        cl_meta.whitelisting()
+
+        self.log.debug("Updading cluster: %s" % hostname)
+        cluster_row = update.cluster_row
+        for name in Gris2db.CLUSTER_META_COLUMNS:
+            cluster_row[name] = getattr(cl_meta, name)
+        fp_batch = self.fingerprints.begin(hostname, 'cluster')
+        self._merge_cluster(session, cluster_row, fp_batch)
+
+        queue_rows = list()
+        for row in update.queue_rows:
+            if fp_batch.unchanged(('queue', row['name']), row):
+                continue
+            row['db_lastmodified'] = datetime.utcnow()
+            queue_rows.append(row)
+        upsert.upsert(session, schema.t_queue, queue_rows)
 
-    def _cache_cluster_info(self, gris_url):
-        """ 'thread-save' """
-        if not self._is_cluster_blacklisted(gris_url.Host()):
-            session = meta.Session() 
-            try:
-
-                hostname = gris_url.Host()
-                    
-
-                timestamp = time.time()
-                arc_cluster = GetClusterInfo(gris_url)
-                arc_queues = arc_cluster.queues
-
-                cl_meta = ClusterMeta()
-                cl_meta.set_response_time(time.time() - timestamp)
-                cl_meta.set_processing_time(self._cache_jobs(gris_url))
-                cl_meta.whitelisting()
-            
-           
-                db_cluster = schema.NGCluster(arc_cluster)
-                self.log.debug("Updading cluster: %s" % db_cluster.get_name())
-                db_cluster.set_metadata(cl_meta)
-                db_cluster = session.merge(db_cluster)
-     
-                for q in arc_queues:
-                    db_queue = schema.NGQueue(q, arc_cluster.hostname)
-                    db_queue.db_lastmodified = datetime.utcnow()
-                    db_queue = session.merge(db_queue)
-                
-                session.commit()
+        n_rows = jobs_advertised + fp_batch.written + fp_batch.skipped
+        change_rate = float(jobs_written + fp_batch.written) / max(n_rows, 1)
+        return job_batch, fp_batch, (cl_meta.get_response_time(), processing_time, change_rate)
 
-            except Input_Error, er:
-                self.log.error("Could not insert cluster %s into db, got %s. Rolling back" % \
-                        (gris_url, er.message))
-                session.rollback() 
-                self._add_cluster2blacklist(arc_cluster.hostname)
-            except Exception, er2:
-                self.log.error("Could not insert cluster %s into db, got %r. Rolling back" % \
-                        (gris_url.Host(), er2))
-                
-                self._add_cluster2blacklist(arc_cluster.hostname)
-                session.rollback() 
+    def _written(self, update, written):
+        """ Called by writer once the ClusterUpdate got committed. 
+            written -- what _write_cluster_info() returned
+        """
+        job_batch, fp_batch, result = written
+        if job_batch:
+            self.fingerprints.commit(update.hostname, 'job', job_batch)
+        self.fingerprints.commit(update.hostname, 'cluster', fp_batch)
+        self.breakers.success(update.hostname)
+        self.scheduler.done(update.hostname, result)
+
+    def _write_failed(self, update, error):
+        """ Called by writer if the ClusterUpdate could not be written. """
+        if isinstance(error, Input_Error):
+            error = error.message
+        self.log.error("Could not insert cluster %s into db, got %r. Rolled back" % \
+                (update.hostname, error))
+        self._add_cluster2blacklist(update.hostname)
+        self.scheduler.done(update.hostname, None)
                  
     def _query_grises(self):
         """
@@ -218,55 +392,58 @@ class Gris2db(object):
         """
         
         while not self.stop_threads:
-            try:
-                gris_url, insert_time = self.processing_q.get(True, 30) # blocking
-            except Queue.Empty:
+            due = self.scheduler.get(30) # blocking
+            if not due:
                 continue
+            gris_url, due_time = due
 
             # start doing job
-            self.log.debug("Current queueing time: %s seconds" % (time.time() - insert_time))
-            self._cache_cluster_info(gris_url)
-
-            # end doing job
+            self.log.debug("Current queueing time: %s seconds" % (time.time() - due_time))
+            if self._cache_cluster_info(gris_url) is False:
+                self.scheduler.done(gris_url.Host(), None)
+            # else rescheduled by writer once written (by watchdog if stuck)
 
-            self.qlock.acquire()
-            host = gris_url.Host()
-            self.proc_hosts.remove(host)
-            self.qlock.release() 
+            if self._surplus_worker():
+                return
 
     def _basic_housekeeping(self, active_clusters):
         """ Do some basic 'cleanup' of DB entries. Should
             be called once per processing cycle.
             active_gris_list -- list of currently active clusters. 
         """
-        self.block.acquire()
-        blacklisted = self.blacklist.keys()
-        self.block.release()
-        
+        blacklisted = self.breakers.open_hosts()
         self.log.debug("BLACKLISTED: %r" % blacklisted)
 
         session = meta.Session()
         change = False
-        for cluster in session.query(schema.NGCluster).filter_by(status='active').all():
-            self.log.debug("checking %s" % cluster.hostname)
-            if (cluster.hostname not in active_clusters):
-                cluster.status = 'inactive'
+        deactivated = list()
+        transitions = self.breakers.pop_transitions()
+        if transitions:
+            rows = [dict(hostname=hostname, blacklisted=(state != CLOSED)) \
+                    for hostname, state in transitions.items()]
+            bulk.bulk_update(session, schema.t_cluster, rows)
+            change = True
+        t_cluster = schema.t_cluster
+        t_queue = schema.t_queue
+        active = sa.select([t_cluster.c.hostname], t_cluster.c.status == 'active')
+        for hostname, in session.execute(active).fetchall():
+            self.log.debug("checking %s" % hostname)
+            if (hostname not in active_clusters):
                 change = True
-                for q in session.query(schema.NGQueue).filter_by(hostname=cluster.hostname).all():
-                    q.status = 'inactive'
-                    q.db_lastmodified = datetime.utcnow()
-                    session.add(q) 
-                self.log.info("Deactivating cluster %s" % cluster.hostname)
-                session.add(cluster)
+                session.execute(t_cluster.update(t_cluster.c.hostname == hostname,
+                    dict(status='inactive')))
+                session.execute(t_queue.update(t_queue.c.hostname == hostname,
+                    dict(status='inactive', db_lastmodified=datetime.utcnow())))
+                self.log.info("Deactivating cluster %s" % hostname)
+                deactivated.append(hostname)
                 self.log.info("Removing users from cluster access list")
-                session.query(schema.UserAccess).filter_by(hostname=cluster.hostname).\
+                session.query(schema.UserAccess).filter_by(hostname=hostname).\
                     delete(synchronize_session='fetch')
-            if cluster.hostname in blacklisted:
-                cluster.blacklisted = True
-                change = True
-                session.add(cluster)
         if change:
             session.commit()
+        # once committed, so batches begun before get dropped by the cache
+        for hostname in deactivated:
+            self.fingerprints.invalidate(hostname)
     
     def _populate_user_access(self, _active_clusters):
         """ Queries all clusters (respectivley their queues) 
@@ -322,50 +499,81 @@ class Gris2db(object):
             
 
     
+    def add_urls(self, url_list):
+        """ Schedules GRIS URLs for polling right away (e.g. as soon
+            as a GIIS advertised them). Clusters already scheduled or
+            in flight are not added twice. Unlike add_urls2queue() no
+            cluster gets unscheduled or deactivated.
+
+            url_list -- list of cluster/Gris URLs of arclib.URL type
+        """
+        self.scheduler.add_hosts(url_list)
+
     def add_urls2queue(self, url_list):
-        """ Adding list of GRIS URLs to the processing queue. 
-            Duplicate entries are avoided.
+        """ Setting list of GRIS URLs to poll. Each GRIS gets queried
+            with its own (adaptive) polling interval. Duplicate entries 
+            are avoided. Clusters missing in url_list get deactivated
+            by the next housekeeping task run.
 
             url_list -- list of cluster/Gris URLs of arclib.URL type
         """
-        active_clusters = list()
-        self.qlock.acquire()
-        for url in url_list:
-            host = url.Host()
-            active_clusters.append(host)
-            self.log.debug("Inserting GRIS %s in processing queue", host)
-            self.block.acquire()
-            black_listed_clusters = self.blacklist.keys() 
-            self.block.release()
-            if (host not in self.proc_hosts) and (host not in black_listed_clusters):
-                self.proc_hosts.append(host)
-                self.processing_q.put((url, time.time()))
-        self.qlock.release()
-            
+        self.scheduler.update_hosts(url_list)
+        self.active_clusters = tuple([url.Host() for url in url_list]) # snapshot for tasks
+
+    def _housekeeping_task(self):
+        if self.active_clusters is None: # no complete GRIS list yet
+            return
         self.log.debug("Starting basic housekeeping")
-        self._basic_housekeeping(active_clusters)
-        
-        self.log.debug("Collecting current usage statistics")
-        self._populate_statistics()
+        self._basic_housekeeping(self.active_clusters)
 
+    def _user_access_task(self):
+        if self.active_clusters is None:
+            return
         self.log.debug("Populating User Access lists.")
-        self._populate_user_access(active_clusters)
+        self._populate_user_access(list(self.active_clusters))
+
+    def _log_metrics_task(self):
+        for kind, (written, skipped) in self.fingerprints.get_counters().items():
+            self.log.info("%s rows since start: %d written, %d skipped (unchanged)" % \
+                (kind, written, skipped))
+        self.log.debug("Polling intervals: %r" % self.scheduler.get_intervals())
+        self.log.info("DB writer: %r" % self.writer.get_stats())
+        self.log.info("GRIS queries: %r" % self.get_in_flight())
+        self.log.info("Tasks: %r" % self.tasks.get_stats())
+
+    def _add_tasks(self):
+        """ Sets up the periodic housekeeping tasks """
+        period = self.periodicity
+        self.tasks.add('housekeeping', self._housekeeping_task, period)
+        self.tasks.add('statistics', self._populate_statistics, period)
+        self.tasks.add('user_access', self._user_access_task, period)
+        self.tasks.add('fingerprints', self.fingerprints.save, 
+                Gris2db.FINGERPRINT_SAVE_PERIOD, Gris2db.FINGERPRINT_SAVE_PERIOD)
+        self.tasks.add('metrics', self._log_metrics_task, period, period)
 
-
-        
-
-        
     def stop(self):
         """ Stop all processing."""
         self.stop_threads = True
+        if self.poller:
+            self.poller.stop()
+        self.tasks.stop()
+        self.writer.stop()
 
     def start(self):
         """ start processing. """
         self.stop_threads = False
+        self.writer.start()
+        self.tasks.start()
         
+        if self.engine == 'async':
+            self.log.info("Starting event driven GRIS polling engine")
+            self.poller = AsyncGrisPoller(self)
+            self.poller.start()
+            return
+
         for n in xrange(Gris2db.THREAD_LIMIT):
-            tr = Thread(target=self._query_grises)
-            tr.start()
+            self._start_worker()
+        Thread(target=self._watchdog).start()
 
 
     def _populate_statistics(self):
@@ -377,23 +585,23 @@ class Gris2db(object):
         gstats = NGStats('SMSCG', 'grid')
         
         session = meta.Session()
-        query = session.query(schema.NGCluster)
         try:
-            for cluster in query.filter_by(status='active').all():
+            for cluster in readers.active_clusters(session, columns=NGStats.CSTATS_ATTRS,
+                    queue_columns=['status'] + NGStats.QSTATS_ATTRS):
                 cstats = NGStats(cluster.hostname, 'cluster')
 
                 for attr_name in NGStats.CSTATS_ATTRS:
-                    cval = eval("cluster.%s" % attr_name)
+                    cval = getattr(cluster, attr_name)
                     cstats.set_attribute(attr_name, cval)
                     gstats.set_attribute(attr_name, cval + gstats.get_attribute(attr_name))
 
-                for queue in cluster.queues:                
+                for queue in cluster.queues:
                     if queue.status != 'active':
                         continue
                     qstats = NGStats(queue.name, 'queue')
 
                     for attr_name in NGStats.QSTATS_ATTRS:
-                        qval = eval("queue.%s" % attr_name)
+                        qval = getattr(queue, attr_name)
                         qstats.set_attribute(attr_name, qval)
                         cstats.set_attribute(attr_name, qval + cstats.get_attribute(attr_name))
                         gstats.set_attribute(attr_name, qval + gstats.get_attribute(attr_name))
@@ -0,0 +1,242 @@
+"""
+Conversion of raw GRIS ldap entries (NorduGrid schema) into cluster,
+queue and job records. The records mimic the arclib Cluster, Queue and
+Job objects as far as the infocache ORM classes (NGCluster, NGQueue
+and NGJob) use them, so they can be passed to the ORM constructors
+instead of arclib objects. Unlike the arclib objects the records are
+plain python objects (i.e. they can be pickled).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import re
+
+from ldap.cidict import cidict
+
+from infocache.utils.common import ldap_time
+
+GRIS_BASE = "Mds-Vo-name=local,o=grid"
+GRIS_FILTER = "(|(objectClass=nordugrid-cluster)(objectClass=nordugrid-queue)(objectClass=nordugrid-job))"
+
+_VERSION_RE = re.compile(r'^(.*?)-(\d[^-]*)$')
+_FREQ_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([MG])Hz', re.IGNORECASE)
+
+
+class GrisTime(object):
+    """ Mimics arclib Time """
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+
+    def GetTime(self):
+        return self.epoch
+
+
+class GrisSoftware(object):
+    """ Mimics arclib Environment (runtime environments, middlewares etc.) """
+
+    def __init__(self, value):
+        m = _VERSION_RE.match(value)
+        if m:
+            self.name, self.version = m.groups()
+        else:
+            self.name, self.version = value, ''
+
+    def Name(self):
+        return self.name
+
+    def Version(self):
+        return self.version
+
+
+class _Record(object):
+    """ Attribute access to the values of a ldap entry """
+
+    def __init__(self, attrs, prefix):
+        self._attrs = attrs
+        self._prefix = prefix
+
+    def _values(self, name):
+        key = self._prefix + name
+        if self._attrs.has_key(key):
+            return self._attrs[key]
+        return []
+
+    def _str(self, name):
+        values = self._values(name)
+        if values:
+            return values[0]
+        return None
+
+    def _int(self, name, factor=1):
+        try:
+            return int(self._str(name)) * factor
+        except (TypeError, ValueError):
+            return None
+
+    def _bool(self, name):
+        value = self._str(name)
+        if value is None:
+            return None
+        return value.upper() in ('TRUE', 'YES', '1')
+
+    def _time(self, name):
+        """ ldap GeneralizedTime (YYYYmmddHHMMSSZ) -> GrisTime """
+        epoch = ldap_time(self._str(name))
+        if epoch is None:
+            return None
+        return GrisTime(epoch)
+
+    def _software(self, name):
+        return [GrisSoftware(v) for v in self._values(name)]
+
+
+class GrisCluster(_Record):
+    """ Cluster record (mimics arclib Cluster) """
+
+    def __init__(self, attrs):
+        _Record.__init__(self, attrs, 'nordugrid-cluster-')
+        self.hostname = self._str('name')
+        self.alias = self._str('aliasname')
+        self.comment = self._str('comment')
+        self.owners = self._values('owner')
+        self.support = self._values('support')
+        self.contact = self._str('contactstring')
+        self.location = self._str('location')
+        self.issuer_ca = self._str('issuerca')
+        self.issuer_ca_hash = self._str('issuerca-hash')
+        self.cred_expire_time = self._time('credentialexpirationtime')
+        self.architecture = self._str('architecture')
+        self.homogeneity = self._bool('homogeneity')
+        self.node_cpu = self._str('nodecpu')
+        self.node_memory = self._int('nodememory')
+        self.middlewares = self._software('middleware')
+        self.operating_systems = self._software('opsys')
+        self.lrms_config = self._str('lrms-config')
+        self.lrms_type = self._str('lrms-type')
+        self.lrms_version = self._str('lrms-version')
+        self.prelrms_queued = self._int('prelrmsqueued')
+        self.queued_jobs = self._int('queuedjobs')
+        self.total_jobs = self._int('totaljobs')
+        self.used_cpus = self._int('usedcpus')
+        self.total_cpus = self._int('totalcpus')
+        self.session_dir_free = self._int('sessiondir-free')
+        self.session_dir_total = self._int('sessiondir-total')
+        self.session_dir_lifetime = self._int('sessiondir-lifetime')
+        self.cache_free = self._int('cache-free')
+        self.cache_total = self._int('cache-total')
+        self.benchmarks = self._values('benchmark')
+        self.runtime_environments = self._software('runtimeenvironment')
+        self.queues = list()
+        del self._attrs
+
+
+class GrisQueue(_Record):
+    """ Queue record (mimics arclib Queue). CPU times are
+        converted from minutes to seconds, like arclib does.
+    """
+
+    def __init__(self, attrs):
+        _Record.__init__(self, attrs, 'nordugrid-queue-')
+        self.name = self._str('name')
+        self.comment = self._str('comment')
+        self.status = self._str('status')
+        self.scheduling_policy = self._str('schedulingpolicy')
+        self.homogeneity = self._bool('homogeneity')
+        self.node_cpu = self._str('nodecpu')
+        self.node_memory = self._int('nodememory')
+        self.cpu_freq = None
+        if self.node_cpu:
+            m = _FREQ_RE.search(self.node_cpu)
+            if m:
+                freq = float(m.group(1))
+                if m.group(2).upper() == 'G':
+                    freq *= 1000
+                self.cpu_freq = freq
+        self.max_running = self._int('maxrunning')
+        self.max_queuable = self._int('maxqueuable')
+        self.max_user_run = self._int('maxuserrun')
+        self.max_cpu_time = self._int('maxcputime', 60)
+        self.min_cpu_time = self._int('mincputime', 60)
+        self.default_cpu_time = self._int('defaultcputime', 60)
+        self.max_total_cpu_time = self._int('maxtotalcputime', 60)
+        self.max_wall_time = self._int('maxwalltime', 60)
+        self.min_wall_time = self._int('minwalltime', 60)
+        self.default_wall_time = self._int('defaultwalltime', 60)
+        self.running = self._int('running')
+        self.grid_running = self._int('gridrunning')
+        self.grid_queued = self._int('gridqueued')
+        self.local_queued = self._int('localqueued')
+        self.prelrms_queued = self._int('prelrmsqueued')
+        self.queued = self._int('queued')
+        self.total_cpus = self._int('totalcpus')
+        del self._attrs
+
+
+class GrisJob(_Record):
+    """ Job record (mimics arclib Job). CPU and wall times are
+        converted from minutes to seconds, like arclib does.
+    """
+
+    def __init__(self, attrs):
+        _Record.__init__(self, attrs, 'nordugrid-job-')
+        self.id = self._str('globalid')
+        self.owner = self._str('globalowner')
+        self.status = self._str('status')
+        self.job_name = self._str('jobname')
+        self.client_software = self._str('clientsoftware')
+        self.cluster = self._str('execcluster')
+        self.queue = self._str('execqueue')
+        self.completion_time = self._time('completiontime')
+        self.cpu_count = self._int('cpucount')
+        self.erase_time = self._time('sessiondirerasetime')
+        self.errors = self._str('errors')
+        self.execution_nodes = self._values('executionnodes')
+        self.exitcode = self._int('exitcode')
+        self.gmlog = self._str('gmlog')
+        self.proxy_expire_time = self._time('proxyexpirationtime')
+        self.queue_rank = self._int('queuerank')
+        self.requested_cpu_time = self._int('reqcputime', 60)
+        self.requested_wall_time = self._int('reqwalltime', 60)
+        self.runtime_environments = self._software('runtimeenvironment')
+        self.sstderr = self._str('stderr')
+        self.sstdin = self._str('stdin')
+        self.sstdout = self._str('stdout')
+        self.submission_time = self._time('submissiontime')
+        self.submission_ui = self._str('submissionui')
+        self.used_cpu_time = self._int('usedcputime', 60)
+        self.used_memory = self._int('usedmem')
+        self.used_wall_time = self._int('usedwalltime', 60)
+        del self._attrs
+
+
+def parse_gris(entries):
+    """ Converts the ldap entries [(dn, {attr: [values]}), ...] of a GRIS
+        into records. Returns tuple (cluster, jobs) where queues are
+        available as cluster.queues.
+
+        raises ValueError if GRIS did not advertise a cluster
+    """
+    cluster = None
+    queues = list()
+    jobs = list()
+    for dn, attrs in entries:
+        if not dn:
+            continue
+        attrs = cidict(attrs)
+        if not attrs.has_key('objectClass'):
+            continue
+        classes = [c.lower() for c in attrs['objectClass']]
+        if 'nordugrid-job' in classes:
+            jobs.append(GrisJob(attrs))
+        elif 'nordugrid-queue' in classes:
+            queues.append(GrisQueue(attrs))
+        elif 'nordugrid-cluster' in classes:
+            cluster = GrisCluster(attrs)
+    if not cluster:
+        raise ValueError("GRIS did not advertise a cluster")
+    cluster.queues = queues
+    return cluster, jobs
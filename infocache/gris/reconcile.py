@@ -0,0 +1,226 @@
+"""
+Reconciliation of the jobs advertised by a GRIS with the
+job records of the cluster stored in the database.
+
+All job records of the cluster get fetched with one (streamed) query
+and are diffed in memory against the advertised jobs. New, changed and
+finalised jobs are then written with bulk upserts (see infocache.db.upsert).
+Jobs that are not advertised anymore get finalised on the database
+side, using the job ids staged in the 'job_seen' table. The staged ids
+of the last complete cycle are kept (as listed), so the job archive
+leaves the jobs alone that the GRIS still lists.
+
+The advertised jobs can also be reconciled chunk by chunk (streaming),
+in which case no job records get prefetched and the ids of the jobs
+seen so far are kept as compact hashes only. The prefetched job records
+are kept by their hashes as well.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import logging
+import struct
+import hashlib
+from datetime import datetime
+import sqlalchemy as sa
+
+from infocache.db import schema, bulk, upsert, stream
+from infocache.db.queries import JOB_FIN_STATES, prefetch_query, lookup_query, gone_jobs
+
+
+# prefix of final DB state for jobs that got 'DELETED' on the cluster
+FINAL_PREFIX = dict(FINISHED='FIN', KILLED='KIL', FAILED='FLD')
+
+
+def job_key(global_id):
+    """ Returns compact (integer) hash of a job id """
+    if isinstance(global_id, unicode): # as read from the DB
+        global_id = global_id.encode('utf-8')
+    return struct.unpack('<q', hashlib.md5(global_id).digest()[:8])[0]
+
+
+def deleted_job_status(db_status, erase_time, now=None):
+    """ Returns final DB status of a job the cluster advertises as 'DELETED'.
+
+        db_status -- current status of the job in the DB
+        erase_time -- sessiondir erase time of the job in the DB
+    """
+    prefix = FINAL_PREFIX.get(db_status)
+    if not prefix: # not in any final state
+        return 'LOST'
+    if not now:
+        now = datetime.utcnow()
+    if erase_time and (datetime.utcfromtimestamp(0) <= erase_time <= now):
+        return prefix + '_DELETED'  # session dir erased, i.e. not fetched
+    return prefix + '_FETCHED'
+
+
+class JobReconciler(object):
+    """ Diffs the jobs advertised by a cluster against the job
+        records of the cluster in the database.
+
+        Usage: begin(), add() every advertised job row, apply(), sweep().
+        When streaming, add() and apply() get called for every chunk
+        of job rows.
+    """
+
+    LOOKUP_CHUNK = 500  # max number of ids per 'IN' clause
+
+    def __init__(self, session, hostname, fingerprints=None, streaming=False):
+        """ fingerprints -- FingerprintBatch (optional), used to skip the
+                            update of jobs that did not change.
+            streaming -- if True, the DB records are looked up per chunk
+                         instead of being prefetched
+        """
+        self.log = logging.getLogger(__name__)
+        self.session = session
+        self.hostname = hostname
+        self.fingerprints = fingerprints
+        self.streaming = streaming
+        self.known = dict()     # job_key() -> (status, sessiondir_erase_time)
+        self.seen = set()       # job_key() of advertised jobs
+        self.staged = list()    # global_ids not yet staged in 'job_seen' table
+        self.inserts = list()
+        self.updates = list()
+        self.n_inserted = 0
+        self.n_updated = 0
+        self.n_final = 0        # advertised jobs that are final in DB
+
+    def begin(self):
+        """ Drops staged ids of aborted cycles and loads the state of all 
+            job records of the cluster (unless streaming).
+        """
+        t_seen = schema.t_job_seen
+        self.session.execute(t_seen.delete(sa.and_(t_seen.c.cluster_name == self.hostname,
+            t_seen.c.listed == False)))
+        if self.streaming:
+            return
+        for global_id, status, erase_time in stream.stream(self.session,
+                            prefetch_query(self.hostname), key=schema.t_job.c.global_id):
+            self.known[job_key(global_id)] = (status, erase_time)
+
+    def add(self, row):
+        """ Diffs advertised job against its DB record.
+
+            row -- dict of job column values (see bulk.orm2row)
+        """
+        global_id = row['global_id']
+        key = job_key(global_id)
+        if key in self.seen: # advertised twice
+            return
+        self.seen.add(key)
+        self.staged.append(global_id)
+        self._classify(row)
+
+    def _classify(self, row):
+        """ Sorts row into inserts or updates """
+        key = job_key(row['global_id'])
+        if not self.known.has_key(key): # case: new job
+            self.inserts.append(row)
+            return
+
+        db_status, erase_time = self.known[key]
+        if db_status in JOB_FIN_STATES: # case: final db state -> don't touch
+            self.n_final += 1
+        elif row.get('status') == 'DELETED':
+            row['status'] = deleted_job_status(db_status, erase_time)
+            self.updates.append(row)
+        else: # case db_job non-final, arc_job not DELETED -> update to new state
+            self.updates.append(row)
+
+    def _resolve_unknown(self):
+        """ Jobs that are new for this cluster might still be recorded
+            under another cluster name. Those must be updated rather
+            than inserted.
+        """
+        new_ids = [row['global_id'] for row in self.inserts]
+        if not new_ids:
+            return
+
+        found = dict()
+        for chunk in bulk.batches(new_ids, JobReconciler.LOOKUP_CHUNK):
+            for global_id, status, erase_time in self.session.execute(lookup_query(chunk)):
+                found[job_key(global_id)] = (status, erase_time)
+        if not found:
+            return
+
+        self.log.debug("%d jobs of %s are recorded under another cluster" % \
+                (len(found), self.hostname))
+        inserts = self.inserts
+        self.inserts = list()
+        self.known.update(found)
+        for row in inserts:
+            self._classify(row)
+
+    def _skip_unchanged(self):
+        """ Drops updates of jobs that did not change since the last cycle """
+        for row in self.inserts:
+            self.fingerprints.record(job_key(row['global_id']), row)
+
+        updates = list()
+        for row in self.updates:
+            if row.get('status') in JOB_FIN_STATES: # finalised -> always write
+                updates.append(row)
+            elif not self.fingerprints.unchanged(job_key(row['global_id']), row):
+                updates.append(row)
+        self.updates = updates
+
+    def apply(self):
+        """ Writes new, changed and finalised jobs added since the last
+            call and stages their ids for the sweep.
+            returns tuple (#inserted, #updated)
+        """
+        self._resolve_unknown()
+        if self.fingerprints:
+            self._skip_unchanged()
+        now = datetime.utcnow() # the job archive delays on the last change
+        for row in self.inserts + self.updates:
+            row['db_lastmodified'] = now
+        # upsert, so a job recorded meanwhile (or removed by the cleaner)
+        # doesn't fail (or miss) the write
+        upsert.upsert(self.session, schema.t_job, self.inserts + self.updates)
+        n_ins = len(self.inserts)
+        n_upd = len(self.updates)
+        bulk.bulk_insert(self.session, schema.t_job_seen,
+            [dict(cluster_name=self.hostname, global_id=global_id, listed=False)
+                for global_id in self.staged])
+        self.log.debug("Jobs of %s: %d new, %d updated, %d final (untouched)" % \
+                (self.hostname, n_ins, n_upd, self.n_final))
+
+        self.n_inserted += n_ins
+        self.n_updated += n_upd
+        self.inserts = list()
+        self.updates = list()
+        self.staged = list()
+        if self.streaming:
+            self.known = dict()
+        return n_ins, n_upd
+
+    def sweep(self):
+        """ Finalises the DB records of the jobs the cluster does not
+            advertise anymore (i.e. that got fetched or lost):
+            FINISHED -> FIN_FETCHED, KILLED -> KIL_FETCHED,
+            FAILED -> FLD_FETCHED, any other non-final state -> LOST
+
+            returns number of finalised jobs
+        """
+        t_job = schema.t_job
+        t_seen = schema.t_job_seen
+        of_cluster = t_seen.c.cluster_name == self.hostname
+
+        status = sa.case([(t_job.c.status == 'FINISHED', 'FIN_FETCHED'),
+                        (t_job.c.status == 'KILLED', 'KIL_FETCHED'),
+                        (t_job.c.status == 'FAILED', 'FLD_FETCHED')],
+                        else_='LOST')
+        n = self.session.execute(t_job.update().where(gone_jobs(self.hostname)).\
+                values(status=status, db_lastmodified=datetime.utcnow())).rowcount
+
+        # the staged ids become the listed ones
+        self.session.execute(t_seen.delete(sa.and_(of_cluster, t_seen.c.listed == True)))
+        self.session.execute(t_seen.update(of_cluster).values(listed=True))
+        self.log.debug("Finalised %d jobs of %s that are not advertised anymore" % \
+                (n, self.hostname))
+        return n
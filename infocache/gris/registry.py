@@ -0,0 +1,77 @@
+"""
+Cache of the registrations (child GIISes and GRIS'es) advertised by
+the GIIS servers. The registrations of a GIIS are valid until the
+earliest Mds-validto time of its registration entries, hence a GIIS
+needs to be queried again only shortly before its registrations
+expire. If the GIIS can't be queried, its last registrations can
+still be served (stale) for a while.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+from threading import Lock
+
+
+class Registration(object):
+    """ Registrations advertised by a GIIS """
+
+    def __init__(self, giis_list, gris_list, expires, response_time):
+        self.giis_list = giis_list          # [(host, port, mds_vo_name), ...]
+        self.gris_list = gris_list          # GRIS URLs
+        self.expires = expires              # end of validity (epoch)
+        self.response_time = response_time  # of the GIIS query [seconds]
+        self.fetched = time.time()
+
+
+class RegistrationCache(object):
+    """ Registrations per GIIS (hostname). Thread-safe. """
+
+    DEFAULT_TTL = 600       # validity of registrations without Mds-validto [seconds]
+    MAX_TTL = 3600          # upper bound of validity [seconds]
+    REFRESH_MARGIN = 30     # GIIS gets queried that long before registrations expire [seconds]
+    MAX_STALE = 86400       # max age of registrations served if GIIS fails [seconds]
+
+    def __init__(self):
+        self.entries = dict()   # hostname -> Registration
+        self.lock = Lock()
+
+    def update(self, hostname, giis_list, gris_list, valid_to, response_time):
+        """ Caches registrations of GIIS. Returns the Registration.
+
+            valid_to -- earliest Mds-validto of the registrations (epoch) or None
+        """
+        now = time.time()
+        if not valid_to:
+            valid_to = now + RegistrationCache.DEFAULT_TTL
+        expires = min(valid_to, now + RegistrationCache.MAX_TTL)
+        reg = Registration(giis_list, gris_list, expires, response_time)
+        self.lock.acquire()
+        self.entries[hostname] = reg
+        self.lock.release()
+        return reg
+
+    def fresh(self, hostname):
+        """ Returns Registration of GIIS, or None if there is none or if
+            it (almost) expired, i.e. the GIIS needs to be queried.
+        """
+        self.lock.acquire()
+        reg = self.entries.get(hostname)
+        self.lock.release()
+        if reg and time.time() < reg.expires - RegistrationCache.REFRESH_MARGIN:
+            return reg
+        return None
+
+    def last(self, hostname):
+        """ Returns last Registration of GIIS, even if expired (but not
+            older than MAX_STALE), or None.
+        """
+        self.lock.acquire()
+        reg = self.entries.get(hostname)
+        self.lock.release()
+        if reg and time.time() - reg.fetched < RegistrationCache.MAX_STALE:
+            return reg
+        return None
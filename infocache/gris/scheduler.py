@@ -0,0 +1,203 @@
+"""
+Adaptive polling scheduler for the GRIS'es. Every cluster gets
+its own polling interval, which depends on how much its data
+changes between two queries and on how expensive a query is.
+The clusters are kept in a priority queue keyed on the time
+their next query is due.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import heapq
+import logging
+from threading import Condition
+
+
+class PollEntry(object):
+    """ Scheduling state of one cluster (GRIS) """
+
+    def __init__(self, url, interval, due):
+        self.url = url              # arclib.URL of GRIS
+        self.interval = interval    # current polling interval [seconds]
+        self.due = due              # time next query is due (epoch)
+        self.seq = 0                # sequence number of valid heap item
+        self.in_flight = False      # query currently running
+        self.active = True          # still advertised by a GIIS
+        self.change_rate = None     # smoothed fraction of rows that changed per query
+        self.cost = 0.0             # smoothed response + processing time [seconds]
+
+
+class PollScheduler(object):
+    """ Hands out the clusters whose query is due to the worker threads.
+        A cluster is never handed out twice at the same time.
+    """
+
+    MIN_INTERVAL = 60       # default lower bound of polling interval [seconds]
+    MAX_INTERVAL = 600      # default upper bound of polling interval [seconds]
+    HIGH_CHANGE = 0.05      # change rate above which interval gets shortened
+    LOW_CHANGE = 0.005      # change rate below which interval gets stretched
+    SHRINK = 0.5            # interval factor for clusters that change a lot
+    STRETCH = 1.5           # interval factor for (almost) static clusters
+    COST_FACTOR = 4         # interval is at least COST_FACTOR * query cost
+    SMOOTHING = 0.3         # weight of the latest sample in the moving averages
+
+    def __init__(self, periodicity=120, min_interval=None, max_interval=None):
+        """ periodicity -- initial polling interval of a new cluster [seconds]
+            min_interval, max_interval -- bounds of polling interval [seconds]
+        """
+        self.log = logging.getLogger(__name__)
+        if not min_interval:
+            min_interval = PollScheduler.MIN_INTERVAL
+        if not max_interval:
+            max_interval = PollScheduler.MAX_INTERVAL
+        self.min_interval = min(min_interval, periodicity)
+        self.max_interval = max(max_interval, periodicity)
+        self.periodicity = periodicity
+        self.entries = dict()       # hostname -> PollEntry
+        self.heap = list()          # (due, seq, hostname)
+        self.seq = 0
+        self.cond = Condition()
+
+    def _push(self, hostname, entry):
+        """ (re)schedules entry. Caller must hold the condition lock. """
+        self.seq += 1
+        entry.seq = self.seq
+        heapq.heappush(self.heap, (entry.due, entry.seq, hostname))
+        self.cond.notify()
+
+    def _add(self, url_list, now):
+        """ Adds new clusters (due at 'now'). Returns set of hostnames
+            of url_list. Caller must hold the condition lock. 
+        """
+        hosts = set()
+        for url in url_list:
+            host = url.Host()
+            hosts.add(host)
+            if self.entries.has_key(host):
+                self.entries[host].url = url
+                self.entries[host].active = True
+                continue
+            self.log.debug("Scheduling new GRIS %s" % host)
+            entry = PollEntry(url, self.periodicity, now)
+            self.entries[host] = entry
+            self._push(host, entry)
+        return hosts
+
+    def add_hosts(self, url_list):
+        """ Adds clusters to poll (e.g. as soon as a GIIS advertised them).
+            New clusters are due immediately, clusters already scheduled
+            or in flight are left alone.
+
+            url_list -- list of cluster/GRIS URLs of arclib.URL type
+        """
+        self.cond.acquire()
+        try:
+            self._add(url_list, time.time())
+        finally:
+            self.cond.release()
+
+    def update_hosts(self, url_list):
+        """ Sets the clusters to poll. New clusters are due immediately,
+            clusters missing in url_list are not polled anymore.
+
+            url_list -- list of cluster/GRIS URLs of arclib.URL type
+        """
+        self.cond.acquire()
+        try:
+            hosts = self._add(url_list, time.time())
+            for host, entry in self.entries.items():
+                if host in hosts:
+                    continue
+                self.log.debug("Unscheduling GRIS %s" % host)
+                if entry.in_flight: # dropped once query finished
+                    entry.active = False
+                else:
+                    self.entries.pop(host) # heap item gets dropped when popped
+        finally:
+            self.cond.release()
+
+    def get(self, timeout):
+        """ Blocks until the query of a cluster is due or timeout [seconds]
+            expired. Returns tuple (url, due_time) or None on timeout.
+        """
+        deadline = time.time() + timeout
+        self.cond.acquire()
+        try:
+            while True:
+                now = time.time()
+                while self.heap:
+                    due, seq, host = self.heap[0]
+                    entry = self.entries.get(host)
+                    if entry and entry.seq == seq and not entry.in_flight:
+                        break
+                    heapq.heappop(self.heap) # stale item
+                if self.heap and self.heap[0][0] <= now:
+                    due, seq, host = heapq.heappop(self.heap)
+                    entry = self.entries[host]
+                    entry.in_flight = True
+                    return entry.url, due
+                if now >= deadline:
+                    return None
+                wait = deadline - now
+                if self.heap:
+                    wait = min(wait, self.heap[0][0] - now)
+                self.cond.wait(wait)
+        finally:
+            self.cond.release()
+
+    def done(self, hostname, result=None):
+        """ Reschedules cluster after its query finished.
+
+            result -- tuple (response_time, processing_time, change_rate) of
+                      the query or None if cluster was not (successfully) queried
+        """
+        self.cond.acquire()
+        try:
+            entry = self.entries.get(hostname)
+            if not entry:
+                return
+            entry.in_flight = False
+            if not entry.active:
+                self.entries.pop(hostname)
+                return
+            if result:
+                self._adapt_interval(entry, *result)
+            entry.due = time.time() + entry.interval
+            self._push(hostname, entry)
+        finally:
+            self.cond.release()
+
+    def _adapt_interval(self, entry, response_time, processing_time, change_rate):
+        """ Adapts polling interval of cluster to its observed change rate
+            and query cost, bounded by [min_interval, max_interval].
+        """
+        alpha = PollScheduler.SMOOTHING
+        cost = response_time + processing_time
+        entry.cost = alpha * cost + (1 - alpha) * entry.cost
+        if entry.change_rate is None:
+            entry.change_rate = change_rate
+        else:
+            entry.change_rate = alpha * change_rate + (1 - alpha) * entry.change_rate
+
+        interval = entry.interval
+        if entry.change_rate >= PollScheduler.HIGH_CHANGE:
+            interval *= PollScheduler.SHRINK
+        elif entry.change_rate <= PollScheduler.LOW_CHANGE:
+            interval *= PollScheduler.STRETCH
+        interval = max(interval, PollScheduler.COST_FACTOR * entry.cost)
+        entry.interval = min(max(interval, self.min_interval), self.max_interval)
+
+    def get_intervals(self):
+        """ Returns dict hostname -> current polling interval """
+        self.cond.acquire()
+        try:
+            intervals = dict()
+            for host, entry in self.entries.items():
+                intervals[host] = entry.interval
+            return intervals
+        finally:
+            self.cond.release()
@@ -0,0 +1,211 @@
+"""
+Database writer stage of the GRIS polling pipeline. The polling
+threads (respectively the store threads of the async engine) only
+fetch and convert the GRIS information and hand it over to the
+writer through a bounded queue. A few writer threads (by default
+one) write the information of several clusters per transaction,
+which keeps the number of concurrent transactions on the job table
+low.
+
+A full queue blocks the producers, i.e. the polling slows down if
+the database falls behind.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import logging
+import Queue
+from threading import Thread, Lock
+
+from infocache.db import meta
+
+
+class ClusterUpdate(object):
+    """ Converted GRIS information of a cluster, waiting to be written """
+
+    def __init__(self, hostname, cluster_row, queue_rows, job_rows, response_time, fetch_time):
+        self.hostname = hostname
+        self.cluster_row = cluster_row
+        self.queue_rows = queue_rows
+        self.job_rows = job_rows            # None if jobs could not be queried
+        self.streamed = hasattr(job_rows, 'chunks') # jobs get committed chunk by chunk
+        self.response_time = response_time
+        self.fetch_time = fetch_time        # time to query jobs and to convert [seconds]
+        self.queued = time.time()
+        self.finished = False               # cluster got rescheduled
+
+
+class BatchWriter(object):
+    """ Writes ClusterUpdates handed over by put(). The number of
+        clusters per transaction adapts to the time a transaction takes.
+        If a transaction fails, its clusters are retried one by one,
+        so a single broken cluster doesn't hold back the others.
+        Clusters whose jobs are streamed (see JobStream) are always
+        written on their own.
+    """
+
+    QUEUE_SIZE = 36         # max number of updates waiting to be written
+    MAX_BATCH = 32          # max number of clusters per transaction
+    TARGET_TIME = 2.0       # desired duration of a transaction [seconds]
+
+    def __init__(self, gris2db, threads=1, queue_size=None):
+        """ gris2db -- Gris2db instance, which does the actual writing
+            threads -- number of writer threads
+            queue_size -- max number of updates waiting to be written
+        """
+        self.log = logging.getLogger(__name__)
+        self.gris2db = gris2db
+        self.threads = max(threads, 1)
+        if not queue_size:
+            queue_size = BatchWriter.QUEUE_SIZE
+        self.queue = Queue.Queue(queue_size)
+        self.batch_size = 1
+        self.stop_threads = False
+        self.lock = Lock()              # protects batch_size and the counters
+        self.n_transactions = 0
+        self.n_clusters = 0
+        self.n_retries = 0
+        self.write_time = 0.0
+        self.wait_time = 0.0            # time updates waited in queue
+
+    def start(self):
+        self.stop_threads = False
+        for n in xrange(self.threads):
+            Thread(target=self._run).start()
+
+    def stop(self):
+        self.stop_threads = True
+
+    def put(self, update):
+        """ Hands update over to writer. Blocks while the queue is full. """
+        self.queue.put(update)
+
+    def _next_batch(self):
+        """ Returns list of at most batch_size updates (blocks at most
+            30 seconds for the first one).
+        """
+        try:
+            batch = [self.queue.get(True, 30)]
+        except Queue.Empty:
+            return []
+        self.lock.acquire()
+        batch_size = self.batch_size
+        self.lock.release()
+        while len(batch) < batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Queue.Empty:
+                break
+        return batch
+
+    def _adapt_batch_size(self, n, elapsed):
+        """ Grows batch size if transactions are fast, shrinks it
+            if they are slow. Shared by all writer threads.
+        """
+        self.lock.acquire()
+        if elapsed > BatchWriter.TARGET_TIME:
+            self.batch_size = max(self.batch_size / 2, 1)
+        elif n >= self.batch_size and elapsed < BatchWriter.TARGET_TIME / 2:
+            self.batch_size = min(self.batch_size * 2, BatchWriter.MAX_BATCH)
+        self.lock.release()
+
+    def _write(self, batch):
+        """ Writes batch of updates in one transaction. """
+        session = meta.Session()
+        timestamp = time.time()
+        try:
+            written = list()
+            for update in batch:
+                written.append(self.gris2db._write_cluster_info(session, update))
+            session.commit()
+        except Exception, e:
+            session.rollback()
+            if len(batch) == 1:
+                self._finish(batch[0], self.gris2db._write_failed, e)
+                return
+            self.log.warn("Writing %d clusters failed, got %r. Retrying one by one" % \
+                (len(batch), e))
+            self.lock.acquire()
+            self.n_retries += 1
+            self.lock.release()
+            for update in batch:
+                self._write([update])
+            return
+
+        elapsed = time.time() - timestamp
+        self.lock.acquire()
+        self.n_transactions += 1
+        self.n_clusters += len(batch)
+        self.write_time += elapsed
+        for update in batch:
+            self.wait_time += timestamp - update.queued
+        self.lock.release()
+        for update, fp_batches in zip(batch, written):
+            self._finish(update, self.gris2db._written, fp_batches)
+        if not batch[0].streamed:
+            self._adapt_batch_size(len(batch), elapsed)
+
+    def _finish(self, update, callback, arg):
+        """ Calls callback(update, arg), which reschedules the cluster """
+        try:
+            callback(update, arg)
+            update.finished = True
+        except Exception, e:
+            self._abort([update], e)
+
+    def _abort(self, batch, error):
+        """ Called if writing batch raised unexpectedly. Reschedules the
+            clusters of the updates that did not get rescheduled yet,
+            so neither their polling nor their circuit breakers get stuck.
+        """
+        self.log.error("Writer got unexpected error %r" % error)
+        try:
+            meta.Session().rollback()
+        except Exception, e:
+            self.log.error("Rollback failed, got %r" % e)
+        for update in batch:
+            if update.finished:
+                continue
+            update.finished = True
+            try:
+                self.gris2db._add_cluster2blacklist(update.hostname)
+            except Exception, e:
+                self.log.error("Could not blacklist %s, got %r" % (update.hostname, e))
+            try:
+                self.gris2db.scheduler.done(update.hostname, None)
+            except Exception, e:
+                self.log.error("Could not reschedule %s, got %r" % (update.hostname, e))
+
+    def _write_safe(self, batch):
+        """ Writes batch, a writer thread must not die on any error """
+        try:
+            self._write(batch)
+        except Exception, e:
+            self._abort(batch, e)
+
+    def _run(self):
+        while not self.stop_threads:
+            batch = self._next_batch()
+            for update in batch:
+                if update.streamed: # commits per chunk, hence on its own
+                    self._write_safe([update])
+            batch = [update for update in batch if not update.streamed]
+            if batch:
+                self._write_safe(batch)
+
+    def get_stats(self):
+        """ Returns dict with writer statistics since start """
+        self.lock.acquire()
+        stats = dict(transactions=self.n_transactions,
+            clusters=self.n_clusters,
+            retries=self.n_retries,
+            batch_size=self.batch_size,
+            queued=self.queue.qsize(),
+            avg_write_time=self.write_time / max(self.n_transactions, 1),
+            avg_wait_time=self.wait_time / max(self.n_clusters, 1))
+        self.lock.release()
+        return stats
@@ -32,7 +32,7 @@ class Housekeeper(Daemon):
 
 
         self.rrd = RRD(rrd_dir, plot_dir)
-        self.cleaner = Cleanex() 
+        self.cleaner = Cleanex(kwargs.get('job_archive_days')) 
 
         self.log.debug('init: rrd_dir: %s', rrd_dir)
         self.log.debug('init: plot_dir: %s', plot_dir)
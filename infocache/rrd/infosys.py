@@ -11,10 +11,13 @@ import os.path
 import  commands # XXX change to subprocess
 from datetime import datetime
 
-from infocache.db import meta, schema
+from infocache.db import meta, schema, readers
 
 class GrisGiis(object):
 
+    # cluster columns get_metadata() needs
+    CLUSTER_COLUMNS = ['status', 'response_time', 'processing_time', 'blacklisted', 'db_lastmodified']
+
     def __init__(self, rrddir, plotdir):
         self.log = logging.getLogger(__name__)
         self.rrddir = rrddir
@@ -152,7 +155,8 @@ class GrisGiis(object):
         clusters= query.filter_by(status='active').all()
         """
         
-        for cluster in session.query(schema.NGCluster).all():
+        for cluster in readers.clusters(session, columns=GrisGiis.CLUSTER_COLUMNS,
+                load_queues=False):
             # check whether rrd db exists 
             dbn = os.path.join(self.rrddir, cluster.hostname+'.rrd')
             if not os.path.exists(dbn):
@@ -179,7 +183,6 @@ class GrisGiis(object):
                 self.log.debug("UpdatedRDD database '%s'" % dbn)
 
             self.create_plots(cluster.hostname)
-        session.expunge_all()
 
     def giis(self):
         """ Populating RDD with GIIS response and processing times. """  
@@ -10,8 +10,7 @@ import time
 import os.path
 import  commands # XXX change to subprocess
 from datetime import datetime
-from sqlalchemy import and_ as AND
-from sqlalchemy import or_ as OR
+import sqlalchemy as sa
 
 from  infocache.db import meta, schema
 
@@ -75,20 +74,16 @@ class Jobs(object):
             self.log.info("Created RDD database '%s'" % dbname)
    
 
-    def _get_num_walltime(self, joblist):
+    def _get_num_walltime(self, session, time_column, states, t_s, t_e):
+        """ Returns number and summed up walltime of the jobs in one
+            of states, whose time_column lies within (t_s, t_e].
+            XXX break it down per  cluster
         """
-        XXX break it down per  cluster
-        """
-        if not joblist:
-            return 0, 0
-
-        walltime=0
-        for job in joblist:
-            w = job.used_wall_time
-            if w:
-                walltime += w
-
-        return len(joblist), walltime
+        t_job = schema.t_job
+        query = sa.select([sa.func.count(t_job.c.global_id), sa.func.sum(t_job.c.used_wall_time)],
+            sa.and_(time_column > t_s, time_column <= t_e, t_job.c.status.in_(states)))
+        njobs, walltime = session.execute(query).fetchone()
+        return njobs, walltime or 0
         
  
     def final_jobs(self):
@@ -97,7 +92,6 @@ class Jobs(object):
         """
         self.log.debug("Populating RDD with jobs in final status.")
         session = meta.Session()
-        query = session.query(schema.NGJob)
        
         last_t_s_epoch = time.time() - Jobs.SAFETY_DELAY 
 
@@ -116,37 +110,26 @@ class Jobs(object):
         if not os.path.exists(dbn):
             self.create_rrd(dbn) 
         
+        t_job = schema.t_job
         # jobs that failed:  FLD_DELETED -> we do not really care
-        failed_jobs = session.query(schema.NGJob).filter(AND(schema.NGJob.completion_time > t_s,
-            schema.NGJob.completion_time <= t_e, 
-            OR(schema.NGJob.status == 'FAILED', schema.NGJob.status == 'FLD_DELETED',
-            schema.NGJob.status == 'FLD_FETCHED'))).all()
-        nfailed, wfailed = self._get_num_walltime(failed_jobs)
-
+        nfailed, wfailed = self._get_num_walltime(session, t_job.c.completion_time,
+            ['FAILED', 'FLD_DELETED', 'FLD_FETCHED'], t_s, t_e)
         
         # jobs that got killed: KIL_DELETED -> we do not really care 
-        killed_jobs = session.query(schema.NGJob).filter(AND(schema.NGJob.completion_time > t_s,
-            schema.NGJob.completion_time <= t_e, 
-            OR(schema.NGJob.status == 'KILLED',schema.NGJob.status == 'KIL_DELETED',
-            schema.NGJob.status == 'KIL_FETCHED'))).all()
-        nkilled, wkilled = self._get_num_walltime(killed_jobs)
-        
+        nkilled, wkilled = self._get_num_walltime(session, t_job.c.completion_time,
+            ['KILLED', 'KIL_DELETED', 'KIL_FETCHED'], t_s, t_e)
 
         #finished jobs (fetched and not yet fetched by user)
-        finished_jobs = session.query(schema.NGJob).filter(AND(schema.NGJob.completion_time > t_s,
-            schema.NGJob.completion_time <= t_e, 
-            OR(schema.NGJob.status == 'FINISHED', schema.NGJob.status =='FIN_FETCHED'))).all()
-        nfinished, wfinished = self._get_num_walltime(finished_jobs)
+        nfinished, wfinished = self._get_num_walltime(session, t_job.c.completion_time,
+            ['FINISHED', 'FIN_FETCHED'], t_s, t_e)
 
         # finished jobs that got deleted before they got fetched-> wasted jobs
-        wasted_jobs = session.query(schema.NGJob).filter(AND(schema.NGJob.sessiondir_erase_time > t_s,
-            schema.NGJob.sessiondir_erase_time <= t_e, schema.NGJob.status == 'FIN_DELETED')).all()
-        ndeleted, wdeleted = self._get_num_walltime(wasted_jobs)
+        ndeleted, wdeleted = self._get_num_walltime(session, t_job.c.sessiondir_erase_time,
+            ['FIN_DELETED'], t_s, t_e)
         
         # jobs we lost track
-        lost_jobs = session.query(schema.NGJob).filter(AND(schema.NGJob.completion_time > t_s,
-            schema.NGJob.completion_time <= t_e, schema.NGJob.status == 'LOST')).all()
-        nlost, wlost = self._get_num_walltime(lost_jobs)
+        nlost, wlost = self._get_num_walltime(session, t_job.c.completion_time,
+            ['LOST'], t_s, t_e)
         self.log.debug("JOB-time: %s" % datetime.utcfromtimestamp(t_e_epoch))
         self.log.debug("JOBS: faild: %d (%d) killd: %d (%d) finishd %d (%d), deletd: %d (%d), lost: %d (%d)"
              % (nfailed, wfailed, nkilled, wkilled, nfinished, wfinished, ndeleted, wdeleted,nlost,wlost))
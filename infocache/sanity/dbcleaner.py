@@ -8,33 +8,43 @@ __version__ = "0.1.0"
 import logging
 import time
 from datetime import datetime
+import sqlalchemy as sa
 from sqlalchemy import and_ as AND
 from sqlalchemy import or_ as OR
 
-from infocache.db import meta, schema
+from infocache.db import meta, schema, archive
 
 class Cleanex(object):
 
     FETCHED_RECORD_AGE = 3600 * 24  # max age of db records of jobs that got fetched
     INACTIVE_CLUSTER_MAX_AGE = 3600 * 24 * 14 # max age of inactive cluster before removal (2 weeks)
 
-    def __init__(self):
+    def __init__(self, job_archive_days=None):
+        """ job_archive_days -- if set, jobs in a final state get moved to
+                                the job archive (see infocache.db.archive),
+                                which keeps them that many days
+        """
         self.log = logging.getLogger(__name__)
+        self.job_archive_days = job_archive_days
+        self.job_archive = None
         self.log.debug("Initialization finished")
    
     def check_clusters(self):
         self.log.debug("Checking for expired cluster records")
         session = meta.Session()
-        query = session.query(schema.NGCluster)
+        t_cluster = schema.t_cluster
         
-        # remove old inactive clusters
+        # remove old inactive clusters (with their queues, access lists and listed jobs)
         inactive_since = datetime.utcfromtimestamp(time.time() - Cleanex.INACTIVE_CLUSTER_MAX_AGE)
-        inactive_clusters = query.filter(AND(schema.NGCluster.db_lastmodified <= inactive_since,
-            schema.NGCluster.status == 'inactive')).all()
+        query = sa.select([t_cluster.c.hostname], AND(t_cluster.c.db_lastmodified <= inactive_since,
+            t_cluster.c.status == 'inactive'))
+        inactive_clusters = [hostname for hostname, in session.execute(query).fetchall()]
 
-        for cluster in inactive_clusters:
-            self.log.info("Removing inactivate cluster '%s'" % cluster.hostname)
-            session.delete(cluster)
+        for hostname in inactive_clusters:
+            self.log.info("Removing inactivate cluster '%s'" % hostname)
+            for table in (schema.t_user_access, schema.t_queue, t_cluster):
+                session.execute(table.delete(table.c.hostname == hostname))
+            session.execute(schema.t_job_seen.delete(schema.t_job_seen.c.cluster_name == hostname))
 
         if inactive_clusters:
             session.commit()
@@ -48,8 +58,12 @@ class Cleanex(object):
 
     def check_jobs(self):
 
-        # 1.) remove db records of jobs that got fetched
         session = meta.Session()
+        if self.job_archive_days:
+            self.archive_jobs(session)
+            return
+
+        # 1.) remove db records of jobs that got fetched
  
         fetched_before = datetime.utcfromtimestamp(time.time() - Cleanex.FETCHED_RECORD_AGE)
         
@@ -88,6 +102,19 @@ class Cleanex(object):
         
  
 
+    def archive_jobs(self, session):
+        """ Moves final jobs to the job archive and drops the expired
+            archive partitions (instead of deleting the jobs).
+        """
+        if not self.job_archive:
+            self.job_archive = archive.job_archive(session.bind.dialect, self.job_archive_days)
+        try:
+            self.job_archive.archive(session)
+            self.job_archive.expire(session)
+        except Exception, e:
+            self.log.error("Archiving jobs failed: %r" % e)
+            session.rollback()
+
     def main(self):
         self.check_clusters()
         self.check_jobs() 
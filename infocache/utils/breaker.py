@@ -0,0 +1,151 @@
+"""
+Circuit breakers for the GRIS and GIIS servers queried by the infocache.
+
+A host that fails gets 'opened' (i.e. is not queried) for a backoff
+period, which doubles with every consecutive failure (plus some jitter,
+so hosts that failed together don't get retried together). Once the
+backoff expired the host is 'half_open': a cheap TCP connect probe
+checks whether the host is reachable at all, and only if so a single
+trial query is allowed. A successful query 'closes' the host again.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import random
+import socket
+import logging
+from threading import Lock
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def tcp_probe(address, timeout):
+    """ Returns True if a TCP connection to address (host, port) can be opened """
+    try:
+        sock = socket.create_connection(address, timeout)
+        sock.close()
+        return True
+    except (socket.error, socket.timeout):
+        return False
+
+
+class HostState(object):
+    """ Breaker state of a host """
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0           # consecutive failures
+        self.retry_time = 0         # end of backoff (epoch)
+
+
+class CircuitBreaker(object):
+    """ Keeps a circuit breaker per host. Thread-safe. """
+
+    BASE_BACKOFF = 120      # backoff after first failure [seconds]
+    MAX_BACKOFF = 21600     # upper bound of backoff [seconds]
+    JITTER = 0.2            # backoff gets randomly stretched/shrunk by up to this fraction
+    PROBE_TIMEOUT = 5       # timeout of TCP connect probe [seconds]
+
+    def __init__(self, name, base_backoff=None, max_backoff=None, probe=tcp_probe):
+        """ name -- name used for logging (e.g. 'GRIS')
+            base_backoff, max_backoff -- backoff bounds [seconds]
+            probe -- function (address, timeout) returning True if host is reachable
+        """
+        self.log = logging.getLogger(__name__)
+        self.name = name
+        self.base_backoff = base_backoff or CircuitBreaker.BASE_BACKOFF
+        self.max_backoff = max(max_backoff or CircuitBreaker.MAX_BACKOFF, self.base_backoff)
+        self.probe = probe
+        self.hosts = dict()         # hostname -> HostState
+        self.transitions = dict()   # hostname -> latest state not yet popped
+        self.lock = Lock()
+
+    def _set_state(self, hostname, host, state):
+        """ Caller must hold the lock """
+        if host.state != state:
+            self.log.info("%s %s: %s -> %s" % (self.name, hostname, host.state, state))
+            host.state = state
+            self.transitions[hostname] = state
+
+    def _backoff(self, failures):
+        backoff = min(self.base_backoff * 2 ** min(failures - 1, 30), self.max_backoff)
+        return backoff * random.uniform(1 - CircuitBreaker.JITTER, 1 + CircuitBreaker.JITTER)
+
+    def allow(self, hostname, address=None):
+        """ Returns True if host may be queried. If the backoff of an open
+            host expired, the host gets probed first (if its address (host, port)
+            is given) and is half-open on success, i.e. one query is allowed.
+        """
+        self.lock.acquire()
+        try:
+            host = self.hosts.get(hostname)
+            if not host or host.state == CLOSED:
+                return True
+            if host.state == HALF_OPEN or time.time() < host.retry_time:
+                return False # trial query running or still backing off
+            self._set_state(hostname, host, HALF_OPEN)
+        finally:
+            self.lock.release()
+
+        if address and self.probe and not self.probe(address, CircuitBreaker.PROBE_TIMEOUT):
+            self.log.debug("%s %s: probe of %s:%s failed" % ((self.name, hostname) + tuple(address)))
+            self.failure(hostname)
+            return False
+        return True
+
+    def success(self, hostname):
+        """ Closes breaker of host """
+        self.lock.acquire()
+        host = self.hosts.pop(hostname, None)
+        if host:
+            self._set_state(hostname, host, CLOSED)
+        self.lock.release()
+
+    def failure(self, hostname):
+        """ Opens breaker of host for an exponentially growing backoff """
+        self.lock.acquire()
+        host = self.hosts.setdefault(hostname, HostState())
+        host.failures += 1
+        backoff = self._backoff(host.failures)
+        host.retry_time = time.time() + backoff
+        self._set_state(hostname, host, OPEN)
+        self.lock.release()
+        self.log.warn("%s %s failed %d time(s), next try in %d seconds" % \
+            (self.name, hostname, host.failures, backoff))
+
+    def forget(self, hostname):
+        """ Drops state of host """
+        self.lock.acquire()
+        self.hosts.pop(hostname, None)
+        self.transitions.pop(hostname, None)
+        self.lock.release()
+
+    def is_open(self, hostname):
+        """ Returns True if host is not closed (i.e. open or half-open) """
+        self.lock.acquire()
+        host = self.hosts.get(hostname)
+        self.lock.release()
+        return host is not None and host.state != CLOSED
+
+    def open_hosts(self):
+        """ Returns list of hosts that are not closed """
+        self.lock.acquire()
+        hosts = self.hosts.keys()
+        self.lock.release()
+        return hosts
+
+    def pop_transitions(self):
+        """ Returns dict hostname -> state of the hosts whose state
+            changed since the last call.
+        """
+        self.lock.acquire()
+        transitions = self.transitions
+        self.transitions = dict()
+        self.lock.release()
+        return transitions
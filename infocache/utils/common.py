@@ -5,9 +5,21 @@ __author__="Placi Flury placi.flury@switch.ch"
 __date__="12.12.2008"
 __version__="0.1.0"
 
+import time
+import calendar
 from ldap.cidict import cidict
 
 
+def ldap_time(value):
+    """ Converts ldap GeneralizedTime (YYYYmmddHHMMSSZ) into 
+        seconds since epoch. Returns None if value can't be parsed.
+    """
+    try:
+        return calendar.timegm(time.strptime(value[:14], '%Y%m%d%H%M%S'))
+    except (TypeError, ValueError):
+        return None
+
+
 class LDAPSearchResult:
     """
      A class to model LDAP results.
@@ -59,11 +71,33 @@ class LDAPCommon:
     viewed as an 'abstract' class that never gets instatiated.
     """
 
-    def __is_record_valid(self):
+    def get_validity(self, record):
+        """
+        Returns tuple (valid_from, valid_to) of ldap entry (LDAPSearchResult)
+        as seconds since epoch, taken from its Mds-validfrom/Mds-validto
+        attributes. Missing or unparsable times are None.
+        """
+        times = list()
+        for attr in ['Mds-validfrom', 'Mds-validto']:
+            if record.has_attribute(attr):
+                times.append(ldap_time(record.get_attr_values(attr)[0]))
+            else:
+                times.append(None)
+        return tuple(times)
+
+    def is_record_valid(self, record, now=None):
         """
-        Verified validity time of ldap entry
+        Verifies validity time of ldap entry (LDAPSearchResult). Entries
+        without validity time are considered valid.
         """
-        pass
+        if not now:
+            now = time.time()
+        valid_from, valid_to = self.get_validity(record)
+        if valid_from and now < valid_from:
+            return False
+        if valid_to and now > valid_to:
+            return False
+        return True
 
     def format_res(self,results):
         """ 
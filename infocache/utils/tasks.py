@@ -0,0 +1,108 @@
+"""
+Runner for periodic (housekeeping) tasks. Every task runs in its
+own thread with its own period, so a slow task doesn't delay the
+others. Runs that take longer than the period of their task are
+counted as overruns; missed runs are skipped rather than piled up.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import logging
+from threading import Thread, Lock
+
+
+class PeriodicTask(object):
+    """ A task and its timing metrics """
+
+    def __init__(self, name, func, period, delay=0):
+        self.name = name
+        self.func = func
+        self.period = period            # [seconds]
+        self.next_run = time.time() + delay
+        self.runs = 0
+        self.overruns = 0               # runs that took longer than period
+        self.errors = 0
+        self.last_time = 0.0            # duration of last run [seconds]
+        self.max_time = 0.0
+        self.total_time = 0.0
+
+
+class TaskRunner(object):
+    """ Runs periodic tasks, each in its own thread """
+
+    TICK = 1.0      # max time [seconds] a stopped task thread keeps sleeping
+
+    def __init__(self):
+        self.log = logging.getLogger(__name__)
+        self.tasks = list()
+        self.lock = Lock()          # protects task metrics
+        self.stop_threads = False
+
+    def add(self, name, func, period, delay=0):
+        """ Adds task, which calls func() every period seconds, the
+            first time after delay seconds. Must be called before start().
+        """
+        self.tasks.append(PeriodicTask(name, func, period, delay))
+
+    def start(self):
+        self.stop_threads = False
+        for task in self.tasks:
+            tr = Thread(target=self._run, args=(task,))
+            tr.setDaemon(True)
+            tr.start()
+
+    def stop(self):
+        self.stop_threads = True
+
+    def _run(self, task):
+        while not self.stop_threads:
+            wait = task.next_run - time.time()
+            if wait > 0:
+                time.sleep(min(wait, TaskRunner.TICK))
+                continue
+
+            started = time.time()
+            failed = False
+            try:
+                task.func()
+            except Exception, e:
+                self.log.error("Task '%s' failed, got %r" % (task.name, e))
+                failed = True
+            elapsed = time.time() - started
+
+            self.lock.acquire()
+            task.runs += 1
+            task.last_time = elapsed
+            task.total_time += elapsed
+            task.max_time = max(task.max_time, elapsed)
+            if failed:
+                task.errors += 1
+            overrun = elapsed > task.period
+            if overrun:
+                task.overruns += 1
+            self.lock.release()
+
+            if overrun:
+                self.log.warn("Task '%s' took %d seconds, exceeding its period of %d seconds" % \
+                    (task.name, elapsed, task.period))
+            else:
+                self.log.debug("Task '%s' took %s seconds" % (task.name, elapsed))
+            task.next_run = max(started + task.period, time.time())
+
+    def get_stats(self):
+        """ Returns dict task name -> dict of timing metrics """
+        self.lock.acquire()
+        stats = dict()
+        for task in self.tasks:
+            stats[task.name] = dict(runs=task.runs,
+                overruns=task.overruns,
+                errors=task.errors,
+                last_time=task.last_time,
+                max_time=task.max_time,
+                avg_time=task.total_time / max(task.runs, 1))
+        self.lock.release()
+        return stats
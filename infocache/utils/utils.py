@@ -17,3 +17,17 @@ def str_cannonize(str):
    new_str += tmp[-1]
    return new_str
 
+
+def rss():
+   """ Returns current resident set size of the process [kB], 
+       or None if not available (no /proc/self/statm).
+   """
+   import os
+   try:
+       f = open('/proc/self/statm')
+       try:
+           return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024
+       finally:
+           f.close()
+   except (IOError, ValueError, IndexError):
+       return None
@@ -0,0 +1,480 @@
+"""
+Benchmarks of the infocache. They run on scratch data (databases,
+fake GRIS'es) and print their numbers:
+
+    attributes  construction cost of NGJob and NGQueue objects
+    convert     CPU time the polling process spends per job converted
+                in place vs by a pool of worker processes
+    rows        conversion and write rate of jobs, ORM objects vs row
+                records (infocache.db.rows)
+    readers     read rate and size of jobs, ORM objects vs row-backed
+                views (infocache.db.readers)
+    stream      peak memory of job scans, fetched vs streamed
+                (infocache.db.stream)
+    upsert      write rate of session.merge() vs upsert()
+    traffic     result payload of the periodic readers per cycle, full
+                objects vs objects without large columns vs the
+                projected queries
+    evloop      cycle makespan of the threaded and the event driven
+                GRIS polling engines, polling fake GRIS'es with random
+                response latencies over real ldap connections (see
+                gris_server), including conversion and DB writes
+
+usage: python -m tests.bench BENCHMARK [options]
+       python -m tests.bench BENCHMARK --help
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from optparse import OptionParser
+from multiprocessing import Process, Queue, Pool
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from infocache.db import meta, schema, codec, bulk, rows, readers, stream, upsert
+from infocache.gris import convert
+from tests import fixtures, gris_server
+
+
+def _parser(name):
+    return OptionParser(usage="usage: %%prog %s [options]" % name, version="%prog " + __version__)
+
+
+def _scratch_session(url='sqlite://'):
+    """ Returns session of a database with the infocache tables """
+    engine = sa.create_engine(url)
+    meta.metadata.bind = engine
+    meta.metadata.create_all()
+    return orm.sessionmaker(bind=engine)()
+
+
+def bench_attributes(args):
+    parser = _parser('attributes')
+    parser.add_option("", "--objects", action="store",
+        dest="objects", type="int", default=20000,
+        help="Number of objects constructed per class (default=%default)")
+    options, args = parser.parse_args(args)
+
+    n = options.objects
+    for cls, args_list in [(schema.NGJob, [(fixtures.arc_job(i),) for i in xrange(n)]),
+            (schema.NGQueue, [(fixtures.arc_queue(i), fixtures.HOSTNAME) for i in xrange(n)])]:
+        timestamp = time.time()
+        for args in args_list:
+            cls(*args)
+        elapsed = time.time() - timestamp
+        print "%-8s %8.1f us/object" % (cls.__name__, elapsed * 1e6 / n)
+    return 0
+
+
+def _cpu_time():
+    """ Returns CPU time [seconds] of this process (without its children) """
+    user, system = os.times()[:2]
+    return user + system
+
+
+def bench_convert(args):
+    parser = _parser('convert')
+    parser.add_option("", "--jobs", action="store",
+        dest="jobs", type="int", default=20000,
+        help="Number of jobs converted (default=%default)")
+    parser.add_option("", "--chunk", action="store",
+        dest="chunk", type="int", default=2000,
+        help="Number of jobs converted at once (default=%default)")
+    parser.add_option("", "--processes", action="store",
+        dest="processes", type="int", default=4,
+        help="Number of worker processes of the pool (default=%default)")
+    options, args = parser.parse_args(args)
+
+    # the stand-ins pickle as is, arclib jobs would have to be copied first
+    arc_jobs = [fixtures.arc_job(i) for i in xrange(options.jobs)]
+    chunks = [arc_jobs[i:i + options.chunk] for i in xrange(0, options.jobs, options.chunk)]
+    pool = Pool(options.processes)
+    paths = [('in place', lambda: [convert.convert_jobs(chunk) for chunk in chunks]),
+            ('pool', lambda: pool.map(convert.convert_jobs, chunks, 1))]
+    for path, run in paths:
+        timestamp, cpu = time.time(), _cpu_time()
+        results = run()
+        elapsed, cpu = time.time() - timestamp, _cpu_time() - cpu
+        assert sum([len(job_rows) for job_rows, rejected in results]) == options.jobs
+        print "%-9s %6.1f us CPU/job in this process, %6.0f jobs/s" % \
+            (path, cpu * 1e6 / options.jobs, options.jobs / elapsed)
+    pool.terminate()
+    return 0
+
+
+def bench_rows(args):
+    parser = _parser('rows')
+    parser.add_option("", "--jobs", action="store",
+        dest="jobs", type="int", default=20000,
+        help="Number of jobs converted and written (default=%default)")
+    options, args = parser.parse_args(args)
+
+    session = _scratch_session()
+    arc_jobs = [fixtures.arc_job(i) for i in xrange(options.jobs)]
+    paths = [('orm', lambda job: bulk.orm2row(schema.NGJob(job), schema.t_job)),
+            ('record', rows.job_row)]
+    for path, convert in paths:
+        timestamp = time.time()
+        job_rows = [convert(job) for job in arc_jobs]
+        convert_time = time.time() - timestamp
+        timestamp = time.time()
+        upsert.upsert(session, schema.t_job, job_rows)
+        session.commit()
+        write_time = time.time() - timestamp
+        print "%-7s %5d bytes/job (container), jobs/s: convert %6.0f, write %6.0f, total %6.0f" % \
+            (path, sys.getsizeof(job_rows[0]), len(job_rows) / convert_time,
+            len(job_rows) / write_time, len(job_rows) / (convert_time + write_time))
+        session.execute(schema.t_job.delete())
+        session.commit()
+    return 0
+
+
+def bench_readers(args):
+    parser = _parser('readers')
+    parser.add_option("", "--jobs", action="store",
+        dest="jobs", type="int", default=20000,
+        help="Number of jobs read (default=%default)")
+    options, args = parser.parse_args(args)
+
+    session = _scratch_session()
+    upsert.upsert(session, schema.t_job,
+        [rows.job_row(fixtures.arc_job(i)) for i in xrange(options.jobs)])
+    session.commit()
+
+    hostname = fixtures.HOSTNAME
+    paths = [('orm', lambda: session.query(schema.NGJob).filter(
+                schema.NGJob.cluster_name == hostname).all()),
+            ('view', lambda: readers.cluster_jobs(session, hostname)),
+            ('columns', lambda: readers.cluster_jobs(session, hostname,
+                columns=['status', 'used_wall_time', 'runtime_environments']))]
+    for path, read in paths:
+        timestamp = time.time()
+        records = read()
+        for job in records:
+            job.get_status()
+            job.get_usedwalltime()
+            job.get_attribute_values('runtime_environments')
+        elapsed = time.time() - timestamp
+        job = records[0]
+        if isinstance(job, readers.RowView):
+            size = sys.getsizeof(job) + sys.getsizeof(job._values)
+        else:
+            size = sys.getsizeof(job) + sys.getsizeof(job.__dict__)
+        print "%-8s %6.0f jobs/s, %5d bytes/job (containers)" % (path, len(records) / elapsed, size)
+        del records, job
+        session.expunge_all()
+    return 0
+
+
+def bench_stream(args):
+    import resource
+
+    parser = _parser('stream')
+    parser.add_option("", "--jobs", action="store",
+        dest="jobs", type="int", default=100000,
+        help="Number of jobs scanned at the end (default=%default)")
+    parser.add_option("", "--fetchall", action="store_true",
+        dest="fetchall", default=False,
+        help="Fetch the complete result instead of streaming it")
+    options, args = parser.parse_args(args)
+
+    # file database, an in-memory database would grow the RSS itself
+    dbfile = tempfile.NamedTemporaryFile(suffix='.db')
+    session = _scratch_session('sqlite:///%s' % dbfile.name)
+    t_job = schema.t_job
+    query = sa.select([t_job.c.global_id, t_job.c.status, t_job.c.errors,
+                    t_job.c.sessiondir_erase_time])
+
+    # scans tables of growing size, the peak memory should stay flat when streaming
+    n = 0
+    for size in [options.jobs / 8, options.jobs / 4, options.jobs / 2, options.jobs]:
+        for first in xrange(n, size, stream.STREAM_BATCH):
+            batch = list()
+            for i in xrange(first, min(first + stream.STREAM_BATCH, size)):
+                row = rows.job_row(fixtures.arc_job(i))
+                row.errors = 'x' * 1024
+                batch.append(row)
+            upsert.upsert(session, t_job, batch)
+            session.commit()
+        n = size
+
+        timestamp = time.time()
+        if options.fetchall:
+            records = session.execute(query).fetchall()
+        else:
+            records = stream.stream(session, query, key=t_job.c.global_id)
+        scanned = 0
+        for record in records:
+            scanned += 1
+        del records
+        print "%7d jobs scanned in %5.2fs, max RSS %7d kB" % (scanned, time.time() - timestamp,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    dbfile.close()
+    return 0
+
+
+def bench_upsert(args):
+    parser = _parser('upsert')
+    parser.add_option("", "--url", action="store",
+        dest="url", type="string", default="sqlite://",
+        help="Database to benchmark, use a scratch database (default=%default)")
+    parser.add_option("", "--rows", action="store",
+        dest="rows", type="int", default=2000,
+        help="Number of rows written per round (default=%default)")
+    options, args = parser.parse_args(args)
+
+    # GIIS records get written twice (insert, then update) by both paths
+    engine = sa.create_engine(options.url)
+    meta.metadata.bind = engine
+    schema.t_giis.create(bind=engine, checkfirst=True)
+    session = orm.sessionmaker(bind=engine, autoflush=True, autocommit=False)()
+    t_giis = schema.t_giis
+    bench = t_giis.c.hostname.like('bench-%.invalid')
+
+    rates = dict()
+    for path in ('merge', 'upsert'):
+        session.execute(t_giis.delete(bench))
+        session.commit()
+        timestamp = time.time()
+        for rnd in xrange(2):
+            giises = list()
+            for i in xrange(options.rows):
+                giis = schema.GiisMeta('bench-%d.invalid' % i, 2135, 'bench')
+                giis.set_response_time(float(rnd))
+                giises.append(giis)
+            if path == 'merge':
+                for giis in giises:
+                    session.merge(giis)
+            else:
+                upsert.upsert(session, t_giis, [bulk.orm2row(giis, t_giis) for giis in giises])
+            session.commit()
+            session.expunge_all()
+        rates[path] = 2 * options.rows / max(time.time() - timestamp, 1e-6)
+    session.execute(t_giis.delete(bench))
+    session.commit()
+    session.close()
+
+    for path in ('merge', 'upsert'):
+        print "%-8s %10.0f rows/s" % (path, rates[path])
+    print "speedup  %10.1fx" % (rates['upsert'] / rates['merge'])
+    return 0
+
+
+TRAFFIC_PATHS = ['full', 'deferred', 'projected']
+
+
+def _payload(session, query):
+    """ Returns number of bytes of the result rows of query (string
+        lengths, 8 bytes for other values, i.e. without protocol overhead)
+    """
+    size = 0
+    for row in session.execute(query):
+        for value in row:
+            if value is None:
+                continue
+            if isinstance(value, basestring):
+                size += len(value)
+            else:
+                size += 8
+    return size
+
+
+def _entities(session, cls, where):
+    """ Returns statements loading cls objects (full, without large columns) """
+    query = session.query(cls)
+    if where is not None:
+        query = query.filter(where)
+    return [query.statement, query.options(*schema.defer_large(cls)).statement]
+
+
+def _cycle_queries(session, t_s, t_e):
+    """ Returns list of (reader, [statement of each of TRAFFIC_PATHS]) """
+    from infocache.gris.statistics import NGStats
+    from infocache.rrd.infosys import GrisGiis
+    from infocache.sanity.dbcleaner import Cleanex
+
+    t_cluster = schema.t_cluster
+    t_queue = schema.t_queue
+    t_job = schema.t_job
+
+    def columns(table, names):
+        return [col for col in table.primary_key] + [table.c[name] for name in names]
+
+    active = t_cluster.c.status == 'active'
+    inactive = sa.and_(t_cluster.c.status == 'inactive',
+                t_cluster.c.db_lastmodified <= t_e - timedelta(seconds=Cleanex.INACTIVE_CLUSTER_MAX_AGE))
+    queries = [
+        ('rrd gris', _entities(session, schema.NGCluster, None) +
+            [sa.select(columns(t_cluster, GrisGiis.CLUSTER_COLUMNS))]),
+        ('housekeeping', _entities(session, schema.NGCluster, active) +
+            [sa.select([t_cluster.c.hostname], active)]),
+        ('statistics', _entities(session, schema.NGCluster, active) +
+            [sa.select(columns(t_cluster, NGStats.CSTATS_ATTRS), active)]),
+        ('statistics queues', [sa.select([t_queue])] * 2 +
+            [sa.select(columns(t_queue, ['status'] + NGStats.QSTATS_ATTRS))]),
+        ('cleanex', _entities(session, schema.NGCluster, inactive) +
+            [sa.select([t_cluster.c.hostname], inactive)])]
+    for states in (['FAILED', 'FLD_DELETED', 'FLD_FETCHED'], ['KILLED', 'KIL_DELETED', 'KIL_FETCHED'],
+            ['FINISHED', 'FIN_FETCHED'], ['LOST']):
+        where = sa.and_(t_job.c.completion_time > t_s, t_job.c.completion_time <= t_e,
+                t_job.c.status.in_(states))
+        queries.append(('final jobs %s' % states[0], _entities(session, schema.NGJob, where) +
+            [sa.select([sa.func.count(t_job.c.global_id), sa.func.sum(t_job.c.used_wall_time)],
+                where)]))
+    return queries
+
+
+def _populate_traffic(session, n_clusters, n_jobs, now):
+    """ Writes n_clusters clusters (with 4 queues each) and n_jobs
+        jobs of realistic size
+    """
+    software = codec.encode(['APPS/BIO/PACKAGE-%d 1.%d' % (i, i) for i in xrange(400)])
+    clusters, queues, jobs = list(), list(), list()
+    for i in xrange(n_clusters):
+        hostname = 'ce%d.example.org' % i
+        status = 'active'
+        if i % 10 == 1:
+            status = 'inactive'
+        clusters.append(dict(hostname=hostname, alias='Cluster %d' % i, status=status,
+            response_time=0.5, processing_time=2.0, blacklisted=False,
+            db_lastmodified=now - timedelta(days=20 * (i % 2)),
+            owners=codec.encode(['Owner %d' % j for j in xrange(5)]),
+            support=codec.encode(['mailto:support@example.org']),
+            middlewares=codec.encode(['nordugrid-arc-0.8.3', 'globus-5.0.2']),
+            runtime_environments=software, total_jobs=100, used_cpus=50, total_cpus=64))
+        for j in xrange(4):
+            queues.append(dict(name='queue%d' % j, hostname=hostname, status='active',
+                cpus=16, grid_running=10, grid_queued=5, local_queued=1, prelrms_queued=0,
+                running=12, comment='Queue %d of %s' % (j, hostname)))
+    states = ['FINISHED', 'FIN_FETCHED', 'FAILED', 'KILLED', 'LOST', 'INLRMS:R']
+    for i in xrange(n_jobs):
+        hostname = 'ce%d.example.org' % (i % n_clusters)
+        jobs.append(dict(global_id=fixtures.job_id(i, hostname),
+            global_owner='/DC=ch/DC=switch/CN=User %d' % (i % 50), status=states[i % len(states)],
+            job_name='job %d' % i, cluster_name=hostname,
+            queue_name='queue%d' % (i % 4), completion_time=now - timedelta(seconds=i % 240),
+            errors='LRMS error: (-1) Job failed with exit code 1' * (i % 2 * 20),
+            execution_nodes=codec.encode(['node%d' % (i % 64)]),
+            runtime_environments=codec.encode(['APPS/R-2.12']), used_wall_time=40))
+    for table, table_rows in [(schema.t_cluster, clusters), (schema.t_queue, queues),
+            (schema.t_job, jobs)]:
+        upsert.upsert(session, table, table_rows)
+    session.commit()
+
+
+def bench_traffic(args):
+    parser = _parser('traffic')
+    parser.add_option("", "--clusters", action="store",
+        dest="clusters", type="int", default=50,
+        help="Number of clusters (default=%default)")
+    parser.add_option("", "--jobs", action="store",
+        dest="jobs", type="int", default=20000,
+        help="Number of jobs (default=%default)")
+    options, args = parser.parse_args(args)
+
+    session = _scratch_session()
+    now = datetime.utcnow()
+    _populate_traffic(session, options.clusters, options.jobs, now)
+
+    totals = [0] * len(TRAFFIC_PATHS)
+    print "%-24s %12s %12s %12s" % tuple(['reader'] + TRAFFIC_PATHS)
+    for reader, queries in _cycle_queries(session, now - timedelta(seconds=120), now):
+        sizes = [_payload(session, query) for query in queries]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print "%-24s %12d %12d %12d" % tuple([reader] + sizes)
+    print "%-24s %12d %12d %12d" % tuple(['bytes per cycle'] + totals)
+    return 0
+
+
+def _poll_cycle(engine, n_clusters, port, timeout, results):
+    """ Polls the fake GRIS'es once with a Gris2db of engine (in a
+        process of its own) and puts (engine, makespan, failures,
+        missing) into results.
+    """
+    import arclib
+    from infocache.db import init_model
+    from infocache.gris.gris2db import Gris2db
+
+    dbfile = tempfile.NamedTemporaryFile(suffix='.db')
+    init_model(sa.create_engine('sqlite:///%s' % dbfile.name))
+    gris2db = Gris2db(3600, engine=engine)
+    done = list()   # per polled cluster: True if queried successfully
+    scheduler_done = gris2db.scheduler.done
+
+    def counting_done(hostname, result=None):
+        done.append(result is not None)
+        scheduler_done(hostname, result)
+    gris2db.scheduler.done = counting_done
+
+    urls = [arclib.URL('ldap://%s:%d/Mds-Vo-name=local,o=grid' % \
+            (gris_server.gris_address(n), port)) for n in xrange(n_clusters)]
+    timestamp = time.time()
+    gris2db.start()
+    gris2db.add_urls(urls)
+    while len(done) < n_clusters and time.time() - timestamp < timeout:
+        time.sleep(0.01)
+    results.put((engine, time.time() - timestamp, done.count(False), n_clusters - len(done)))
+    dbfile.close()
+    os._exit(0) # don't wait for the polling threads to notice a stop
+
+
+def bench_evloop(args):
+    from infocache.gris.gris2db import Gris2db
+
+    parser = _parser('evloop')
+    parser.add_option("", "--clusters", action="store",
+        dest="clusters", type="int", default=300,
+        help="Number of fake GRIS'es (default=%default)")
+    parser.add_option("", "--jobs", action="store",
+        dest="jobs", type="int", default=50,
+        help="Number of jobs advertised per GRIS (default=%default)")
+    parser.add_option("", "--port", action="store",
+        dest="port", type="int", default=gris_server.GRIS_PORT,
+        help="Port of the fake GRIS'es (default=%default)")
+    parser.add_option("", "--timeout", action="store",
+        dest="timeout", type="int", default=600,
+        help="Max time [seconds] a cycle may take (default=%default)")
+    options, args = parser.parse_args(args)
+
+    random.seed(4711)
+    latencies = [random.choice([0.2, 0.5, 1.0, 2.0, 10.0]) for n in xrange(options.clusters)]
+    server = gris_server.start(latencies, n_jobs=options.jobs, port=options.port)
+    results = Queue()
+    for engine in Gris2db.ENGINES:
+        process = Process(target=_poll_cycle,
+                args=(engine, options.clusters, options.port, options.timeout, results))
+        process.start()
+        engine, makespan, failures, missing = results.get()
+        process.join()
+        print "%-8s engine: %6.2f secs for %d clusters (%d failed, %d not polled)" % \
+            (engine, makespan, options.clusters, failures, missing)
+    server.terminate()
+    return 0
+
+
+BENCHMARKS = dict(attributes=bench_attributes, convert=bench_convert, rows=bench_rows,
+            readers=bench_readers, stream=bench_stream, upsert=bench_upsert,
+            traffic=bench_traffic, evloop=bench_evloop)
+
+
+def main():
+    if len(sys.argv) < 2 or not BENCHMARKS.has_key(sys.argv[1]):
+        print __doc__
+        return 1
+    logging.basicConfig(level=logging.WARN, format="%(asctime)s %(levelname)s %(message)s")
+    return BENCHMARKS[sys.argv[1]](sys.argv[2:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Stand-ins for the arclib objects (jobs, queues) the ORM classes and
+row records get populated from, for the tests and benchmarks.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+
+HOSTNAME = 'ce.example.org'
+
+
+class Time(object):
+    """ Mimics arclib Time """
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+
+    def GetTime(self):
+        return self.epoch
+
+
+class Software(object):
+    """ Mimics arclib Environment """
+
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+
+    def Name(self):
+        return self.name
+
+    def Version(self):
+        return self.version
+
+
+class Source(object):
+    """ Object with the attributes given as keyword arguments """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def job_id(i, hostname=HOSTNAME):
+    return 'gsiftp://%s:2811/jobs/%d' % (hostname, i)
+
+
+def arc_job(i, hostname=HOSTNAME, status='INLRMS:R'):
+    """ Returns i-th job of cluster hostname (mimics arclib Job) """
+    now = Time(time.time())
+    return Source(id=job_id(i, hostname),
+        owner='/DC=ch/DC=switch/CN=User %d' % (i % 50), status=status,
+        job_name='job %d' % i, client_software='nordugrid-arc-0.8.3',
+        cluster=hostname, queue='short', completion_time=now, cpu_count=1,
+        erase_time=now, errors='', execution_nodes=['node%d' % (i % 64)], exitcode=0,
+        gmlog='gmlog', proxy_expire_time=now, queue_rank=i, requested_cpu_time=60,
+        requested_wall_time=120, runtime_environments=[Software('APPS/R', '2.12')],
+        sstderr='stderr', sstdin='', sstdout='stdout', submission_time=now,
+        submission_ui='ui.example.org', used_cpu_time=30, used_memory=512000,
+        used_wall_time=40)
+
+
+def arc_queue(i):
+    """ Returns i-th queue (mimics arclib Queue) """
+    q = Source(name='queue%d' % i, comment='test queue', total_cpus=64, status='active')
+    for name in ['cpu_freq', 'default_cpu_time', 'default_wall_time', 'grid_queued',
+            'grid_running', 'local_queued', 'max_cpu_time', 'max_queuable',
+            'max_running', 'max_total_cpu_time', 'max_user_run', 'max_wall_time',
+            'min_cpu_time', 'min_wall_time', 'node_memory', 'prelrms_queued',
+            'queued', 'running']:
+        setattr(q, name, i + 1)
+    q.homogeneity = True
+    q.node_cpu = 'Intel Xeon'
+    q.scheduling_policy = 'fifo'
+    return q
@@ -0,0 +1,194 @@
+"""
+Minimal LDAPv3 listener that serves the NorduGrid schema entries of fake
+GRIS'es, for benchmarks of the GRIS polling engines against real ldap
+connections (python-ldap, arclib).
+
+Each fake GRIS has its own loopback address (see gris_address()) and
+answers every search with all its entries (cluster, queues and jobs),
+after the latency of the GRIS. Binds are accepted anonymously, other
+operations are ignored. Linux routes the whole 127.0.0.0/8 network to
+the loopback interface, other systems need the addresses configured.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import socket
+import SocketServer
+from multiprocessing import Process
+
+GRIS_PORT = 2135
+
+# BER tags of the LDAP messages
+_SEQUENCE = 0x30
+_SET = 0x31
+_INTEGER = 0x02
+_OCTET_STRING = 0x04
+_ENUMERATED = 0x0a
+_BIND_REQUEST = 0x60
+_BIND_RESPONSE = 0x61
+_SEARCH_REQUEST = 0x63
+_SEARCH_ENTRY = 0x64
+_SEARCH_DONE = 0x65
+_UNBIND_REQUEST = 0x42
+
+
+def gris_address(n):
+    """ Returns loopback address of the n-th fake GRIS """
+    return '127.1.%d.%d' % (n / 250, n % 250 + 1)
+
+
+def _length(n):
+    if n < 0x80:
+        return chr(n)
+    octets = ''
+    while n:
+        octets = chr(n & 0xff) + octets
+        n >>= 8
+    return chr(0x80 | len(octets)) + octets
+
+
+def _ber(tag, payload):
+    return chr(tag) + _length(len(payload)) + payload
+
+
+def _ber_int(tag, value):
+    octets = ''
+    while True:
+        octets = chr(value & 0xff) + octets
+        value >>= 8
+        if not value and ord(octets[0]) < 0x80:
+            break
+    return _ber(tag, octets)
+
+
+def _result(tag):
+    """ LDAPResult (success) of operation tag """
+    return _ber(tag, _ber_int(_ENUMERATED, 0) + _ber(_OCTET_STRING, '') + _ber(_OCTET_STRING, ''))
+
+
+def _entry(dn, attrs):
+    """ SearchResultEntry of dn with attrs {name: [values]} """
+    attributes = ''
+    for name, values in attrs.items():
+        attributes += _ber(_SEQUENCE, _ber(_OCTET_STRING, name) +
+            _ber(_SET, ''.join([_ber(_OCTET_STRING, value) for value in values])))
+    return _ber(_SEARCH_ENTRY, _ber(_OCTET_STRING, dn) + _ber(_SEQUENCE, attributes))
+
+
+def gris_entries(hostname, n_queues, n_jobs):
+    """ Returns ldap entries [(dn, {attr: [values]})] of a GRIS """
+    base = 'nordugrid-cluster-name=%s,Mds-Vo-name=local,o=grid' % hostname
+    entries = [(base, {'objectClass': ['Mds', 'nordugrid-cluster'],
+        'nordugrid-cluster-name': [hostname],
+        'nordugrid-cluster-aliasname': ['Cluster %s' % hostname],
+        'nordugrid-cluster-owner': ['Owner %d' % i for i in xrange(3)],
+        'nordugrid-cluster-support': ['mailto:grid@%s' % hostname],
+        'nordugrid-cluster-lrms-type': ['SGE'],
+        'nordugrid-cluster-middleware': ['nordugrid-arc-0.8.3', 'globus-5.0.2'],
+        'nordugrid-cluster-runtimeenvironment': ['APPS/BIO/PACKAGE-%d-1.%d' % (i, i)
+            for i in xrange(50)],
+        'nordugrid-cluster-totalcpus': ['64'], 'nordugrid-cluster-usedcpus': ['50'],
+        'nordugrid-cluster-totaljobs': [str(n_jobs)],
+        'Mds-validfrom': ['20261018120000Z'], 'Mds-validto': ['20361018120000Z']})]
+    for q in xrange(n_queues):
+        queue_dn = 'nordugrid-queue-name=queue%d,%s' % (q, base)
+        entries.append((queue_dn, {'objectClass': ['Mds', 'nordugrid-queue'],
+            'nordugrid-queue-name': ['queue%d' % q], 'nordugrid-queue-status': ['active'],
+            'nordugrid-queue-running': ['12'], 'nordugrid-queue-gridrunning': ['10'],
+            'nordugrid-queue-gridqueued': ['5'], 'nordugrid-queue-totalcpus': ['16'],
+            'nordugrid-queue-maxcputime': ['2880'], 'nordugrid-queue-nodecpu': ['Xeon 2.4 GHz']}))
+    for j in xrange(n_jobs):
+        job_id = 'gsiftp://%s:2811/jobs/%d' % (hostname, j)
+        entries.append(('nordugrid-job-globalid=%s,nordugrid-info-group-name=jobs,%s' % \
+                (job_id, base),
+            {'objectClass': ['Mds', 'nordugrid-job'],
+            'nordugrid-job-globalid': [job_id],
+            'nordugrid-job-globalowner': ['/DC=ch/DC=switch/CN=User %d' % (j % 50)],
+            'nordugrid-job-status': ['INLRMS:R'], 'nordugrid-job-jobname': ['job %d' % j],
+            'nordugrid-job-execcluster': [hostname], 'nordugrid-job-execqueue': ['queue0'],
+            'nordugrid-job-submissiontime': ['20261018120000Z'],
+            'nordugrid-job-usedwalltime': ['40'], 'nordugrid-job-cpucount': ['1'],
+            'nordugrid-job-executionnodes': ['node%d' % (j % 64)]}))
+    return entries
+
+
+class _GrisHandler(SocketServer.BaseRequestHandler):
+    """ Serves the ldap connection of a client """
+
+    def _read(self, n):
+        data = ''
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def _message(self):
+        """ Returns tuple (message id, operation tag) of next request """
+        tag, length = self._read(2)
+        length = ord(length)
+        if length & 0x80:
+            length = reduce(lambda n, octet: n << 8 | ord(octet), self._read(length & 0x7f), 0)
+        payload = self._read(length)
+        id_length = ord(payload[1])
+        msgid = reduce(lambda n, octet: n << 8 | ord(octet), payload[2:2 + id_length], 0)
+        return msgid, ord(payload[2 + id_length])
+
+    def handle(self):
+        server = self.server
+        address = self.request.getsockname()[0]
+        try:
+            while True:
+                msgid, op = self._message()
+                header = _ber_int(_INTEGER, msgid)
+                if op == _BIND_REQUEST:
+                    self.request.sendall(_ber(_SEQUENCE, header + _result(_BIND_RESPONSE)))
+                elif op == _SEARCH_REQUEST:
+                    time.sleep(server.latencies.get(address, 0))
+                    for entry in server.encoded(address):
+                        self.request.sendall(_ber(_SEQUENCE, header + entry))
+                    self.request.sendall(_ber(_SEQUENCE, header + _result(_SEARCH_DONE)))
+                elif op == _UNBIND_REQUEST:
+                    return
+        except (EOFError, socket.error):
+            return
+
+
+class GrisServer(SocketServer.ThreadingTCPServer):
+    """ Serves fake GRIS'es, one per latency of latencies """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, latencies, n_queues=4, n_jobs=50, port=GRIS_PORT):
+        SocketServer.ThreadingTCPServer.__init__(self, ('', port), _GrisHandler)
+        self.latencies = dict()     # address -> latency [seconds]
+        for n, latency in enumerate(latencies):
+            self.latencies[gris_address(n)] = latency
+        self.n_queues = n_queues
+        self.n_jobs = n_jobs
+        self.entries = dict()       # address -> encoded entries
+
+    def encoded(self, address):
+        """ Returns the encoded entries of the GRIS at address """
+        if not self.entries.has_key(address):
+            self.entries[address] = [_entry(dn, attrs) for dn, attrs in \
+                gris_entries(address, self.n_queues, self.n_jobs)]
+        return self.entries[address]
+
+
+def start(latencies, **kwargs):
+    """ Serves fake GRIS'es in a separate process (so it does not compete
+        for the interpreter lock of the benchmark). Returns the process.
+    """
+    server = GrisServer(latencies, **kwargs) # bound before the clients connect
+    process = Process(target=server.serve_forever)
+    process.daemon = True
+    process.start()
+    server.socket.close()
+    return process
@@ -0,0 +1,108 @@
+"""
+Tests of the job archive with a table per day (infocache.db.archive).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema, upsert, archive
+from tests.fixtures import HOSTNAME, job_id
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+DELAY = timedelta(seconds=archive.ARCHIVE_DELAY)
+
+
+def _job(i, status, lastmodified):
+    return dict(global_id=job_id(i), status=status, cluster_name=HOSTNAME,
+        db_lastmodified=lastmodified)
+
+
+class DailyTableArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        self.session = meta.Session()
+        self.archive = archive.DailyTableArchive(3)
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def _jobs(self, rows):
+        upsert.upsert(self.session, schema.t_job, rows)
+        self.session.commit()
+
+    def _list(self, *indexes):
+        self.session.execute(schema.t_job_seen.insert(), [dict(cluster_name=HOSTNAME,
+            global_id=job_id(i), listed=True) for i in indexes])
+        self.session.commit()
+
+    def _live(self):
+        t_job = schema.t_job
+        return sorted([global_id for global_id, in
+            self.session.execute(sa.select([t_job.c.global_id])).fetchall()])
+
+    def _archived(self, day=NOW.date()):
+        table = self.archive._table(day)
+        return sorted([global_id for global_id, in
+            self.session.execute(sa.select([table.c.global_id])).fetchall()])
+
+    def test_delay(self):
+        """ final jobs get archived once unchanged for ARCHIVE_DELAY """
+        self._jobs([_job(0, 'FIN_FETCHED', NOW - DELAY),
+            _job(1, 'LOST', NOW - DELAY + timedelta(seconds=1)),
+            _job(2, 'INLRMS:R', NOW - 2 * DELAY),
+            _job(3, 'FINISHED', NOW - 2 * DELAY)])
+        self.assertEqual(self.archive.archive(self.session, NOW), 1)
+        self.assertEqual(self._archived(), [job_id(0)])
+        self.assertEqual(self._live(), [job_id(1), job_id(2), job_id(3)])
+        self.assertEqual(self.archive.archive(self.session, NOW + timedelta(seconds=1)), 1)
+        self.assertEqual(self._archived(), [job_id(0), job_id(1)])
+
+    def test_nothing_to_move(self):
+        """ no partition gets created without jobs to move """
+        self._jobs([_job(0, 'FIN_FETCHED', NOW), _job(1, 'INLRMS:R', NOW - 2 * DELAY)])
+        self.assertEqual(self.archive.archive(self.session, NOW), 0)
+        self.assertEqual(self.archive.partitions(self.session), [])
+
+    def test_listed(self):
+        """ jobs the GRIS still lists stay, also once reinserted after archiving """
+        self._jobs([_job(0, 'LOST', NOW - DELAY), _job(1, 'LOST', NOW - DELAY)])
+        self._list(1)
+        self.assertEqual(self.archive.archive(self.session, NOW), 1)
+        self.assertEqual(self._live(), [job_id(1)])
+
+        # job 0 advertised again (as DELETED) and swept on
+        self._jobs([_job(0, 'LOST', NOW)])
+        self._list(0)
+        later = NOW + 2 * DELAY
+        self.assertEqual(self.archive.archive(self.session, later), 0)
+        self.assertEqual(self._live(), [job_id(0), job_id(1)])
+        self.assertEqual(self._archived(), [job_id(0)])
+        self.assertEqual(self.archive.partitions(self.session), [NOW.date()])
+
+        self.session.execute(schema.t_job_seen.delete())
+        self.assertEqual(self.archive.archive(self.session, later), 2)
+        self.assertEqual(self._live(), [])
+
+    def test_expire(self):
+        """ partitions older than the retention days get dropped """
+        for i, days in enumerate((4, 3, 2, 0)):
+            then = NOW - timedelta(days=days)
+            self._jobs([_job(i, 'FIN_FETCHED', then - DELAY)])
+            self.assertEqual(self.archive.archive(self.session, then), 1)
+        days = [NOW.date() - timedelta(days=n) for n in (4, 3, 2, 0)]
+        self.assertEqual(self.archive.partitions(self.session), days)
+        self.assertEqual(self.archive.expire(self.session, NOW), days[:2])
+        self.assertEqual(self.archive.partitions(self.session), days[2:])
+        self.assertEqual(self._archived(days[2]), [job_id(2)])
+        self.assertEqual(self.archive.expire(self.session, NOW), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests of the circuit breakers of the queried servers
+(infocache.utils.breaker).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import unittest
+
+from infocache.utils.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeProbe(object):
+
+    def __init__(self, reachable=True):
+        self.reachable = reachable
+        self.probed = list()
+
+    def __call__(self, address, timeout):
+        self.probed.append(address)
+        return self.reachable
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.probe = FakeProbe()
+        self.breaker = CircuitBreaker('GRIS', base_backoff=100, max_backoff=1000, probe=self.probe)
+
+    def _expire(self, hostname):
+        """ ends backoff of host """
+        self.breaker.hosts[hostname].retry_time = time.time() - 1
+
+    def _backoff(self, hostname):
+        return self.breaker.hosts[hostname].retry_time - time.time()
+
+    def test_closed(self):
+        self.assertTrue(self.breaker.allow('a', ('a', 2135)))
+        self.assertFalse(self.breaker.is_open('a'))
+        self.assertEqual(self.probe.probed, [])
+
+    def test_backoff(self):
+        """ backoff doubles per consecutive failure (with jitter), up to max_backoff """
+        jitter = CircuitBreaker.JITTER
+        for failures, backoff in [(1, 100), (2, 200), (3, 400), (4, 800), (5, 1000), (6, 1000)]:
+            self.breaker.failure('a')
+            self.assertTrue(backoff * (1 - jitter) - 1 <= self._backoff('a') <= backoff * (1 + jitter))
+        self.assertTrue(self.breaker.is_open('a'))
+        self.assertFalse(self.breaker.allow('a', ('a', 2135)))
+        self.assertEqual(self.probe.probed, []) # not before backoff expired
+
+    def test_half_open(self):
+        """ a single trial query once the probe succeeded, closed on success """
+        self.breaker.failure('a')
+        self._expire('a')
+        self.assertTrue(self.breaker.allow('a', ('a', 2135)))
+        self.assertEqual(self.probe.probed, [('a', 2135)])
+        self.assertEqual(self.breaker.hosts['a'].state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow('a', ('a', 2135))) # trial running
+        self.breaker.success('a')
+        self.assertFalse(self.breaker.is_open('a'))
+        self.assertTrue(self.breaker.allow('a'))
+
+    def test_failed_trial(self):
+        self.breaker.failure('a')
+        self._expire('a')
+        self.assertTrue(self.breaker.allow('a'))
+        self.breaker.failure('a')
+        self.assertEqual(self.breaker.hosts['a'].state, OPEN)
+        self.assertEqual(self.breaker.hosts['a'].failures, 2)
+
+    def test_failed_probe(self):
+        self.probe.reachable = False
+        self.breaker.failure('a')
+        self._expire('a')
+        self.assertFalse(self.breaker.allow('a', ('a', 2135)))
+        self.assertEqual(self.breaker.hosts['a'].state, OPEN)
+        self.assertEqual(self.breaker.hosts['a'].failures, 2)
+
+    def test_transitions(self):
+        self.breaker.failure('a')
+        self.breaker.failure('b')
+        self.breaker.success('b')
+        self.assertEqual(self.breaker.pop_transitions(), dict(a=OPEN, b=CLOSED))
+        self.assertEqual(self.breaker.pop_transitions(), dict())
+        self.assertEqual(self.breaker.open_hosts(), ['a'])
+
+    def test_forget(self):
+        self.breaker.failure('a')
+        self.breaker.forget('a')
+        self.assertFalse(self.breaker.is_open('a'))
+        self.assertEqual(self.breaker.pop_transitions(), dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
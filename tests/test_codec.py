@@ -0,0 +1,87 @@
+"""
+Tests of the encoding of list-valued columns (infocache.db.codec).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import cPickle
+import unittest
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema, codec
+
+
+class CodecTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for values in [[], ['a'], ['APPS/R 2.12', 'ENV/MPI'], ['x%d' % i for i in xrange(500)],
+                ['', ''], ['a', ''], ['', 'b']]:
+            self.assertEqual(codec.decode(codec.encode(values)), values)
+            self.assertTrue(codec.is_encoded(codec.encode(values)))
+
+    def test_compressed(self):
+        values = ['APPS/BIO/PACKAGE-%d 1.0' % i for i in xrange(200)]
+        value = codec.encode(values)
+        self.assertTrue(value.startswith(codec.ZMARKER))
+        self.assertEqual(codec.decode(value), values)
+        self.assertEqual(codec.decode(unicode(value)), values)
+
+    def test_unicode(self):
+        value = codec.encode([u'Z\xfcrich', 'Basel'])
+        self.assertEqual(codec.decode(value), ['Z\xc3\xbcrich', 'Basel'])
+        self.assertEqual(codec.decode(value.decode('utf-8')), [u'Z\xfcrich', u'Basel'])
+
+    def test_ambiguous(self):
+        """ lists that can't be joined unambiguously get pickled """
+        for values in [[''], ['a\x1fb'], ['a', '\x1f', 'Z\xc3\xbcrich\x1f']]:
+            value = codec.encode(values)
+            self.assertFalse(codec.is_encoded(value))
+            self.assertEqual(codec.decode(value), values)
+            self.assertEqual(codec.decode(unicode(value)), values)
+        self.assertEqual(codec.decode(codec.encode([u'Z\xfcrich\x1f'])), ['Z\xc3\xbcrich\x1f'])
+
+    def test_legacy_pickle(self):
+        value = cPickle.dumps(['node1', 'node2'], 0)
+        self.assertFalse(codec.is_encoded(value))
+        self.assertEqual(codec.decode(value), ['node1', 'node2'])
+        self.assertEqual(codec.decode(unicode(value)), ['node1', 'node2'])
+
+    def test_empty(self):
+        self.assertEqual(codec.decode(None), [])
+        self.assertEqual(codec.decode(''), [])
+        self.assertTrue(codec.is_encoded(codec.encode([])))
+
+
+class ConvertTableTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def test_convert_table(self):
+        session = meta.Session()
+        t_job = schema.t_job
+        session.execute(t_job.insert(), [
+            dict(global_id='job0', execution_nodes=cPickle.dumps(['node0'], 0)),
+            dict(global_id='job1', execution_nodes=codec.encode(['node1'])),
+            dict(global_id='job2', execution_nodes='not a pickle'),
+            dict(global_id='job3', execution_nodes=None),
+            dict(global_id='job4', execution_nodes=codec.encode(['']))])
+        session.commit()
+        self.assertEqual(codec.convert_table(session, t_job, ['execution_nodes']), 1)
+        self.assertEqual(codec.convert_table(session, t_job, ['execution_nodes']), 0)
+        values = dict(session.execute(sa.select([t_job.c.global_id, t_job.c.execution_nodes])).fetchall())
+        self.assertEqual(values['job0'], codec.encode(['node0']))
+        self.assertEqual(values['job1'], codec.encode(['node1']))
+        self.assertEqual(values['job2'], 'not a pickle')
+        self.assertEqual(values['job3'], None)
+        self.assertEqual(codec.decode(values['job4']), [''])
+
+
+if __name__ == '__main__':
+    unittest.main()
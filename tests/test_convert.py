@@ -0,0 +1,85 @@
+"""
+Tests of the conversion of GRIS information into DB rows
+(infocache.gris.convert).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+import cPickle
+
+from infocache.errors.db import Input_Error
+from infocache.gris.convert import convert_records, JobStream
+from infocache.gris.ldapgris import GrisCluster
+from tests.fixtures import arc_job, job_id
+
+
+def _cluster(alias='Test Cluster'):
+    return GrisCluster({'nordugrid-cluster-name': ['ce.example.org'],
+                        'nordugrid-cluster-aliasname': [alias],
+                        'nordugrid-cluster-totalcpus': ['64']})
+
+
+class InputErrorTest(unittest.TestCase):
+
+    def test_pickle(self):
+        e = cPickle.loads(cPickle.dumps(Input_Error("Input too big", "alias")))
+        self.assertTrue(isinstance(e, Input_Error))
+        self.assertEqual(e.expression, "Input too big")
+        self.assertEqual(e.message, "alias")
+
+
+class ConvertTest(unittest.TestCase):
+
+    def test_convert(self):
+        cluster_row, queue_rows, job_rows, rejected = convert_records(_cluster(), [])
+        self.assertEqual(cluster_row['hostname'], 'ce.example.org')
+        self.assertEqual(cluster_row['total_cpus'], 64)
+        self.assertEqual(job_rows, [])
+
+    def test_without_jobs(self):
+        self.assertEqual(convert_records(_cluster(), None)[2:], (None, []))
+
+    def test_oversized_value(self):
+        self.assertRaises(Input_Error, convert_records, _cluster('x' * 300), [])
+
+
+class JobStreamTest(unittest.TestCase):
+
+    def test_chunks(self):
+        jobs = [arc_job(i) for i in xrange(7)]
+        jobs[4].status = 'x' * 300   # does not fit
+        stream = JobStream(jobs, 3)
+        self.assertEqual(len(stream), 7)
+        chunks = [(len(job_rows), rejected) for job_rows, rejected in stream.chunks()]
+        self.assertEqual(chunks, [(3, []), (2, [job_id(4)]), (1, [])])
+        self.assertEqual(list(stream.chunks()), [])  # iterated once only
+        self.assertEqual(len(jobs), 7)
+
+    def test_lazy(self):
+        """ the jobs get read chunk by chunk, not copied upfront """
+        read = list()
+
+        def jobs():
+            for i in xrange(5):
+                read.append(i)
+                yield arc_job(i)
+
+        class Jobs(object):
+            def __len__(self):
+                return 5
+
+            def __iter__(self):
+                return jobs()
+        chunks = JobStream(Jobs(), 2).chunks()
+        self.assertEqual(len(chunks.next()[0]), 2)
+        self.assertEqual(read, [0, 1])
+        self.assertEqual(len(chunks.next()[0]), 2)
+        self.assertEqual(read, [0, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
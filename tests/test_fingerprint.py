@@ -0,0 +1,135 @@
+"""
+Tests of the content fingerprints of written rows
+(infocache.gris.fingerprint).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from infocache.gris.fingerprint import fingerprint, FingerprintCache
+
+HOSTNAME = 'ce.example.org'
+
+
+def _queue(name, status='active'):
+    return dict(name=name, hostname=HOSTNAME, status=status)
+
+
+class FingerprintBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FingerprintCache()
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        batch.record('q0', _queue('q0'))
+        batch.record('q1', _queue('q1'))
+        self.cache.commit(HOSTNAME, 'queue', batch)
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(dict(a=1, b='x')), fingerprint(dict(b='x', a=1)))
+        self.assertNotEqual(fingerprint(dict(a=1)), fingerprint(dict(a=2)))
+        self.assertEqual(len(fingerprint(_queue('q0'))), 8)
+
+    def test_unchanged(self):
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertTrue(batch.unchanged('q0', _queue('q0')))
+        self.assertFalse(batch.unchanged('q1', _queue('q1', 'inactive')))
+        self.assertFalse(batch.unchanged('q2', _queue('q2')))
+        self.assertEqual((batch.written, batch.skipped), (2, 1))
+
+    def test_rewrite(self):
+        """ once a skipped row has to be written, no further row gets skipped """
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertTrue(batch.unchanged('q0', _queue('q0')))
+        batch.rewrite('q0')
+        self.assertFalse(batch.unchanged('q1', _queue('q1')))
+        self.assertEqual((batch.written, batch.skipped), (2, 0))
+
+    def test_commit_replaces(self):
+        """ rows not seen in a cycle are dropped, counters add up """
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        batch.unchanged('q0', _queue('q0'))
+        self.cache.commit(HOSTNAME, 'queue', batch)
+        self.assertEqual(self.cache.maps[(HOSTNAME, 'queue')].keys(), ['q0'])
+        self.assertEqual(self.cache.get_counters(), dict(queue=(2, 1)))
+
+    def test_uncommitted(self):
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        batch.unchanged('q0', _queue('q0', 'inactive'))
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertFalse(batch.unchanged('q0', _queue('q0', 'inactive')))
+
+
+class InvalidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FingerprintCache()
+        for kind in ['queue', 'cluster']:
+            batch = self.cache.begin(HOSTNAME, kind)
+            batch.record('q0', _queue('q0'))
+            self.cache.commit(HOSTNAME, kind, batch)
+        batch = self.cache.begin('other.example.org', 'queue')
+        batch.record('q0', _queue('q0'))
+        self.cache.commit('other.example.org', 'queue', batch)
+
+    def test_invalidate(self):
+        self.cache.invalidate(HOSTNAME)
+        self.assertEqual(self.cache.maps.keys(), [('other.example.org', 'queue')])
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertFalse(batch.unchanged('q0', _queue('q0')))
+
+    def test_commit_after_invalidate(self):
+        """ a batch begun before the cluster got deactivated must not restore
+            its fingerprints, else the reactivated queues get skipped
+        """
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertTrue(batch.unchanged('q0', _queue('q0')))
+        self.cache.invalidate(HOSTNAME)    # queues set inactive in the DB
+        self.cache.commit(HOSTNAME, 'queue', batch)
+        self.assertFalse(self.cache.maps.has_key((HOSTNAME, 'queue')))
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertFalse(batch.unchanged('q0', _queue('q0')))
+        self.cache.commit(HOSTNAME, 'queue', batch)
+        batch = self.cache.begin(HOSTNAME, 'queue')
+        self.assertTrue(batch.unchanged('q0', _queue('q0')))
+
+
+class PersistenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.persist_file = os.path.join(self.tmp_dir, 'fingerprints')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_load(self):
+        cache = FingerprintCache(self.persist_file)
+        batch = cache.begin(HOSTNAME, 'queue')
+        batch.record('q0', _queue('q0'))
+        cache.commit(HOSTNAME, 'queue', batch)
+        cache.save()
+        self.assertEqual(os.listdir(self.tmp_dir), ['fingerprints'])
+
+        batch = FingerprintCache(self.persist_file).begin(HOSTNAME, 'queue')
+        self.assertTrue(batch.unchanged('q0', _queue('q0')))
+
+    def test_no_file(self):
+        cache = FingerprintCache(self.persist_file)
+        self.assertEqual(cache.maps, dict())
+
+    def test_corrupt_file(self):
+        f = open(self.persist_file, 'wb')
+        f.write('no pickle')
+        f.close()
+        self.assertEqual(FingerprintCache(self.persist_file).maps, dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
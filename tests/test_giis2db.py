@@ -0,0 +1,172 @@
+"""
+Tests of the GIIS handling of the Giis2db daemon (infocache.giis2db).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import logging
+import unittest
+from threading import Thread, Event
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema
+from infocache.giis2db import Giis2db
+from infocache.gris.registry import RegistrationCache
+from infocache.utils.breaker import CircuitBreaker
+
+
+class FakeGris2db(object):
+
+    def __init__(self):
+        self.urls = list()
+
+    def add_urls(self, urls):
+        self.urls.extend(urls)
+
+
+class FakeURL(object):
+
+    def __init__(self, host):
+        self.host = host
+
+    def Host(self):
+        return self.host
+
+    def Port(self):
+        return 2135
+
+
+class TestGiis2db(Giis2db):
+    """ Giis2db without daemon and Gris2db set up """
+
+    def __init__(self):
+        self.log = logging.getLogger('infocache.giis2db')
+        self.giis_blacklisted = CircuitBreaker('GIIS', probe=None)
+        self.registrations = RegistrationCache()
+        self.gris_registrations = RegistrationCache()
+        self.gris2db = FakeGris2db()
+        self.giis_list = tuple()
+        self.gris_list = list()
+        self.stopped = Event()
+        self.giis_refresh_period = 0.05
+
+
+class Giis2dbTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        self.session = meta.Session()
+        for host in ['queried', 'cached']:
+            self.session.execute(schema.t_giis.insert(), dict(hostname=host, port=2135,
+                status='active', processing_time=-1.0))
+        self.session.commit()
+        self.giis2db = TestGiis2db()
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def _processing_time(self, host):
+        t_giis = schema.t_giis
+        return self.session.execute(sa.select([t_giis.c.processing_time],
+                    t_giis.c.hostname == host)).scalar()
+
+    def test_query_giis_cached(self):
+        reg = self.giis2db.registrations.update('cached', [], [FakeURL('gris')], None, 0.5)
+        self.assertEqual(self.giis2db._query_giis('cached', 2135, 'Switzerland'), (reg, True))
+
+    def test_processing_time_of_queried_giis_only(self):
+        """ registrations served from the cache don't get written as processing time """
+        giis2db = self.giis2db
+        giis2db.gris_registrations.update('cached', [], [FakeURL('gris1')], None, 0.5)
+        queried = list()
+
+        def get_cluster_resources(host, port, mds_vo_name):
+            queried.append(host)
+            time.sleep(0.01)
+            return [FakeURL('gris2')]
+        giis2db._get_cluster_resources = get_cluster_resources
+        giis2db.giis_list = (('queried', 2135, 'Switzerland'), ('cached', 2135, 'Switzerland'))
+
+        giis2db._refresh_gris_list()
+        self.assertEqual(sorted([url.Host() for url in giis2db.gris_list]), ['gris1', 'gris2'])
+        self.assertEqual(sorted([url.Host() for url in giis2db.gris2db.urls]), ['gris1', 'gris2'])
+        self.assertEqual(queried, ['queried'])
+        self.session.expire_all()
+        self.assertTrue(self._processing_time('queried') > 0)
+        self.assertEqual(self._processing_time('cached'), -1.0)
+
+    def test_gris_list_cached_with_giis_registrations(self):
+        """ arclib's GRIS discovery is cached as long as the registrations
+            of the GIIS, respectively DEFAULT_TTL
+        """
+        giis2db = self.giis2db
+        giis2db._get_cluster_resources = lambda host, port, mds_vo_name: [FakeURL(host)]
+        giis2db.registrations.update('giis', [], [], time.time() + 100, 0.5)
+        urls, cached = giis2db._query_gris_urls('giis', 2135, 'Switzerland')
+        self.assertEqual(([url.Host() for url in urls], cached), (['giis'], False))
+        self.assertEqual(giis2db._query_gris_urls('giis', 2135, 'Switzerland'), (urls, True))
+        self.assertEqual(giis2db.gris_registrations.fresh('giis').expires,
+            giis2db.registrations.fresh('giis').expires)
+
+        giis2db._query_gris_urls('unregistered', 2135, 'Switzerland')
+        self.assertTrue(giis2db.gris_registrations.fresh('unregistered').expires > \
+            time.time() + RegistrationCache.DEFAULT_TTL - 10)
+
+    def test_open_giis_without_row_keeps_backoff(self):
+        giis2db = self.giis2db
+        giis2db._populate_giis_list = lambda giislist: ([], dict())
+        giis2db.top_giis_list = []
+        giis2db.giis_blacklisted.failure('unknown')
+        giis2db._refresh_giis_list()
+        self.assertTrue(giis2db.giis_blacklisted.is_open('unknown'))
+        self.assertFalse(giis2db.giis_blacklisted.allow('unknown'))
+
+    def test_refresh_giis_topology_stops(self):
+        """ the refresh thread ends once stopped, without sleeping a full period """
+        giis2db = self.giis2db
+        refreshed = list()
+        giis2db._refresh_giis_list = lambda: refreshed.append(time.time())
+        tr = Thread(target=giis2db._refresh_giis_topology)
+        tr.start()
+        time.sleep(0.12)
+        giis2db.giis_refresh_period = 60
+        time.sleep(0.06)
+        n_refreshed = len(refreshed)
+        self.assertTrue(n_refreshed >= 1)
+        giis2db.stopped.set()
+        tr.join(1)
+        self.assertFalse(tr.isAlive())
+        self.assertEqual(len(refreshed), n_refreshed)
+
+    def test_run_parallel_stops_at_deadline(self):
+        """ no work is taken and no result handed on after the deadline """
+        started, handed_on = list(), list()
+
+        def call(key, duration):
+            started.append(key)
+            time.sleep(duration)
+            return key
+        calls = [('fast', ('fast', 0.0)), ('slow', ('slow', 0.4))] + \
+            [('late%d' % i, ('late%d' % i, 0.0)) for i in xrange(3 * Giis2db.PARALLEL_QUERIES)]
+        giis2db = self.giis2db
+        timestamp = time.time()
+        results = giis2db._run_parallel(call, calls[:2], timestamp + 0.2,
+                    lambda key, result: handed_on.append(key))
+        self.assertEqual(results.keys(), ['fast'])
+        time.sleep(0.4) # let the slow call finish
+        self.assertEqual(handed_on, ['fast'])
+
+        started[:] = []
+        slow = [(key, (key, 0.3)) for key, args in calls[2:]]
+        results = giis2db._run_parallel(call, slow, time.time() + 0.1)
+        time.sleep(0.5)
+        self.assertEqual(results, dict())
+        self.assertEqual(len(started), Giis2db.PARALLEL_QUERIES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests of the stuck query watchdog of the Gris2db daemon
+(infocache.gris.gris2db).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import unittest
+
+from infocache.gris.gris2db import Gris2db
+
+HOSTNAME = 'ce.example.org'
+
+
+class FakeURL(object):
+
+    def __init__(self, host):
+        self.host = host
+
+    def Host(self):
+        return self.host
+
+    def Port(self):
+        return 2135
+
+
+class StuckGris2db(Gris2db):
+    """ GRIS queries get stuck until the watchdog detected them """
+
+    def __init__(self):
+        Gris2db.__init__(self, 60)
+        self.n_started = 0
+        self.stored = list()
+
+    def _start_worker(self):
+        self.n_started += 1
+
+    def _fetch_cluster_info(self, gris_url):
+        hostname = gris_url.Host()
+        self.in_flight[hostname] -= Gris2db.QUERY_DEADLINE + 1
+        self._check_stuck()
+        return 'cluster', 'jobs'
+
+    def _store_cluster_info(self, hostname, *fetched):
+        self.stored.append(hostname)
+        return True
+
+
+class WatchdogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.gris2db = StuckGris2db()
+        self.scheduler = self.gris2db.scheduler
+        self.scheduler.add_hosts([FakeURL(HOSTNAME)])
+
+    def _next_query(self):
+        url, due = self.scheduler.get(0)
+        return url
+
+    def test_reschedule(self):
+        """ a stuck host gets queried again, by a new worker thread """
+        url = self._next_query()
+        self.gris2db.in_flight[HOSTNAME] = time.time() - Gris2db.QUERY_DEADLINE - 1
+        self.gris2db._check_stuck()
+        self.assertEqual(self.gris2db.stuck, set([HOSTNAME]))
+        self.assertEqual(self.gris2db.n_started, 1)
+        self.assertTrue(self.gris2db.breakers.is_open(HOSTNAME))
+
+        entry = self.scheduler.entries[HOSTNAME]
+        self.assertFalse(entry.in_flight)
+        self.assertTrue(entry.due > time.time())
+        self.scheduler.cond.acquire()
+        entry.due = time.time() - 1
+        self.scheduler._push(HOSTNAME, entry)
+        self.scheduler.cond.release()
+        self.assertTrue(self._next_query() is url)
+
+        self.gris2db._check_stuck()    # detected once only
+        self.assertEqual(self.gris2db.n_started, 1)
+
+    def test_late_result(self):
+        """ the result of a stuck query gets dropped, the host is not
+            rescheduled a second time
+        """
+        url = self._next_query()
+        self.assertEqual(self.gris2db._cache_cluster_info(url), None)
+        self.assertEqual(self.gris2db.stored, [])
+        self.assertEqual((self.gris2db.in_flight, self.gris2db.stuck), (dict(), set()))
+        self.assertEqual(len(self.scheduler.heap), 1)
+
+    def test_one_query_per_host(self):
+        """ no new query while the previous one is still stuck """
+        self.gris2db.stuck.add(HOSTNAME)
+        self.assertEqual(self.gris2db._cache_cluster_info(FakeURL(HOSTNAME)), False)
+        self.assertEqual(self.gris2db.in_flight, dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""
+Tests of the GRIS ldap entry records (infocache.gris.ldapgris).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+
+from infocache.gris.ldapgris import GrisJob
+from infocache.utils.common import ldap_time
+
+
+class LdapTimeTest(unittest.TestCase):
+
+    def test_ldap_time(self):
+        self.assertEqual(ldap_time('20081212101500Z'), 1229076900)
+        self.assertEqual(ldap_time('19700101000000Z'), 0)
+        self.assertEqual(ldap_time('not a time'), None)
+        self.assertEqual(ldap_time(''), None)
+        self.assertEqual(ldap_time(None), None)
+
+    def test_record_time(self):
+        job = GrisJob({'nordugrid-job-submissiontime': ['20081212101500Z'],
+                       'nordugrid-job-completiontime': ['19700101000000Z'],
+                       'nordugrid-job-proxyexpirationtime': ['garbage']})
+        self.assertEqual(job.submission_time.GetTime(), 1229076900)
+        self.assertEqual(job.completion_time.GetTime(), 0)
+        self.assertEqual(job.proxy_expire_time, None)
+        self.assertEqual(job.erase_time, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
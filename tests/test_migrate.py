@@ -0,0 +1,80 @@
+"""
+Tests of the migration tool adding the indexes of the schema to
+existing databases (infocache.db.migrate).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import sys
+import unittest
+from StringIO import StringIO
+import sqlalchemy as sa
+from sqlalchemy.interfaces import ConnectionProxy
+
+from infocache.db import meta, schema, migrate
+
+
+class StatementRecorder(ConnectionProxy):
+
+    def __init__(self):
+        self.statements = list()
+
+    def cursor_execute(self, execute, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        return execute(cursor, statement, parameters, context)
+
+
+class MigrateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = StatementRecorder()
+        self.engine = sa.create_engine('sqlite://', proxy=self.recorder)
+        meta.metadata.create_all(bind=self.engine)
+        # an 'old' database: indexes missing, one of them under another name
+        self.engine.execute('DROP INDEX ix_job_cluster_status')
+        self.engine.execute('DROP INDEX ix_cluster_status')
+        self.engine.execute('CREATE INDEX old_cluster_status ON cluster (status)')
+        self.engine.execute('DROP TABLE user_access')
+        # job_seen of before the 'listed' column
+        self.engine.execute('DROP TABLE job_seen')
+        self.engine.execute('CREATE TABLE job_seen (cluster_name VARCHAR(255), ' \
+            'global_id VARCHAR(255), PRIMARY KEY (cluster_name, global_id))')
+        self.recorder.statements = list()
+        self.stdout = sys.stdout
+        sys.stdout = StringIO() # query plan reports
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def _index_names(self, table):
+        return [ix.name for ix in migrate.missing_indexes(self.engine) if ix.table is table]
+
+    def test_missing_indexes(self):
+        """ indexes of missing tables get created with their table """
+        self.assertEqual([ix.name for ix in migrate.missing_indexes(self.engine)],
+            ['ix_job_cluster_status'])
+
+    def test_dry_run(self):
+        """ a dry run reports, but runs no DDL """
+        self.assertEqual(migrate.upgrade(self.engine, dry_run=True), [])
+        for statement in self.recorder.statements:
+            self.assertFalse(statement.split()[0].upper() in ('CREATE', 'DROP', 'ALTER'),
+                statement)
+        self.assertFalse('user_access' in self.engine.table_names())
+        self.assertEqual(migrate.stale_tables(self.engine), [schema.t_job_seen])
+        self.assertEqual(self._index_names(schema.t_job), ['ix_job_cluster_status'])
+        self.assertTrue('Query plans' in sys.stdout.getvalue())
+
+    def test_upgrade(self):
+        self.assertEqual(migrate.upgrade(self.engine), ['ix_job_cluster_status'])
+        self.assertTrue('user_access' in self.engine.table_names())
+        self.assertEqual(migrate.missing_indexes(self.engine), [])
+        self.assertEqual(migrate.stale_tables(self.engine), [])
+        self.assertEqual(migrate.upgrade(self.engine), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
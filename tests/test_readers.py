@@ -0,0 +1,108 @@
+"""
+Tests of the read-only views of the cluster, queue and job records
+(infocache.db.readers): the views answer like the ORM objects.
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+from datetime import datetime
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema, codec, rows, upsert, readers
+from tests.fixtures import HOSTNAME, arc_job, arc_queue
+
+OTHER = 'other.example.org'
+
+
+class ReadersTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        self.session = meta.Session()
+        for cluster in [
+            dict(hostname=HOSTNAME, alias='Test Cluster', status='active',
+                response_time=0.5, processing_time=1.5, blacklisted=False,
+                db_lastmodified=datetime(2026, 10, 18, 12, 0, 0), total_cpus=64,
+                middlewares=codec.encode(['nordugrid-arc-0.8.3', 'globus-4.0.8']),
+                runtime_environments=codec.encode(['APPS/R-2.12', 'ENV/MPI'])),
+            dict(hostname=OTHER, status='inactive', blacklisted=True, total_cpus=8),
+            dict(hostname='empty.example.org', status='active')]:
+            self.session.execute(schema.t_cluster.insert(), cluster)
+        upsert.upsert(self.session, schema.t_queue,
+            [rows.queue_row(arc_queue(i), HOSTNAME) for i in xrange(3)] +
+            [rows.queue_row(arc_queue(0), OTHER)])
+        upsert.upsert(self.session, schema.t_job,
+            [rows.job_row(arc_job(i)) for i in xrange(3)] + [rows.job_row(arc_job(0, OTHER))])
+        self.session.commit()
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def _orm(self, cls, *order_by):
+        return self.session.query(cls).order_by(*order_by).all()
+
+    def _check_attributes(self, view, record):
+        self.assertEqual(sorted(view.get_attribute_names()), sorted(record.get_attribute_names()))
+        for name in record.get_attribute_names():
+            self.assertEqual(view.get_attribute_values(name), record.get_attribute_values(name),
+                name)
+
+    def test_clusters(self):
+        t_cluster = schema.t_cluster
+        views = readers.clusters(self.session, order_by=t_cluster.c.hostname)
+        clusters = self._orm(schema.NGCluster, t_cluster.c.hostname)
+        self.assertEqual(len(views), 3)
+        for view, cluster in zip(views, clusters):
+            self._check_attributes(view, cluster)
+            for getter in ['get_name', 'get_alias', 'get_status', 'is_blacklisted',
+                    'get_response_time', 'get_processing_time', 'get_db_lastmodified']:
+                self.assertEqual(getattr(view, getter)(), getattr(cluster, getter)(), getter)
+            view_meta, cluster_meta = view.get_metadata(), cluster.get_metadata()
+            self.assertEqual(view_meta.__dict__, cluster_meta.__dict__)
+            self.assertEqual(sorted([queue.get_name() for queue in view.queues]),
+                sorted([queue.get_name() for queue in cluster.queues]))
+
+    def test_cluster_queues(self):
+        views = readers.active_clusters(self.session, columns=['status'],
+                    queue_columns=['max_running'])
+        self.assertEqual([view.hostname for view in views], ['ce.example.org', 'empty.example.org'])
+        self.assertEqual([queue.name for queue in views[0].queues], ['queue0', 'queue1', 'queue2'])
+        self.assertEqual([queue.hostname for queue in views[0].queues], [HOSTNAME] * 3)
+        self.assertEqual(views[0].queues[0].max_running, 1)
+        self.assertRaises(AttributeError, getattr, views[0].queues[0], 'status')
+        self.assertEqual(views[1].queues, [])
+
+        views = readers.clusters(self.session, load_queues=False)
+        self.assertRaises(AttributeError, getattr, views[0], 'queues')
+
+    def test_queues(self):
+        t_queue = schema.t_queue
+        views = readers.queues(self.session, HOSTNAME)
+        queues = self.session.query(schema.NGQueue).filter(
+            t_queue.c.hostname == HOSTNAME).order_by(t_queue.c.name).all()
+        self.assertEqual(len(views), 3)
+        for view, queue in zip(views, queues):
+            self._check_attributes(view, queue)
+            self.assertEqual(view.get_name(), queue.get_name())
+            self.assertEqual(view.get_cname(), queue.get_cname())
+        self.assertEqual(len(readers.queues(self.session)), 4)
+
+    def test_jobs(self):
+        t_job = schema.t_job
+        views = readers.jobs(self.session, order_by=t_job.c.global_id)
+        jobs = self._orm(schema.NGJob, t_job.c.global_id)
+        self.assertEqual(len(views), 4)
+        for view, job in zip(views, jobs):
+            self._check_attributes(view, job)
+            for getter in ['get_globalid', 'get_globalowner', 'get_status', 'get_jobname',
+                    'get_exitcode', 'get_cluster_name', 'get_queue_name', 'get_usedwalltime']:
+                self.assertEqual(getattr(view, getter)(), getattr(job, getter)(), getter)
+        self.assertEqual(len(readers.cluster_jobs(self.session, HOSTNAME, 'INLRMS:R')), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Tests of the reconciliation of advertised jobs with the job records
+(infocache.gris.reconcile).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema, upsert
+from infocache.gris.reconcile import JobReconciler, deleted_job_status, job_key
+from tests.fixtures import job_id
+
+HOSTNAME = 'ce.example.org'
+
+
+def _job(i, status, hostname=HOSTNAME, **kwargs):
+    row = dict(global_id=job_id(i), status=status, cluster_name=hostname)
+    row.update(kwargs)
+    return row
+
+
+class JobReconcilerTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        self.session = meta.Session()
+        upsert.upsert(self.session, schema.t_job, [
+            _job(0, 'INLRMS:R'),
+            _job(1, 'FINISHED'),
+            _job(2, 'FIN_FETCHED'),
+            _job(3, 'KILLED'),
+            _job(4, 'INLRMS:Q'),
+            _job(5, 'INLRMS:R', 'other.example.org')])
+        self.session.commit()
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def _states(self):
+        t_job = schema.t_job
+        return dict(self.session.execute(sa.select([t_job.c.global_id, t_job.c.status])).fetchall())
+
+    def _reconcile(self, chunks, streaming=False):
+        reconciler = JobReconciler(self.session, HOSTNAME, streaming=streaming)
+        reconciler.begin()
+        for chunk in chunks:
+            for row in chunk:
+                reconciler.add(row)
+            reconciler.apply()
+        reconciler.sweep()
+        self.session.commit()
+        return reconciler
+
+    def test_prefetch_keys(self):
+        """ the streamed prefetch keeps the states of the cluster's jobs by key """
+        reconciler = JobReconciler(self.session, HOSTNAME)
+        reconciler.begin()
+        self.assertEqual(sorted(reconciler.known.keys()),
+            sorted([job_key(job_id(i)) for i in xrange(5)]))
+        self.assertEqual(job_key(job_id(0)), job_key(unicode(job_id(0))))
+
+    def test_advertised_jobs(self):
+        """ new jobs get inserted, changed ones updated, final ones left alone """
+        reconciler = self._reconcile([[_job(0, 'FINISHED'), _job(2, 'INLRMS:R'),
+            _job(6, 'INLRMS:Q'), _job(0, 'FINISHED')]])
+        states = self._states()
+        self.assertEqual(states[job_id(0)], 'FINISHED')
+        self.assertEqual(states[job_id(2)], 'FIN_FETCHED')
+        self.assertEqual(states[job_id(6)], 'INLRMS:Q')
+        self.assertEqual((reconciler.n_inserted, reconciler.n_updated, reconciler.n_final),
+            (1, 1, 1))
+        self.assertEqual(len(reconciler.seen), 3)
+
+    def _listed(self):
+        t_seen = schema.t_job_seen
+        return sorted([global_id for global_id, in self.session.execute(
+            sa.select([t_seen.c.global_id], t_seen.c.listed == True)).fetchall()])
+
+    def _check_cycle(self, reconciler):
+        states = self._states()
+        self.assertEqual(states[job_id(0)], 'FINISHED')     # updated
+        self.assertEqual(states[job_id(1)], 'FIN_FETCHED')  # gone -> fetched
+        self.assertEqual(states[job_id(2)], 'FIN_FETCHED')  # final -> untouched
+        self.assertEqual(states[job_id(3)], 'KIL_FETCHED')  # gone -> fetched
+        self.assertEqual(states[job_id(4)], 'LOST')         # gone, not final -> lost
+        self.assertEqual(states[job_id(5)], 'INLRMS:R')     # other cluster
+        self.assertEqual(states[job_id(6)], 'INLRMS:Q')     # new
+        t_seen = schema.t_job_seen
+        self.assertEqual(self.session.execute(t_seen.count(t_seen.c.listed == False)).scalar(), 0)
+        self.assertEqual(self._listed(), [job_id(0), job_id(2), job_id(6)])
+
+    def test_sweep(self):
+        self._check_cycle(self._reconcile([[_job(0, 'FINISHED'), _job(2, 'INLRMS:R'),
+            _job(6, 'INLRMS:Q')]]))
+
+    def test_sweep_after_aborted_cycle(self):
+        """ ids staged by an aborted cycle don't protect jobs from the sweep """
+        reconciler = JobReconciler(self.session, HOSTNAME)
+        reconciler.begin()
+        for row in [_job(1, 'FINISHED'), _job(3, 'KILLED'), _job(4, 'INLRMS:Q')]:
+            reconciler.add(row)
+        reconciler.apply()
+        self.session.commit()
+        self._check_cycle(self._reconcile([[_job(0, 'FINISHED'), _job(2, 'INLRMS:R'),
+            _job(6, 'INLRMS:Q')]]))
+
+    def test_streaming(self):
+        """ chunk by chunk, without prefetch """
+        reconciler = self._reconcile([[_job(0, 'FINISHED'), _job(2, 'INLRMS:R')],
+            [_job(6, 'INLRMS:Q'), _job(0, 'FINISHED')]], streaming=True)
+        self._check_cycle(reconciler)
+        self.assertEqual((reconciler.n_inserted, reconciler.n_updated, reconciler.n_final),
+            (1, 1, 1))
+        self.assertEqual(reconciler.known, dict())
+
+    def test_listed(self):
+        """ the listed ids are the ones of the last complete cycle """
+        self._reconcile([[_job(0, 'FINISHED'), _job(6, 'INLRMS:Q')]])
+        self._reconcile([[_job(6, 'FINISHED')]])
+        self.assertEqual(self._listed(), [job_id(6)])
+
+    def test_lastmodified(self):
+        """ written and swept jobs get the time of the change """
+        t_job = schema.t_job
+        old = datetime(2011, 1, 1)
+        self.session.execute(t_job.update().values(db_lastmodified=old))
+        self.session.commit()
+        self._reconcile([[_job(0, 'FINISHED'), _job(2, 'INLRMS:R'), _job(6, 'INLRMS:Q')]])
+        modified = dict(self.session.execute(sa.select([t_job.c.global_id,
+            t_job.c.db_lastmodified])).fetchall())
+        for i in (0, 1, 3, 4, 6):
+            self.assertTrue(modified[job_id(i)] > old, i)
+        self.assertEqual(modified[job_id(2)], old)  # final, untouched
+        self.assertEqual(modified[job_id(5)], old)  # other cluster
+
+    def test_job_of_other_cluster(self):
+        """ a job recorded under another cluster gets updated, not inserted """
+        reconciler = self._reconcile([[_job(5, 'FINISHED')]])
+        self.assertEqual((reconciler.n_inserted, reconciler.n_updated), (0, 1))
+        self.assertEqual(self._states()[job_id(5)], 'FINISHED')
+
+    def test_deleted(self):
+        self._reconcile([[_job(0, 'DELETED'), _job(1, 'DELETED')]])
+        states = self._states()
+        self.assertEqual(states[job_id(0)], 'LOST')
+        self.assertEqual(states[job_id(1)], 'FIN_FETCHED')
+
+    def test_deleted_job_status(self):
+        now = datetime.utcnow()
+        self.assertEqual(deleted_job_status('INLRMS:R', None), 'LOST')
+        self.assertEqual(deleted_job_status('FAILED', None), 'FLD_FETCHED')
+        self.assertEqual(deleted_job_status('KILLED', now + timedelta(days=1), now), 'KIL_FETCHED')
+        self.assertEqual(deleted_job_status('FINISHED', now - timedelta(days=1), now), 'FIN_DELETED')
+
+
+if __name__ == '__main__':
+    unittest.main()
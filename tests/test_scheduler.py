@@ -0,0 +1,108 @@
+"""
+Tests of the adaptive polling scheduler (infocache.gris.scheduler).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import unittest
+
+from infocache.gris.scheduler import PollScheduler
+
+
+class FakeURL(object):
+
+    def __init__(self, host):
+        self.host = host
+
+    def Host(self):
+        return self.host
+
+
+def _urls(*hosts):
+    return [FakeURL(host) for host in hosts]
+
+
+class PollSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = PollScheduler(120, 60, 600)
+
+    def _pass_interval(self, hostname):
+        """ makes host due again """
+        self.scheduler.cond.acquire()
+        entry = self.scheduler.entries[hostname]
+        entry.due = time.time() - 1
+        self.scheduler._push(hostname, entry)
+        self.scheduler.cond.release()
+
+    def _due(self):
+        """ Returns hostnames handed out right now """
+        hosts = list()
+        while True:
+            due = self.scheduler.get(0)
+            if not due:
+                return hosts
+            hosts.append(due[0].Host())
+
+    def test_new_hosts_due(self):
+        self.scheduler.add_hosts(_urls('a', 'b'))
+        self.assertEqual(sorted(self._due()), ['a', 'b'])
+        self.assertEqual(self._due(), []) # in flight, not handed out twice
+
+    def test_done_reschedules(self):
+        self.scheduler.add_hosts(_urls('a'))
+        self._due()
+        self.scheduler.done('a', None)
+        self.assertEqual(self._due(), [])
+        entry = self.scheduler.entries['a']
+        self.assertTrue(118 < entry.due - time.time() <= 120)
+        self._pass_interval('a')
+        self.assertEqual(self._due(), ['a'])
+
+    def test_add_twice(self):
+        self.scheduler.add_hosts(_urls('a'))
+        self._due()
+        self.scheduler.add_hosts(_urls('a'))
+        self.assertEqual(self._due(), [])
+
+    def test_update_hosts(self):
+        """ hosts missing in the list are not polled anymore, even once in flight """
+        self.scheduler.update_hosts(_urls('a', 'b', 'c'))
+        self.assertEqual(len(self._due()), 3)
+        self.scheduler.done('c', None)
+        self.scheduler.update_hosts(_urls('a'))
+        self.assertEqual(sorted(self.scheduler.entries.keys()), ['a', 'b'])
+        self.scheduler.done('b', None)
+        self.assertEqual(self.scheduler.entries.keys(), ['a'])
+
+    def test_adaptive_interval(self):
+        self.scheduler.add_hosts(_urls('busy', 'static', 'slow'))
+        self._due()
+        self.scheduler.done('busy', (0.1, 0.1, 0.5))
+        self.scheduler.done('static', (0.1, 0.1, 0.0))
+        self.scheduler.done('slow', (30.0, 30.0, 0.01))
+        intervals = self.scheduler.get_intervals()
+        self.assertEqual(intervals['busy'], 60)    # shrunk, bounded by min_interval
+        self.assertEqual(intervals['static'], 180)  # stretched
+        self.assertTrue(intervals['slow'] >= PollScheduler.COST_FACTOR * 60 * PollScheduler.SMOOTHING)
+
+    def test_max_interval(self):
+        self.scheduler.add_hosts(_urls('static'))
+        for n in xrange(10):
+            self._due()
+            self.scheduler.done('static', (0.1, 0.1, 0.0))
+            self._pass_interval('static')
+        self.assertEqual(self.scheduler.get_intervals()['static'], 600)
+
+    def test_get_timeout(self):
+        timestamp = time.time()
+        self.assertEqual(self.scheduler.get(0.1), None)
+        self.assertTrue(time.time() - timestamp >= 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Tests of the ORM mapping (infocache.db.schema).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema, codec
+
+
+class LargeColumnsTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        session = meta.Session()
+        session.execute(schema.t_job.insert(), [dict(global_id='gsiftp://ce/jobs/%d' % i,
+            status='FAILED', cluster_name='ce', errors='LRMS error',
+            execution_nodes=codec.encode(['node%d' % i])) for i in xrange(3)])
+        session.commit()
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def test_loaded_with_record(self):
+        """ listed jobs render their large columns once detached """
+        session = meta.Session()
+        jobs = session.query(schema.NGJob).order_by(schema.t_job.c.global_id).all()
+        session.close()
+        self.assertEqual([job.errors for job in jobs], ['LRMS error'] * 3)
+        self.assertEqual(jobs[1].get_attribute_values('execution_nodes'), ['node1'])
+
+    def test_defer_large(self):
+        query = meta.Session().query(schema.NGJob).options(*schema.defer_large(schema.NGJob))
+        names = [col.name for col in query.statement.columns]
+        for name in schema.JOB_LARGE:
+            self.assertFalse(name in names)
+        self.assertTrue('status' in names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests of the streaming of large result sets (infocache.db.stream).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+import sqlalchemy as sa
+
+from infocache.db import init_model, meta, schema, stream
+from tests.fixtures import job_id
+
+HOSTNAME = 'ce.example.org'
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        self.session = meta.Session()
+        self.session.execute(schema.t_job.insert(), [dict(global_id=job_id(i),
+            cluster_name=HOSTNAME, status='INLRMS:R') for i in xrange(7)] +
+            [dict(global_id=job_id(0, 'other.example.org'), cluster_name='other.example.org',
+                status='INLRMS:R')])
+        self.session.commit()
+        t_job = schema.t_job
+        self.query = sa.select([t_job.c.global_id, t_job.c.status],
+                        t_job.c.cluster_name == HOSTNAME)
+        self.ids = sorted([job_id(i) for i in xrange(7)])
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def test_stream(self):
+        rows = list(stream.stream(self.session, self.query, batch_size=3))
+        self.assertEqual(sorted([row[0] for row in rows]), self.ids)
+
+    def test_keyset(self):
+        """ databases that buffer results get one query per batch, in key order """
+        batches = list()
+        execute = self.session.execute
+
+        def counting_execute(query, *args, **kwargs):
+            result = execute(query, *args, **kwargs)
+            batches.append(query)
+            return result
+        self.session.execute = counting_execute
+        stream.BUFFERING_DIALECTS.append('sqlite')
+        try:
+            rows = list(stream.stream(self.session, self.query,
+                            key=schema.t_job.c.global_id, batch_size=3))
+        finally:
+            stream.BUFFERING_DIALECTS.remove('sqlite')
+            self.session.execute = execute
+        self.assertEqual([row[0] for row in rows], self.ids)
+        self.assertEqual(len(batches), 3)   # 3 + 3 + 1 rows
+
+    def test_keyset_batch(self):
+        t_job = schema.t_job
+        batch = stream.keyset_batch(self.query, t_job.c.global_id, 3, self.ids[2])
+        rows = self.session.execute(batch).fetchall()
+        self.assertEqual([row[0] for row in rows], self.ids[3:6])
+
+
+if __name__ == '__main__':
+    unittest.main()
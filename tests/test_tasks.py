@@ -0,0 +1,83 @@
+"""
+Tests of the runner of periodic tasks (infocache.utils.tasks).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import time
+import unittest
+
+from infocache.utils.tasks import TaskRunner
+
+
+class TaskRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tick = TaskRunner.TICK
+        TaskRunner.TICK = 0.05
+        self.runner = TaskRunner()
+        self.calls = list()
+
+    def tearDown(self):
+        self.runner.stop()
+        TaskRunner.TICK = self.tick
+
+    def _task(self, name, duration=0.0, error=None):
+        def func():
+            self.calls.append(name)
+            time.sleep(duration)
+            if error:
+                raise error
+        return func
+
+    def _run(self, seconds):
+        self.runner.start()
+        time.sleep(seconds)
+        self.runner.stop()
+        return self.runner.get_stats()
+
+    def test_schedule(self):
+        """ every task runs on its own period, the first time after its delay """
+        self.runner.add('fast', self._task('fast'), 0.1)
+        self.runner.add('slow', self._task('slow'), 0.25)
+        self.runner.add('delayed', self._task('delayed'), 0.1, delay=10)
+        stats = self._run(0.45)
+        self.assertTrue(4 <= stats['fast']['runs'] <= 5)
+        self.assertEqual(stats['slow']['runs'], 2)
+        self.assertEqual(stats['delayed']['runs'], 0)
+        self.assertEqual(stats['fast']['overruns'], 0)
+
+    def test_overrun(self):
+        """ overruns get counted, the next run starts right away (not
+            piled up) and a slow task doesn't delay the others
+        """
+        self.runner.add('slow', self._task('slow', 0.15), 0.1)
+        self.runner.add('fast', self._task('fast'), 0.1)
+        stats = self._run(0.5)
+        self.assertEqual(stats['slow']['runs'], 3)
+        self.assertEqual(stats['slow']['overruns'], 3)
+        self.assertTrue(stats['slow']['max_time'] >= 0.15)
+        self.assertTrue(stats['fast']['runs'] >= 4)
+
+    def test_errors(self):
+        """ a failing task keeps being run """
+        self.runner.add('failing', self._task('failing', error=ValueError('x')), 0.1)
+        stats = self._run(0.25)
+        self.assertEqual(stats['failing']['errors'], stats['failing']['runs'])
+        self.assertTrue(stats['failing']['runs'] >= 2)
+
+    def test_stop(self):
+        """ no task runs anymore once stopped """
+        self.runner.add('task', self._task('task'), 0.05)
+        self._run(0.1)
+        time.sleep(TaskRunner.TICK)
+        n_calls = len(self.calls)
+        time.sleep(0.2)
+        self.assertEqual(len(self.calls), n_calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests of the bulk upsert (infocache.db.upsert).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from infocache.db import init_model, meta, schema, upsert
+
+
+class UpsertTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+        self.session = meta.Session()
+        self.session.execute(schema.t_giis.insert(), [
+            dict(hostname='giis0', port=2135, status='active', response_time=1.0),
+            dict(hostname='giis1', port=2135, status='active', response_time=1.0)])
+        self.session.commit()
+
+    def tearDown(self):
+        meta.Session.remove()
+
+    def _records(self):
+        t_giis = schema.t_giis
+        return dict([(row[0], tuple(row[1:])) for row in self.session.execute(
+            sa.select([t_giis.c.hostname, t_giis.c.port, t_giis.c.status, t_giis.c.response_time]))])
+
+    def _upsert(self, rows, batch_size=None):
+        n = upsert.upsert(self.session, schema.t_giis, rows, batch_size)
+        self.session.commit()
+        return n
+
+    def test_insert_and_update(self):
+        n = self._upsert([dict(hostname='giis1', port=2136, status='inactive', response_time=2.0),
+                dict(hostname='giis2', port=2135, status='active', response_time=3.0)])
+        self.assertEqual(n, 2)
+        self.assertEqual(self._records(), dict(giis0=(2135, 'active', 1.0),
+            giis1=(2136, 'inactive', 2.0), giis2=(2135, 'active', 3.0)))
+
+    def test_other_columns_kept(self):
+        """ rows with different keys are written in groups, missing columns are left alone """
+        self._upsert([dict(hostname='giis0', status='inactive'),
+                dict(hostname='giis1', response_time=5.0),
+                dict(hostname='giis3', status='active')])
+        records = self._records()
+        self.assertEqual(records['giis0'], (2135, 'inactive', 1.0))
+        self.assertEqual(records['giis1'], (2135, 'active', 5.0))
+        self.assertEqual(records['giis3'], (None, 'active', -1.0)) # column default
+
+    def test_primary_key_only(self):
+        self._upsert([dict(hostname='giis0'), dict(hostname='giis4')])
+        records = self._records()
+        self.assertEqual(records['giis0'], (2135, 'active', 1.0))
+        self.assertTrue(records.has_key('giis4'))
+
+    def test_batches(self):
+        rows = [dict(hostname='giis%d' % i, port=i) for i in xrange(7)]
+        self.assertEqual(self._upsert(rows, batch_size=3), 7)
+        records = self._records()
+        self.assertEqual(len(records), 7)
+        self.assertEqual(records['giis6'][0], 6)
+
+    def test_fallback(self):
+        """ databases without upsert statement write row by row """
+        supports_upsert = upsert.supports_upsert
+        upsert.supports_upsert = lambda dialect: False
+        try:
+            self._upsert([dict(hostname='giis1', status='inactive'),
+                dict(hostname='giis2', status='active')])
+        finally:
+            upsert.supports_upsert = supports_upsert
+        records = self._records()
+        self.assertEqual(records['giis1'], (2135, 'inactive', 1.0))
+        self.assertEqual(records['giis2'][1], 'active')
+
+    def test_empty(self):
+        self.assertEqual(self._upsert([]), 0)
+
+    def test_mysql(self):
+        sql = str(upsert.Upsert(schema.t_giis, ['port', 'status']).compile(dialect=mysql.dialect()))
+        self.assertTrue(sql.startswith('INSERT INTO giis'))
+        self.assertTrue(sql.endswith('ON DUPLICATE KEY UPDATE `port` = VALUES(`port`), ' \
+            '`status` = VALUES(`status`)'))
+        sql = str(upsert.Upsert(schema.t_giis, []).compile(dialect=mysql.dialect()))
+        self.assertTrue(sql.endswith('ON DUPLICATE KEY UPDATE `hostname` = VALUES(`hostname`)'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Tests of the database writer stage (infocache.gris.writer).
+"""
+
+__author__ = "Placi Flury grid@switch.ch"
+__copyright__ = "Copyright 2008-2011, SMSCG an AAA/SWITCH project"
+__date__ = "18.10.2026"
+__version__ = "0.1.0"
+
+import unittest
+import sqlalchemy as sa
+
+from infocache.db import init_model
+from infocache.gris.writer import BatchWriter, ClusterUpdate
+
+
+class FakeScheduler(object):
+
+    def __init__(self):
+        self.done_hosts = list()
+
+    def done(self, hostname, result=None):
+        self.done_hosts.append(hostname)
+
+
+class FakeGris2db(object):
+    """ Records the calls of the writer, fails where told to """
+
+    def __init__(self, fail_write=(), fail_written=(), fail_write_failed=()):
+        self.scheduler = FakeScheduler()
+        self.fail_write = fail_write
+        self.fail_written = fail_written
+        self.fail_write_failed = fail_write_failed
+        self.blacklisted = list()
+        self.written = list()
+
+    def _write_cluster_info(self, session, update):
+        if update.hostname in self.fail_write:
+            raise ValueError(update.hostname)
+        return None
+
+    def _written(self, update, written):
+        if update.hostname in self.fail_written:
+            raise ValueError("fingerprints")
+        self.written.append(update.hostname)
+        self.scheduler.done(update.hostname, (0.1, 0.1, 0.0))
+
+    def _write_failed(self, update, error):
+        if update.hostname in self.fail_write_failed:
+            raise ValueError("blacklist")
+        self._add_cluster2blacklist(update.hostname)
+        self.scheduler.done(update.hostname, None)
+
+    def _add_cluster2blacklist(self, hostname):
+        self.blacklisted.append(hostname)
+
+
+def _update(hostname):
+    return ClusterUpdate(hostname, dict(hostname=hostname), [], [], 0.1, 0.1)
+
+
+class BatchWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        init_model(sa.create_engine('sqlite://'))
+
+    def _write(self, gris2db, hosts):
+        writer = BatchWriter(gris2db)
+        writer._write_safe([_update(hostname) for hostname in hosts])
+        return writer
+
+    def test_written(self):
+        gris2db = FakeGris2db()
+        self._write(gris2db, ['a', 'b'])
+        self.assertEqual(gris2db.written, ['a', 'b'])
+        self.assertEqual(gris2db.scheduler.done_hosts, ['a', 'b'])
+
+    def test_failed_cluster_retried_alone(self):
+        gris2db = FakeGris2db(fail_write=['b'])
+        self._write(gris2db, ['a', 'b', 'c'])
+        self.assertEqual(gris2db.written, ['a', 'c'])
+        self.assertEqual(gris2db.blacklisted, ['b'])
+        self.assertEqual(sorted(gris2db.scheduler.done_hosts), ['a', 'b', 'c'])
+
+    def test_written_raises(self):
+        gris2db = FakeGris2db(fail_written=['a'])
+        self._write(gris2db, ['a', 'b'])
+        self.assertEqual(gris2db.written, ['b'])
+        self.assertEqual(gris2db.blacklisted, ['a'])
+        self.assertEqual(sorted(gris2db.scheduler.done_hosts), ['a', 'b'])
+
+    def test_write_failed_raises(self):
+        gris2db = FakeGris2db(fail_write=['a'], fail_write_failed=['a'])
+        self._write(gris2db, ['a'])
+        self.assertEqual(gris2db.scheduler.done_hosts, ['a'])
+
+    def test_done_once(self):
+        """ clusters are rescheduled exactly once """
+        gris2db = FakeGris2db(fail_write=['b'], fail_written=['c'])
+        self._write(gris2db, ['a', 'b', 'c', 'd'])
+        self.assertEqual(sorted(gris2db.scheduler.done_hosts), ['a', 'b', 'c', 'd'])
+
+    def test_adapt_batch_size(self):
+        writer = BatchWriter(FakeGris2db())
+        for n in xrange(10):
+            writer._adapt_batch_size(writer.batch_size, 0.1)
+        self.assertEqual(writer.batch_size, BatchWriter.MAX_BATCH)
+        writer._adapt_batch_size(1, BatchWriter.TARGET_TIME / 2) # neither slow nor fast
+        self.assertEqual(writer.batch_size, BatchWriter.MAX_BATCH)
+        writer._adapt_batch_size(1, BatchWriter.TARGET_TIME + 1)
+        self.assertEqual(writer.batch_size, BatchWriter.MAX_BATCH / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()